@@ -16,11 +16,20 @@
 #
 ###
 
-from apiclient.discovery import build
+from apiclient.discovery import build, build_from_document
 from oauth2client.client import flow_from_clientsecrets
 from oauth2client.tools import run_flow
 from oauth2client.file import Storage
 import httplib2
+import json
+import logging
+import os
+import threading
+
+try:
+    from googleapiclient.discovery_cache import get_static_doc
+except ImportError:  # google-api-python-client < 2.0
+    get_static_doc = None
 
 # The client_secrets_file variable specifies the name of a file that contains
 # the OAuth 2.0 information for this application, including its client_id and
@@ -34,14 +43,119 @@ import httplib2
 #   https://developers.google.com/api-client-library/python/guide/aaa_client_secrets
 
 
+# Default file of the stored authorization credentials
+CREDENTIALS_FILE = 'youtube-extraction.json'
+
+
 # Authorize the request and store authorization credentials.
-def get_authenticated_service(client_secrets_file, scopes, api_service_name, api_version):
+# Each content owner needs its own credentials_file (e.g., projectName-oauth2.json), otherwise
+# it would act with the token of another content owner.
+def _get_credentials(client_secrets_file, scopes, credentials_file=CREDENTIALS_FILE):
 
     flow = flow_from_clientsecrets(client_secrets_file, scope=scopes, message=' f off ')
-    credentials_file = 'youtube-extraction.json' # e.g., projectName-oauth2.json
+    folder = os.path.dirname(credentials_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
     storage = Storage(credentials_file)
     credentials = storage.get()   # Returns None if the file doesn't exist
     if credentials is None or credentials.invalid:
         credentials = run_flow(flow, storage)  # This creates the credentials_file
 
-    return build(api_service_name,  api_version,  http=credentials.authorize(httplib2.Http()))
\ No newline at end of file
+    return credentials
+
+
+# Check that stored credentials can be used without the interactive authorization flow, which
+# needs a terminal (e.g. before running a content owner in a worker process). Expired access
+# tokens are fine as long as they can be refreshed.
+def has_valid_credentials(credentials_file=CREDENTIALS_FILE):
+
+    if not os.path.exists(credentials_file):
+        return False
+    credentials = Storage(credentials_file).get()
+    if credentials is None or credentials.invalid:
+        return False
+    return not credentials.access_token_expired or credentials.refresh_token is not None
+
+
+# Build a new authorized transport. httplib2.Http is not thread-safe, so every
+# thread that talks to the APIs must use its own instance.
+# With a cache (e.g. http_cache.BoundedFileCache), httplib2 revalidates the cached
+# responses with If-None-Match and reuses them on 304 Not Modified.
+def get_authorized_http(client_secrets_file, scopes, cache=None, credentials_file=CREDENTIALS_FILE):
+
+    credentials = _get_credentials(client_secrets_file, scopes, credentials_file)
+
+    return credentials.authorize(httplib2.Http(cache=cache))
+
+
+def get_authenticated_service(client_secrets_file, scopes, api_service_name, api_version, cache=None,
+                              credentials_file=CREDENTIALS_FILE):
+
+    return build(api_service_name,  api_version,
+                 http=get_authorized_http(client_secrets_file, scopes, cache, credentials_file))
+
+
+# Build services and authorized transports from a single set of credentials.
+# Credentials are read and refreshed once and shared by every transport; each thread
+# gets its own httplib2.Http (kept alive between calls) and its own services, since
+# neither is thread-safe. Discovery documents come from the library's static copies
+# or from a local cache folder, so build() does not fetch them on every run.
+# The credentials are stored in credentials_file, which must be different for each content owner.
+class ServiceFactory:
+
+    def __init__(self, client_secrets_file, scopes, discovery_folder='.discovery_cache', cache=None,
+                 credentials_file=CREDENTIALS_FILE):
+
+        self._credentials = _get_credentials(client_secrets_file, scopes, credentials_file)
+        if self._credentials.access_token_expired:
+            self._credentials.refresh(httplib2.Http())
+        self._discovery_folder = discovery_folder
+        self._cache = cache
+        self._documents = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # Authorized transport of the current thread. Cached transports use the HTTP cache
+    def http(self, cached=False):
+
+        if not hasattr(self._local, 'http'):
+            self._local.http = {}
+        if cached not in self._local.http:
+            cache = self._cache if cached else None
+            self._local.http[cached] = self._credentials.authorize(httplib2.Http(cache=cache))
+        return self._local.http[cached]
+
+    # Service of the current thread, bound to the thread's transport
+    def service(self, api_service_name, api_version, cached=False):
+
+        if not hasattr(self._local, 'services'):
+            self._local.services = {}
+        key = (api_service_name, api_version, cached)
+        if key not in self._local.services:
+            document = self._get_discovery_document(api_service_name, api_version)
+            self._local.services[key] = build_from_document(document, http=self.http(cached))
+        return self._local.services[key]
+
+    def _get_discovery_document(self, api_service_name, api_version):
+
+        key = (api_service_name, api_version)
+        with self._lock:
+            if key in self._documents:
+                return self._documents[key]
+
+            document = get_static_doc(api_service_name, api_version) if get_static_doc else None
+            path = os.path.join(self._discovery_folder, f'{api_service_name}.{api_version}.json')
+            if document is None and os.path.exists(path):
+                with open(path, 'r') as fh:
+                    document = fh.read()
+
+            if document is None:
+                logging.info(f'Fetching discovery document of {api_service_name} {api_version}')
+                service = build(api_service_name, api_version, http=self.http(), cache_discovery=False)
+                document = json.dumps(service._rootDesc)
+                os.makedirs(self._discovery_folder, exist_ok=True)
+                with open(path, 'w') as fh:
+                    fh.write(document)
+
+            self._documents[key] = document
+            return document
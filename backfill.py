@@ -0,0 +1,155 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from manifest import Manifest
+from metrics import METRICS
+from reports import ReportsHandler
+
+
+class Backfill:
+    def __init__(
+        self,
+        reports_handler: ReportsHandler,
+        manifest: Manifest,
+        report_name: str,
+        start_date: str,
+        end_date: str,
+        shard_days: int = 30,
+        workers: int = 4,
+        generation_lag_days: int = 7,
+    ) -> None:
+        """
+        Inicialização da classe
+
+        Baixa e processa os relatórios de um intervalo de datas, dividido em shards de datas
+        contínuas executados em paralelo. Cada data concluída é registrada no manifesto, então
+        um backfill interrompido continua das datas que faltam
+
+        Args:
+            reports_handler (ReportsHandler): Handler dos relatórios do Youtube
+            manifest (Manifest): Manifesto com o estado dos relatórios e do backfill
+            report_name (str): Nome do job dos relatórios do Youtube
+            start_date (str): Primeira data do backfill, ex: 2022-01-01
+            end_date (str): Última data do backfill, inclusiva
+            shard_days (int): Número máximo de datas de cada shard
+            workers (int): Número de shards executados ao mesmo tempo
+            generation_lag_days (int): Dias que o Youtube pode levar para gerar o relatório de
+                uma data. Datas sem relatório mais recentes que isso são tentadas de novo na
+                próxima execução
+        """
+        self._reports_handler = reports_handler
+        self._manifest = manifest
+        self._report_name = report_name
+        self._start_date = date.fromisoformat(start_date)
+        self._end_date = date.fromisoformat(end_date)
+        self._shard_days = max(1, shard_days)
+        self._workers = max(1, workers)
+        self._generation_lag_days = max(0, generation_lag_days)
+
+    def _remaining_dates(self) -> list:
+        """
+        Função para listar as datas do intervalo que ainda não foram concluídas
+
+        Returns:
+            list: Datas pendentes, em ordem
+        """
+        done = self._manifest.backfilled(
+            self._report_name, self._start_date.isoformat(), self._end_date.isoformat()
+        )
+        days = (self._end_date - self._start_date).days + 1
+        dates = [self._start_date + timedelta(days=day) for day in range(days)]
+        return [day for day in dates if day.isoformat() not in done]
+
+    def shards(self) -> list:
+        """
+        Função para dividir as datas pendentes em shards
+
+        Cada shard tem datas contínuas, então é listado com uma única consulta por intervalo
+
+        Returns:
+            list: Lista de tuplas com a primeira e a última data de cada shard
+        """
+        shards = []
+        for day in self._remaining_dates():
+            if shards:
+                first, last = shards[-1]
+                if day == last + timedelta(days=1) and (day - first).days < self._shard_days:
+                    shards[-1] = (first, day)
+                    continue
+            shards.append((day, day))
+        return shards
+
+    def _run_shard(self, shard: tuple) -> list:
+        """
+        Função para baixar e processar os relatórios de um shard
+
+        Ao fim do shard, as datas sem relatório mais antigas que generation_lag_days também são
+        registradas como concluídas; as mais recentes podem ainda não ter sido geradas
+
+        Args:
+            shard (tuple): Primeira e última data do shard
+
+        Returns:
+            list: Datas cujos relatórios falharam
+        """
+        first, last = shard
+        reports = self._reports_handler.list_reports(
+            f"{first.isoformat()}T00:00:00Z",
+            f"{(last + timedelta(days=1)).isoformat()}T00:00:00Z",
+        )
+        logging.info(f"Backfill shard {first} to {last}: {len(reports)} reports")
+
+        failed = []
+        reported = set()
+        for report in sorted(reports, key=lambda report: report["date"]):
+            report_date = report["date"][:10]
+            reported.add(report_date)
+            try:
+                with METRICS.stage("backfill.report"):
+                    self._reports_handler.fetch_and_process(report)
+            except Exception:
+                logging.exception(f"Backfill of {report_date} failed")
+                failed.append(report_date)
+                continue
+            # Checkpoint: a resumed backfill skips this date
+            self._manifest.mark_backfilled(self._report_name, report_date)
+            METRICS.increment("backfill.dates")
+
+        # Old dates without a report are done too, so a resumed backfill does not list them again
+        generated_until = date.today() - timedelta(days=self._generation_lag_days)
+        for day in range((min(last, generated_until) - first).days + 1):
+            report_date = (first + timedelta(days=day)).isoformat()
+            if report_date not in reported:
+                self._manifest.mark_backfilled(self._report_name, report_date)
+                METRICS.increment("backfill.empty_dates")
+        return failed
+
+    def run(self) -> list:
+        """
+        Função para executar o backfill
+
+        Returns:
+            list: Datas cujos relatórios falharam
+        """
+        shards = self.shards()
+        logging.info(
+            f"Backfill of {self._report_name} from {self._start_date} to {self._end_date}: "
+            f"{len(shards)} shards with {self._workers} workers"
+        )
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            futures = {executor.submit(self._run_shard, shard): shard for shard in shards}
+            for i, future in enumerate(as_completed(futures), start=1):
+                first, last = futures[future]
+                try:
+                    failed.extend(future.result())
+                    logging.info(f"Backfill shard {first} to {last} done ({i}/{len(shards)})")
+                except Exception:
+                    # A failed listing leaves the whole shard for the next run
+                    logging.exception(f"Backfill shard {first} to {last} failed")
+                    failed.extend(
+                        (first + timedelta(days=day)).isoformat()
+                        for day in range((last - first).days + 1)
+                    )
+        return sorted(failed)
@@ -0,0 +1,157 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import apiclient.discovery
+import httplib2
+from metrics import METRICS, QUOTA_COSTS
+from scheduler import SCHEDULER, Scheduler
+
+
+class BatchExecutor:
+    def __init__(
+        self,
+        youtube_data: apiclient.discovery,
+        batch_size: int = 10,
+        max_concurrent: int = 1,
+        http_factory: Callable[[], httplib2.Http] = None,
+        scheduler: Scheduler = None,
+        cached: bool = False,
+    ) -> None:
+        """
+        Inicialização da classe
+
+        Executa requisições da API de dados do Youtube agrupadas em requisições batch, enviando
+        várias chamadas em uma única ida e volta HTTP, com até max_concurrent batches em paralelo
+
+        Args:
+            youtube_data (apiclient.discovery.object): Objeto da conexão com a API do Youtube
+            batch_size (int): Número máximo de requisições em cada batch
+            max_concurrent (int): Número máximo de batches executados ao mesmo tempo
+            http_factory (Callable[[], httplib2.Http]): Função que cria uma nova conexão HTTP
+                autorizada, usada por cada thread. Sem ela os batches são executados em sequência
+            scheduler (Scheduler): Limite de taxa e retentativas das chamadas. Se None, usa o
+                scheduler compartilhado do processo
+            cached (bool): Se True, as conexões do http_factory usam o cache HTTP e as
+                requisições são enviadas uma a uma, com até max_concurrent em paralelo, em vez de
+                em batches. O httplib2 só guarda respostas de GET, e o batch é um POST
+        """
+        self._youtube_data = youtube_data
+        self._batch_size = max(1, batch_size)
+        self._max_concurrent = max(1, max_concurrent)
+        self._http_factory = http_factory
+        self._local = threading.local()
+        self._scheduler = scheduler or SCHEDULER
+        # Batches are POST requests, which the HTTP cache never stores or revalidates
+        self._cached = cached and http_factory is not None
+
+    def _get_http(self) -> httplib2.Http:
+        """
+        Função para obter a conexão HTTP autorizada da thread atual
+
+        Returns:
+            httplib2.Http: Conexão da thread, ou None quando não há http_factory
+        """
+        if self._http_factory is None:
+            return None
+
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._http_factory()
+            self._local.http = http
+        return http
+
+    def execute_one(self, request) -> dict:
+        """
+        Função para executar uma única requisição
+
+        Args:
+            request (apiclient.http.HttpRequest): Requisição da API
+
+        Returns:
+            dict: Resposta da API
+        """
+        response = self._scheduler.execute(request, http=self._get_http())
+        METRICS.api_call(request.methodId)
+        return response
+
+    def _execute_batch(self, requests: list) -> list:
+        """
+        Função para executar um batch de requisições
+
+        Args:
+            requests (list): Requisições da API
+
+        Returns:
+            list: Respostas da API, na mesma ordem das requisições
+        """
+        if len(requests) == 1:
+            return [self.execute_one(requests[0])]
+
+        responses = [None] * len(requests)
+        pending = list(range(len(requests)))
+
+        def send() -> None:
+            # Only the requests that failed with a retryable error are sent again
+            errors = {}
+
+            def callback(request_id, response, exception):
+                if exception is not None:
+                    errors[int(request_id)] = exception
+                else:
+                    responses[int(request_id)] = response
+
+            batch = self._youtube_data.new_batch_http_request(callback=callback)
+            for i in pending:
+                batch.add(requests[i], request_id=str(i))
+            batch.execute(http=self._get_http())
+            METRICS.increment("data_api.batches")
+            for i in pending:
+                METRICS.api_call(requests[i].methodId)
+
+            pending[:] = sorted(errors)
+            if errors:
+                raise errors[pending[0]]
+
+        self._scheduler.call(
+            requests[0].methodId,
+            send,
+            cost=sum(QUOTA_COSTS.get(request.methodId, 1) for request in requests),
+        )
+        return responses
+
+    def execute(self, requests: list) -> list:
+        """
+        Função para executar uma lista de requisições em batches
+
+        Args:
+            requests (list): Requisições da API
+
+        Returns:
+            list: Respostas da API, na mesma ordem das requisições
+        """
+        workers = self._max_concurrent if self._http_factory is not None else 1
+        if self._cached:
+            # Single GETs, so unchanged responses come back as 304 Not Modified from the cache
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                responses = list(executor.map(self.execute_one, requests))
+            logging.info(f"Executed {len(requests)} cached requests")
+            return responses
+
+        batches = [
+            requests[i : i + self._batch_size] for i in range(0, len(requests), self._batch_size)
+        ]
+
+        responses = []
+        if workers == 1:
+            for i, batch in enumerate(batches, start=1):
+                responses.extend(self._execute_batch(batch))
+                logging.info(f"Executed batch {i}/{len(batches)}")
+            return responses
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map keeps the order of the batches
+            for i, batch_responses in enumerate(executor.map(self._execute_batch, batches), start=1):
+                responses.extend(batch_responses)
+                logging.info(f"Executed batch {i}/{len(batches)}")
+        return responses
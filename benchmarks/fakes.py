@@ -0,0 +1,669 @@
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as dt_time, timedelta
+from io import BytesIO
+import httplib2
+import numpy as np
+import pandas as pd
+from benchmarks.generator import Catalog
+
+
+class _FakeBackend:
+    def __init__(self, latency: float = 0.0) -> None:
+        """
+        Inicialização da classe
+
+        Base dos serviços falsos: simula a latência de cada ida e volta HTTP e conta as
+        chamadas de cada endpoint
+
+        Args:
+            latency (float): Tempo em segundos de cada ida e volta HTTP
+        """
+        self.latency = latency
+        self.calls = Counter()
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    def round_trip(self) -> None:
+        """
+        Função para simular uma ida e volta HTTP
+        """
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def count(self, endpoint: str) -> None:
+        """
+        Função para contar uma chamada de um endpoint
+
+        Args:
+            endpoint (str): Id do método da API, ex: youtube.videos.list
+        """
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def stats(self) -> dict:
+        """
+        Função para obter as chamadas feitas ao serviço
+
+        Returns:
+            dict: Dict com o número de idas e voltas HTTP e as chamadas de cada endpoint
+        """
+        return {"round_trips": self.round_trips, "calls": dict(self.calls)}
+
+    def reset(self) -> None:
+        """
+        Função para zerar os contadores de chamadas
+        """
+        with self._lock:
+            self.calls = Counter()
+            self.round_trips = 0
+
+
+class FakeRequest:
+    def __init__(self, backend: _FakeBackend, endpoint: str, handler, uri: str = "") -> None:
+        """
+        Requisição falsa, com a mesma interface de apiclient.http.HttpRequest usada pelo projeto
+
+        Args:
+            backend (_FakeBackend): Serviço falso que responde a requisição
+            endpoint (str): Id do método da API, ex: youtube.videos.list
+            handler (Callable[[], dict]): Função que monta a resposta
+            uri (str): Url da requisição
+        """
+        self._backend = backend
+        self._endpoint = endpoint
+        self._handler = handler
+        self.methodId = endpoint
+        self.uri = uri
+        self.http = None
+        self.headers = {}
+
+    def respond(self) -> dict:
+        """
+        Função para montar a resposta, sem simular a ida e volta HTTP
+
+        Returns:
+            dict: Resposta da API
+        """
+        self._backend.count(self._endpoint)
+        return self._handler()
+
+    def execute(self, http: httplib2.Http = None, num_retries: int = 0) -> dict:
+        self._backend.round_trip()
+        return self.respond()
+
+
+class FakeBatch:
+    def __init__(self, backend: _FakeBackend, callback) -> None:
+        """
+        Requisição batch falsa, com a mesma interface de apiclient.http.BatchHttpRequest
+
+        Args:
+            backend (_FakeBackend): Serviço falso que responde as requisições
+            callback (Callable): Função chamada com a resposta de cada requisição
+        """
+        self._backend = backend
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request: FakeRequest, callback=None, request_id: str = None) -> None:
+        self._requests.append((request, callback or self._callback, request_id))
+
+    def execute(self, http: httplib2.Http = None) -> None:
+        # The whole batch is a single round trip
+        self._backend.round_trip()
+        for request, callback, request_id in self._requests:
+            try:
+                response = request.respond()
+            except Exception as e:
+                callback(request_id, None, e)
+            else:
+                callback(request_id, response, None)
+
+
+class _Resource:
+    def __init__(self, **methods) -> None:
+        """
+        Recurso falso da API, ex: youtube.videos(), com um atributo para cada método
+
+        Args:
+            methods: Métodos do recurso, ex: list=<função>
+        """
+        self.__dict__.update(methods)
+
+
+class FakeReportingService(_FakeBackend):
+    def __init__(
+        self,
+        reports: list,
+        latency: float = 0.0,
+        page_size: int = 100,
+        job_id: str = "benchmark-job",
+    ) -> None:
+        """
+        Inicialização da classe
+
+        API do Youtube Reporting falsa: lista os relatórios de um job, com paginação, e serve o
+        download dos arquivos, com suporte a Range para os downloads em pedaços
+
+        Args:
+            reports (list): Lista de tuplas com a data e o caminho de cada relatório raw
+            latency (float): Tempo em segundos de cada ida e volta HTTP
+            page_size (int): Número máximo de relatórios em cada página da listagem
+            job_id (str): Id do job dos relatórios
+        """
+        super().__init__(latency)
+        self._page_size = page_size
+        self._files = {}
+        self._reports = []
+        for i, (report_date, path) in enumerate(sorted(reports)):
+            start = datetime.combine(report_date, dt_time(7))
+            url = (
+                "https://youtubereporting.googleapis.com/v1/media/"
+                f"{job_id}/reports/{i}?alt=media"
+            )
+            self._files[url] = path
+            self._reports.append(
+                {
+                    "id": str(i),
+                    "jobId": job_id,
+                    "startTime": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "endTime": (start + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "createTime": (start + timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "downloadUrl": url,
+                }
+            )
+
+    def jobs(self) -> _Resource:
+        return _Resource(reports=lambda: _Resource(list=self._list_reports))
+
+    def media(self) -> _Resource:
+        return _Resource(download=self._download)
+
+    def http(self) -> "FakeHttp":
+        """
+        Função para criar uma conexão HTTP falsa, usada como http_factory
+
+        Returns:
+            FakeHttp: Conexão que serve os arquivos dos relatórios
+        """
+        return FakeHttp(self)
+
+    def _list_reports(
+        self,
+        jobId: str,
+        onBehalfOfContentOwner: str = None,
+        createdAfter: str = None,
+        startTimeAtOrAfter: str = None,
+        startTimeBefore: str = None,
+        pageToken: str = None,
+        pageSize: int = None,
+    ) -> FakeRequest:
+        def handler():
+            reports = [
+                report
+                for report in self._reports
+                if (createdAfter is None or report["createTime"] > createdAfter)
+                and (startTimeAtOrAfter is None or report["startTime"] >= startTimeAtOrAfter)
+                and (startTimeBefore is None or report["startTime"] < startTimeBefore)
+            ]
+            start = int(pageToken or 0)
+            end = start + (pageSize or self._page_size)
+            response = {"reports": reports[start:end]}
+            if end < len(reports):
+                response["nextPageToken"] = str(end)
+            return response
+
+        return FakeRequest(self, "youtubereporting.jobs.reports.list", handler)
+
+    def _download(self, resourceName: str) -> FakeRequest:
+        request = FakeRequest(self, "youtubereporting.media.download", lambda: None)
+        request.http = self.http()
+        return request
+
+    def serve(self, uri: str, headers: dict) -> tuple:
+        """
+        Função para responder o download de um relatório
+
+        Args:
+            uri (str): Url do relatório
+            headers (dict): Cabeçalhos da requisição
+
+        Returns:
+            tuple: Resposta (httplib2.Response) e conteúdo do relatório
+        """
+        self.round_trip()
+        self.count("youtubereporting.media.download")
+        path = self._files.get(uri)
+        if path is None:
+            return httplib2.Response({"status": "404"}), b""
+
+        with open(path, "rb") as fh:
+            fh.seek(0, 2)
+            total = fh.tell()
+            start, end = 0, -1
+            if "range" in headers:
+                start, end = (int(value) for value in headers["range"][6:].split("-", 1))
+            # A download with chunksize -1 asks for an empty range and gets the whole file
+            if end < start:
+                fh.seek(0)
+                return httplib2.Response({"status": "200", "content-length": str(total)}), fh.read()
+
+            fh.seek(start)
+            content = fh.read(end - start + 1)
+        end = start + len(content) - 1
+        return (
+            httplib2.Response(
+                {"status": "206", "content-range": f"bytes {start}-{end}/{total}"}
+            ),
+            content,
+        )
+
+
+class FakeHttp:
+    def __init__(self, service: FakeReportingService) -> None:
+        """
+        Conexão HTTP falsa, com a interface de httplib2.Http usada pelo MediaIoBaseDownload
+
+        Args:
+            service (FakeReportingService): Serviço que serve os arquivos dos relatórios
+        """
+        self._service = service
+
+    def request(self, uri: str, method: str = "GET", body=None, headers: dict = None, **kwargs):
+        return self._service.serve(uri, {k.lower(): v for k, v in (headers or {}).items()})
+
+
+class FakeDataService(_FakeBackend):
+    def __init__(self, catalog: Catalog, latency: float = 0.0) -> None:
+        """
+        Inicialização da classe
+
+        API de dados do Youtube falsa: lista canais, com paginação, vídeos e categorias a partir
+        de um catálogo sintético, e aceita requisições batch
+
+        Args:
+            catalog (Catalog): Catálogo de canais e vídeos
+            latency (float): Tempo em segundos de cada ida e volta HTTP
+        """
+        super().__init__(latency)
+        self._catalog = catalog
+        self._videos = {video_id: i for i, video_id in enumerate(catalog.video_ids)}
+
+    def channels(self) -> _Resource:
+        return _Resource(list=self._list_channels)
+
+    def videos(self) -> _Resource:
+        return _Resource(list=self._list_videos)
+
+    def videoCategories(self) -> _Resource:
+        return _Resource(list=self._list_categories)
+
+    def new_batch_http_request(self, callback=None) -> FakeBatch:
+        return FakeBatch(self, callback)
+
+    def http(self) -> None:
+        """
+        Função usada como http_factory. A API falsa não usa conexões HTTP
+
+        Returns:
+            None: Sem conexão
+        """
+        return None
+
+    def _list_channels(self, part: str, maxResults: int = 5, pageToken: str = None, **kwargs):
+        def handler():
+            start = int(pageToken or 0)
+            end = start + maxResults
+            channels = self._catalog.channel_ids[start:end]
+            response = {
+                "items": [
+                    {"id": channel_id, "snippet": {"title": f"Channel {start + i}"}}
+                    for i, channel_id in enumerate(channels)
+                ]
+            }
+            if end < len(self._catalog.channel_ids):
+                response["nextPageToken"] = str(end)
+            return response
+
+        return FakeRequest(self, "youtube.channels.list", handler)
+
+    def _list_videos(self, part: str, id: str, **kwargs) -> FakeRequest:
+        def handler():
+            items = []
+            for video_id in id.split(","):
+                index = self._videos.get(video_id)
+                if index is None:
+                    continue
+                items.append(
+                    {
+                        "id": video_id,
+                        "snippet": {
+                            "title": self._catalog.video_title(index),
+                            "categoryId": str(self._catalog.video_categories[index]),
+                        },
+                    }
+                )
+            return {"items": items}
+
+        return FakeRequest(self, "youtube.videos.list", handler)
+
+    def _list_categories(self, part: str, id: str, **kwargs) -> FakeRequest:
+        def handler():
+            return {
+                "items": [
+                    {"id": category_id, "snippet": {"title": self._catalog.categories[category_id]}}
+                    for category_id in id.split(",")
+                    if category_id in self._catalog.categories
+                ]
+            }
+
+        return FakeRequest(self, "youtube.videoCategories.list", handler)
+
+
+class FakeJob:
+    def __init__(self, output_rows: int) -> None:
+        """
+        Job falso do BigQuery, já concluído
+
+        Args:
+            output_rows (int): Número de linhas carregadas
+        """
+        self.output_rows = output_rows
+
+    def result(self) -> "FakeJob":
+        return self
+
+
+def _typed(df: pd.DataFrame, schema: list) -> pd.DataFrame:
+    """
+    Função para converter as colunas de um dataframe carregado para os tipos do schema, como o
+    BigQuery guarda os dados
+
+    Args:
+        df (pd.DataFrame): Dados carregados
+        schema (list): Schema da carga, com os bigquery.SchemaField
+
+    Returns:
+        pd.DataFrame: Dados com os tipos do schema
+    """
+    df = df.copy()
+    for field in schema or []:
+        if field.name not in df.columns:
+            continue
+        kind = field.field_type.upper()
+        if kind in ("DATE", "DATETIME", "TIMESTAMP"):
+            df[field.name] = pd.to_datetime(df[field.name])
+        elif kind in ("INTEGER", "INT64"):
+            df[field.name] = df[field.name].astype("Int64")
+        elif kind in ("FLOAT", "FLOAT64", "NUMERIC"):
+            df[field.name] = df[field.name].astype("float64")
+        elif kind in ("BOOLEAN", "BOOL"):
+            df[field.name] = df[field.name].astype("boolean")
+        else:
+            df[field.name] = df[field.name].astype("string")
+    return df
+
+
+def _not_distinct(a, b) -> bool:
+    """
+    Função para comparar dois valores como o IS NOT DISTINCT FROM do BigQuery
+
+    Returns:
+        bool: True se os valores são iguais ou se ambos são nulos
+    """
+    if pd.isna(a) or pd.isna(b):
+        return pd.isna(a) and pd.isna(b)
+    return a == b
+
+
+def _day(value):
+    """
+    Função para truncar um valor de uma coluna de partição TIMESTAMP ou DATETIME no seu dia,
+    como TIMESTAMP_TRUNC(<coluna>, DAY)
+    """
+    return None if pd.isna(value) else pd.Timestamp(value).normalize()
+
+
+def _value(value):
+    """
+    Função para comparar um valor de uma coluna de partição DATE como ele é
+    """
+    return value
+
+
+def _equal(a, b) -> bool:
+    """
+    Função para comparar dois valores como o = do BigQuery, em que nulos nunca são iguais
+
+    Returns:
+        bool: True se os valores não são nulos e são iguais
+    """
+    return not pd.isna(a) and not pd.isna(b) and a == b
+
+
+class FakeBigQueryClient(_FakeBackend):
+    def __init__(self, latency: float = 0.0, keep_rows: bool = False) -> None:
+        """
+        Inicialização da classe
+
+        Cliente do BigQuery falso: aceita as cargas e consome os dados como o cliente real
+        (o dataframe é convertido para parquet e os arquivos são lidos até o fim), sem enviar
+        nada. As linhas carregadas em cada tabela ficam em self.tables e as queries em
+        self.queries
+
+        Com keep_rows, os dados carregados ficam em memória, em self.rows, e as queries geradas
+        pelo bigquery.BigQueryLoader (DELETE e INSERT da troca de partições e o MERGE dos deltas)
+        são aplicadas a eles, para os testes verificarem as linhas finais de cada tabela
+
+        Args:
+            latency (float): Tempo em segundos de cada ida e volta HTTP
+            keep_rows (bool): Se True, guarda os dados das tabelas e aplica as queries
+        """
+        super().__init__(latency)
+        self.tables = Counter()
+        self.bytes_loaded = 0
+        self.keep_rows = keep_rows
+        self.rows = {}
+        self.queries = []
+
+    def _loaded(self, table_id: str, rows: int, size: int) -> FakeJob:
+        with self._lock:
+            self.tables[table_id.split("$")[0]] += rows
+            self.bytes_loaded += size
+        return FakeJob(rows)
+
+    def _store(self, df: pd.DataFrame, table_id: str, job_config) -> None:
+        """
+        Função para guardar os dados de uma carga, na tabela inteira ou em uma partição
+        (<tabela>$<AAAAMMDD>)
+
+        Args:
+            df (pd.DataFrame): Dados carregados
+            table_id (str): Nome da tabela, com o decorator da partição
+            job_config (bigquery.LoadJobConfig): Configuração da carga
+        """
+        if not self.keep_rows:
+            return
+        df = _typed(df, getattr(job_config, "schema", None))
+        table, _, partition = table_id.partition("$")
+        with self._lock:
+            if getattr(job_config, "write_disposition", None) == "WRITE_APPEND":
+                df = pd.concat([self.rows[table], df], ignore_index=True)
+            elif partition:
+                field = job_config.time_partitioning.field
+                current = self.rows.get(table, df.iloc[0:0])
+                kept = current[current[field].dt.strftime("%Y%m%d") != partition]
+                df = pd.concat([kept, df], ignore_index=True)
+            self.rows[table] = df.reset_index(drop=True)
+
+    def load_table_from_dataframe(self, df, table_id: str, job_config=None) -> FakeJob:
+        self.round_trip()
+        self.count("load_table_from_dataframe")
+        # The real client serializes the dataframe to parquet before uploading it
+        buffer = BytesIO()
+        df.to_parquet(buffer, index=False)
+        self._store(df, table_id, job_config)
+        return self._loaded(table_id, len(df), buffer.tell())
+
+    def load_table_from_file(self, file_obj, table_id: str, job_config=None) -> FakeJob:
+        self.round_trip()
+        self.count("load_table_from_file")
+        source_format = getattr(job_config, "source_format", None)
+        if source_format == "PARQUET":
+            import pyarrow.parquet as pq
+
+            content = file_obj.read()
+            rows = pq.ParquetFile(BytesIO(content)).metadata.num_rows
+            if self.keep_rows:
+                self._store(pq.read_table(BytesIO(content)).to_pandas(), table_id, job_config)
+            return self._loaded(table_id, rows, len(content))
+
+        size = 0
+        lines = 0
+        chunks = []
+        while True:
+            chunk = file_obj.read(1024 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+            if self.keep_rows:
+                chunks.append(chunk)
+        skip = getattr(job_config, "skip_leading_rows", None) or 0
+        if self.keep_rows:
+            # BigQuery matches csv columns to the schema by position, not by the header
+            names = [field.name for field in getattr(job_config, "schema", None) or []]
+            content = BytesIO(b"".join(chunks))
+            if names:
+                df = pd.read_csv(content, header=None, skiprows=skip, names=names)
+            else:
+                df = pd.read_csv(content)
+            self._store(df, table_id, job_config)
+        return self._loaded(table_id, max(lines - skip, 0), size)
+
+    def create_table(self, table, exists_ok: bool = False):
+        self.round_trip()
+        self.count("create_table")
+        return table
+
+    def delete_table(self, table, not_found_ok: bool = False) -> None:
+        self.round_trip()
+        self.count("delete_table")
+        with self._lock:
+            self.rows.pop(table, None)
+
+    def query(self, query: str, job_config=None) -> FakeJob:
+        self.round_trip()
+        self.count("query")
+        with self._lock:
+            self.queries.append(query)
+        if self.keep_rows:
+            params = {
+                parameter.name: parameter.value
+                for parameter in getattr(job_config, "query_parameters", None) or []
+            }
+            with self._lock:
+                if "MERGE" in query:
+                    self._merge(query, params)
+                elif "DELETE FROM" in query:
+                    self._replace_rows(query, params)
+        return FakeJob(0)
+
+    def _replace_rows(self, query: str, params: dict) -> None:
+        """
+        Função para aplicar o DELETE e o INSERT da troca de linhas de uma tabela pela staging
+
+        Args:
+            query (str): Query gerada por BigQueryLoader._replace_rows
+            params (dict): Parâmetros da query, ex: {"owner": <content owner>}
+        """
+        table = re.search(r"DELETE FROM `([^`]+)`", query).group(1)
+        where = re.search(r"WHERE (.*?);", query, re.S).group(1)
+        insert = re.search(
+            r"INSERT INTO `[^`]+` \((.*?)\)\s*SELECT .*? FROM `([^`]+)`;", query, re.S
+        )
+        columns = re.findall(r"`(\w+)`", insert.group(1))
+        staging = self.rows[insert.group(2)][columns]
+
+        current = self.rows.get(table, staging.iloc[0:0])
+        deleted = np.ones(len(current), dtype=bool)
+        for trunc, column, source in re.findall(
+            r"(\w+_TRUNC\()?`(\w+)`(?:, DAY\))? IN \(SELECT DISTINCT \S+ FROM `([^`]+)`\)", where
+        ):
+            day = _day if trunc else _value
+            values = {day(value) for value in self.rows[source][column].dropna()}
+            deleted &= np.array([day(value) in values for value in current[column]], dtype=bool)
+        for column, name in re.findall(r"`(\w+)` = @(\w+)", where):
+            deleted &= np.array(
+                [_equal(value, params[name]) for value in current[column]], dtype=bool
+            )
+        self.rows[table] = pd.concat([current[~deleted], staging], ignore_index=True)
+
+    def _merge(self, query: str, params: dict) -> None:
+        """
+        Função para aplicar o MERGE de uma staging de delta na tabela, linha a linha
+
+        Args:
+            query (str): Query gerada por BigQueryLoader.merge_files
+            params (dict): Parâmetros da query, ex: {"owner": <content owner>}
+        """
+        table = re.search(r"MERGE `([^`]+)` T", query).group(1)
+        staging = self.rows[re.search(r"USING `([^`]+)` S", query).group(1)]
+        partitions = set()
+        declare = re.search(
+            r"ARRAY_AGG\(DISTINCT (\w+_TRUNC\()?`(\w+)`(?:, DAY\))?\) FROM `([^`]+)`", query
+        )
+        # Partitions of TIMESTAMP and DATETIME columns are compared by day
+        day = _value
+        if declare:
+            trunc, column, source = declare.groups()
+            day = _day if trunc else _value
+            partitions = {day(value) for value in self.rows[source][column].dropna()}
+
+        on = re.search(r"\bON (.*?)\s+WHEN", query, re.S).group(1)
+        keys = re.findall(r"T\.`(\w+)` IS NOT DISTINCT FROM S\.`(\w+)`", on)
+        equals = re.findall(r"T\.`(\w+)` = S\.`(\w+)`", on)
+        pruned = re.findall(r"(?:\w+_TRUNC\()?T\.`(\w+)`(?:, DAY\))? IN UNNEST\(partitions\)", on)
+        scoped = re.findall(r"T\.`(\w+)` = @(\w+)", on)
+        operation, delete = re.search(
+            r"WHEN MATCHED AND S\.`(\w+)` = '(\w+)' THEN DELETE", query
+        ).groups()
+        updates = re.findall(
+            r"`(\w+)` = S\.`(\w+)`", re.search(r"UPDATE SET (.*?)\n", query).group(1)
+        )
+        insert, names = re.search(
+            r"WHEN NOT MATCHED AND S\.`\w+` = '(\w+)' THEN INSERT \((.*?)\)", query
+        ).groups()
+        columns = re.findall(r"`(\w+)`", names)
+
+        current = self.rows.get(table)
+        target = [] if current is None else current.to_dict("records")
+        deleted = set()
+        for source in staging.to_dict("records"):
+            matched = [
+                i
+                for i, row in enumerate(target)
+                if i not in deleted
+                and all(_not_distinct(row[t], source[s]) for t, s in keys)
+                and all(_equal(row[t], source[s]) for t, s in equals)
+                and all(day(row[column]) in partitions for column in pruned)
+                and all(_equal(row[column], params[name]) for column, name in scoped)
+            ]
+            if matched and source[operation] == delete:
+                deleted.update(matched)
+            elif matched:
+                for i in matched:
+                    target[i].update({t: source[s] for t, s in updates})
+            elif source[operation] == insert:
+                target.append({column: source[column] for column in columns})
+
+        df = pd.DataFrame(
+            [row for i, row in enumerate(target) if i not in deleted],
+            columns=columns if current is None else current.columns,
+        )
+        self.rows[table] = df if current is None else df.astype(current.dtypes.to_dict())
@@ -0,0 +1,186 @@
+import os
+import string
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+
+# Schema of the processed revenue report, as declared in TABLES.reports.schema
+REPORT_SCHEMA = [
+    {"name": "date", "type": "DATE"},
+    {"name": "channel_id", "type": "STRING"},
+    {"name": "video_id", "type": "STRING"},
+    {"name": "claimed_status", "type": "STRING"},
+    {"name": "uploader_type", "type": "STRING"},
+    {"name": "country_code", "type": "STRING"},
+    {"name": "ad_impressions", "type": "INTEGER"},
+    {"name": "estimated_cpm", "type": "FLOAT"},
+    {"name": "estimated_youtube_ad_revenue", "type": "FLOAT"},
+    {"name": "is_self_uploaded", "type": "BOOLEAN"},
+]
+
+TABLES = {
+    "reports": {"name": "benchmark.dataset.reports", "schema": REPORT_SCHEMA},
+    "channels": {
+        "name": "benchmark.dataset.channels",
+        "schema": [{"name": "id", "type": "STRING"}, {"name": "name", "type": "STRING"}],
+    },
+    "videos": {
+        "name": "benchmark.dataset.videos",
+        "schema": [
+            {"name": "id", "type": "STRING"},
+            {"name": "name", "type": "STRING"},
+            {"name": "categoryId", "type": "STRING"},
+        ],
+    },
+    "video_categories": {
+        "name": "benchmark.dataset.video_categories",
+        "schema": [{"name": "id", "type": "STRING"}, {"name": "name", "type": "STRING"}],
+    },
+}
+
+# Most of the revenue comes from a few countries
+_COUNTRIES = ["US", "BR", "IN", "GB", "DE", "MX", "FR", "JP", "CA", "ES", "IT", "AR", "CO", "PT"]
+_COUNTRY_WEIGHTS = np.array([30, 20, 12, 6, 5, 5, 4, 4, 3, 3, 3, 2, 2, 1], dtype=float)
+_CATEGORIES = ["1", "2", "10", "15", "17", "20", "22", "23", "24", "25", "26", "27", "28"]
+_ID_ALPHABET = np.array(list(string.ascii_letters + string.digits + "-_"))
+# Rows are generated and written in chunks to keep memory bounded for large reports
+_CHUNK_ROWS = 500000
+
+
+def _random_ids(rng: np.random.Generator, size: int, length: int, prefix: str = "") -> np.array:
+    """
+    Função para gerar ids no formato dos ids do Youtube
+
+    Args:
+        rng (np.random.Generator): Gerador de números aleatórios
+        size (int): Número de ids
+        length (int): Número de caracteres de cada id, sem o prefixo
+        prefix (str): Prefixo dos ids, ex: UC para canais
+
+    Returns:
+        np.array: Array com os ids
+    """
+    chars = _ID_ALPHABET[rng.integers(0, len(_ID_ALPHABET), size=(size, length))]
+    return np.array([prefix + "".join(row) for row in chars])
+
+
+class Catalog:
+    def __init__(self, videos: int = 50000, channels: int = 200, seed: int = 0) -> None:
+        """
+        Inicialização da classe
+
+        Catálogo sintético de canais e vídeos de um content owner, compartilhado pelo gerador
+        de relatórios e pela API de dados falsa. A popularidade dos vídeos segue uma
+        distribuição de Zipf, então poucos vídeos concentram a maior parte das linhas
+
+        Args:
+            videos (int): Número de vídeos
+            channels (int): Número de canais
+            seed (int): Semente dos números aleatórios
+        """
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.channel_ids = _random_ids(rng, channels, 22, "UC")
+        self.video_ids = _random_ids(rng, videos, 11)
+        self.video_channels = rng.integers(0, channels, size=videos)
+        self.video_categories = rng.choice(_CATEGORIES, size=videos)
+        self.self_uploaded = rng.random(videos) < 0.3
+        self.categories = {category: f"Category {category}" for category in _CATEGORIES}
+
+        popularity = 1 / np.arange(1, videos + 1) ** 1.1
+        self.video_weights = popularity / popularity.sum()
+
+    def video_title(self, index: int) -> str:
+        """
+        Função para montar o título de um vídeo
+
+        Args:
+            index (int): Posição do vídeo no catálogo
+
+        Returns:
+            str: Título do vídeo
+        """
+        return f"Video {index} of channel {self.video_channels[index]}"
+
+
+def _generate_rows(
+    catalog: Catalog, report_date: date, rows: int, rng: np.random.Generator
+) -> pd.DataFrame:
+    """
+    Função para gerar as linhas de um relatório raw de receita
+
+    Args:
+        catalog (Catalog): Catálogo de canais e vídeos
+        report_date (date): Data do relatório
+        rows (int): Número de linhas
+        rng (np.random.Generator): Gerador de números aleatórios
+
+    Returns:
+        pd.DataFrame: Linhas do relatório raw
+    """
+    videos = rng.choice(len(catalog.video_ids), size=rows, p=catalog.video_weights)
+    countries = rng.choice(
+        len(_COUNTRIES), size=rows, p=_COUNTRY_WEIGHTS / _COUNTRY_WEIGHTS.sum()
+    )
+    return pd.DataFrame(
+        {
+            "date": int(report_date.strftime("%Y%m%d")),
+            "channel_id": catalog.channel_ids[catalog.video_channels[videos]],
+            "video_id": catalog.video_ids[videos],
+            "claimed_status": np.where(rng.random(rows) < 0.8, "claimed", "not_claimed"),
+            "uploader_type": np.where(catalog.self_uploaded[videos], "self", "thirdParty"),
+            "country_code": np.array(_COUNTRIES)[countries],
+            "ad_impressions": rng.geometric(0.01, size=rows),
+            "estimated_cpm": np.round(rng.lognormal(0.5, 0.8, size=rows), 6),
+        }
+    )
+
+
+def generate_report(path: str, catalog: Catalog, report_date: date, rows: int) -> str:
+    """
+    Função para gravar um relatório raw de receita sintético, no formato servido pela API
+
+    Args:
+        path (str): Caminho do arquivo csv
+        catalog (Catalog): Catálogo de canais e vídeos
+        report_date (date): Data do relatório
+        rows (int): Número de linhas
+
+    Returns:
+        str: Caminho do arquivo csv
+    """
+    rng = np.random.default_rng([catalog.seed, report_date.toordinal()])
+    with open(path, "w", newline="") as fh:
+        for start in range(0, max(rows, 1), _CHUNK_ROWS):
+            size = min(_CHUNK_ROWS, rows - start)
+            df = _generate_rows(catalog, report_date, size, rng)
+            df.to_csv(fh, index=False, header=start == 0)
+    return path
+
+
+def generate_reports(
+    folder: str, catalog: Catalog, start_date: date, days: int, rows: int
+) -> list:
+    """
+    Função para gravar relatórios raw sintéticos de vários dias
+
+    Args:
+        folder (str): Caminho da pasta dos relatórios
+        catalog (Catalog): Catálogo de canais e vídeos
+        start_date (date): Data do primeiro relatório
+        days (int): Número de dias
+        rows (int): Número total de linhas, dividido entre os dias
+
+    Returns:
+        list: Lista de tuplas com a data e o caminho de cada relatório
+    """
+    os.makedirs(folder, exist_ok=True)
+    reports = []
+    for day in range(days):
+        report_date = start_date + timedelta(days=day)
+        path = f"{folder}/{report_date.strftime('%Y%m%d')}.csv"
+        # The remainder of the division goes to the first days
+        day_rows = rows // days + (1 if day < rows % days else 0)
+        reports.append((report_date, generate_report(path, catalog, report_date, day_rows)))
+    return reports
@@ -0,0 +1,538 @@
+"""
+Benchmarks offline da extração, com a API do Youtube Reporting, a API de dados e o BigQuery
+substituídos por serviços falsos e relatórios de receita sintéticos
+
+Os módulos e parâmetros criados depois da primeira versão são detectados, para que a mesma
+pasta benchmarks rode em commits anteriores e compare o antes e o depois. Os benchmarks que
+dependem de um módulo ausente são pulados
+
+Uso, a partir da raiz do repositório:
+    python -m benchmarks.run --rows 1000000 --days 30 --output bench.json
+    python -m benchmarks.run --rows 1000000 --days 30 --compare bench.json
+"""
+import argparse
+import glob
+import importlib
+import inspect
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+import pandas as pd
+import bigquery
+from reports import ReportsHandler
+from videos import VideosHandler
+from benchmarks import fakes, generator
+
+
+REPORT_NAME = "revenue"
+CONTENT_OWNER = "benchmark-owner"
+
+logger = logging.getLogger("benchmarks")
+
+
+def _optional_import(name: str):
+    """
+    Função para importar um módulo que pode não existir no commit medido
+
+    Args:
+        name (str): Nome do módulo
+
+    Returns:
+        module: Módulo, ou None se ele não existe
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+storage = _optional_import("storage")
+backfill = _optional_import("backfill")
+batch = _optional_import("batch")
+cache = _optional_import("cache")
+manifest = _optional_import("manifest")
+
+# Modules and attributes each benchmark needs, besides the handlers of the first version
+REQUIREMENTS = {
+    "backfill": ["backfill", "manifest"],
+    "get_videos_cached": ["cache"],
+    "run_job": ["storage", "bigquery.BigQueryLoader"],
+    "load_files": ["bigquery.BigQueryLoader", "bigquery.load_files"],
+}
+
+
+def _missing(requirements: list) -> list:
+    """
+    Função para listar os requisitos de um benchmark que não existem no commit medido
+
+    Args:
+        requirements (list): Módulos ou atributos, ex: cache ou bigquery.load_files
+
+    Returns:
+        list: Requisitos ausentes
+    """
+    missing = []
+    for requirement in requirements:
+        name, _, attribute = requirement.partition(".")
+        module = _optional_import(name)
+        if module is None or (attribute and not hasattr(module, attribute)):
+            missing.append(requirement)
+    return missing
+
+
+def _supported(function, **kwargs) -> dict:
+    """
+    Função para manter apenas os parâmetros aceitos por uma função ou classe
+
+    Args:
+        function (Callable): Função ou classe chamada
+
+    Returns:
+        dict: Parâmetros aceitos
+    """
+    parameters = inspect.signature(function).parameters
+    return {key: value for key, value in kwargs.items() if key in parameters}
+
+
+def _list_files(folder: str, kind: str) -> list:
+    """
+    Função para listar os arquivos de um tipo, ex: processed, com ou sem o módulo storage
+
+    Args:
+        folder (str): Pasta dos relatórios
+        kind (str): Tipo do arquivo
+
+    Returns:
+        list: Caminhos ordenados dos arquivos
+    """
+    if storage is not None:
+        return storage.list_reports(folder, kind)
+    return sorted(glob.glob(f"{folder}/{kind}-*"))
+
+
+def _timed(function, *args, **kwargs) -> tuple:
+    """
+    Função para medir o tempo de execução de uma função
+
+    Args:
+        function (Callable): Função medida
+
+    Returns:
+        tuple: Tempo em segundos e retorno da função
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+class Benchmarks:
+    def __init__(self, args: argparse.Namespace, folder: str) -> None:
+        """
+        Inicialização da classe
+
+        Gera os relatórios sintéticos e cria os serviços falsos usados por todos os benchmarks
+
+        Args:
+            args (argparse.Namespace): Parâmetros da linha de comando
+            folder (str): Pasta temporária dos benchmarks
+        """
+        self._args = args
+        self._folder = folder
+        self._catalog = generator.Catalog(args.videos, args.channels, args.seed)
+        self._raw_reports = generator.generate_reports(
+            f"{folder}/server",
+            self._catalog,
+            date.fromisoformat(args.start_date),
+            args.days,
+            args.rows,
+        )
+        self._reporting = fakes.FakeReportingService(self._raw_reports, latency=args.latency)
+        self._data = fakes.FakeDataService(self._catalog, latency=args.latency)
+        self._bigquery = fakes.FakeBigQueryClient(latency=args.latency)
+        self._processed_folder = None
+
+    def _new_folder(self, name: str) -> str:
+        """
+        Função para criar uma pasta de relatórios vazia
+
+        O caminho é relativo à pasta dos benchmarks, que é a pasta de trabalho durante a
+        execução, pois versões anteriores gravam os arquivos em ./<pasta>
+
+        Args:
+            name (str): Nome da pasta
+
+        Returns:
+            str: Caminho da pasta
+        """
+        shutil.rmtree(name, ignore_errors=True)
+        os.makedirs(name)
+        return name
+
+    def _manifest(self, folder: str):
+        """
+        Função para criar o manifesto de uma pasta, quando o commit medido tem manifesto
+
+        Args:
+            folder (str): Pasta dos relatórios
+
+        Returns:
+            manifest.Manifest: Manifesto, ou None sem o módulo manifest
+        """
+        if manifest is None:
+            return None
+        return manifest.Manifest(f"{folder}/.manifest.sqlite3")
+
+    def _reports_handler(self, folder: str, report_manifest=None) -> ReportsHandler:
+        """
+        Função para criar o handler dos relatórios ligado à API falsa, com os parâmetros que a
+        versão medida do ReportsHandler aceita
+
+        Args:
+            folder (str): Pasta dos relatórios
+            report_manifest (manifest.Manifest): Manifesto com o estado dos relatórios
+
+        Returns:
+            ReportsHandler: Handler dos relatórios
+        """
+        return ReportsHandler(
+            self._reporting,
+            CONTENT_OWNER,
+            "benchmark-job",
+            "1970-01-01T00:00:00Z",
+            "1970-01-01",
+            generator.REPORT_SCHEMA,
+            REPORT_NAME,
+            folder,
+            **_supported(
+                ReportsHandler,
+                download_workers=self._args.download_workers,
+                http_factory=self._reporting.http,
+                manifest=report_manifest,
+                streaming=self._args.streaming,
+                file_format=self._args.format,
+            ),
+        )
+
+    def _videos_handler(self, metadata_cache=None) -> VideosHandler:
+        """
+        Função para criar o handler dos vídeos ligado à API falsa, com os parâmetros que a
+        versão medida do VideosHandler aceita
+
+        Args:
+            metadata_cache (cache.MetadataCache): Cache dos metadados de vídeos e categorias
+
+        Returns:
+            VideosHandler: Handler dos vídeos
+        """
+        executor = None
+        if batch is not None:
+            executor = batch.BatchExecutor(
+                self._data,
+                **_supported(
+                    batch.BatchExecutor,
+                    batch_size=self._args.batch_size,
+                    max_concurrent=self._args.concurrent_batches,
+                    http_factory=self._data.http,
+                ),
+            )
+        return VideosHandler(
+            self._data,
+            CONTENT_OWNER,
+            self._processed_folder,
+            **_supported(
+                VideosHandler,
+                cache=metadata_cache,
+                executor=executor,
+                scan_workers=self._args.scan_workers,
+            ),
+        )
+
+    def run_reports(self) -> dict:
+        """
+        Benchmark de ReportsHandler.run_reports: listagem, download e processamento
+        """
+        folder = self._new_folder("run_reports")
+        handler = self._reports_handler(folder, self._manifest(folder))
+        self._reporting.reset()
+        seconds, _ = _timed(handler.run_reports)
+        return {
+            "seconds": seconds,
+            "reports": len(_list_files(folder, "processed")),
+            **self._reporting.stats(),
+        }
+
+    def backfill(self) -> dict:
+        """
+        Benchmark do Backfill de todas as datas, com um shard por worker de download
+        """
+        folder = self._new_folder("backfill")
+        report_manifest = self._manifest(folder)
+        workers = self._args.download_workers
+        first, last = self._raw_reports[0][0], self._raw_reports[-1][0]
+        runner = backfill.Backfill(
+            self._reports_handler(folder, report_manifest),
+            report_manifest,
+            REPORT_NAME,
+            first.isoformat(),
+            last.isoformat(),
+            shard_days=-(-self._args.days // workers),
+            workers=workers,
+        )
+        self._reporting.reset()
+        seconds, failed = _timed(runner.run)
+        return {
+            "seconds": seconds,
+            "reports": len(_list_files(folder, "processed")),
+            "failed": len(failed),
+            **self._reporting.stats(),
+        }
+
+    def process_revenue_reports(self) -> dict:
+        """
+        Benchmark de ReportsHandler._process_revenue_reports, com os arquivos raw já baixados
+        """
+        folder = self._new_folder("process")
+        for report_date, path in self._raw_reports:
+            stem = f"{REPORT_NAME}-{report_date.strftime('%Y%m%d')}"
+            shutil.copyfile(path, f"{folder}/raw-{stem}.csv")
+
+        handler = self._reports_handler(folder)
+        seconds, _ = _timed(handler._process_revenue_reports)
+        self._processed_folder = folder
+        return {"seconds": seconds, "reports": len(self._raw_reports), "rows": self._args.rows}
+
+    def list_videos(self) -> dict:
+        """
+        Benchmark de VideosHandler._list_videos sobre os relatórios processados
+        """
+        seconds, video_ids = _timed(self._videos_handler()._list_videos)
+        return {"seconds": seconds, "videos": len(video_ids)}
+
+    def get_videos(self) -> dict:
+        """
+        Benchmark de VideosHandler.get_videos sem cache, todos os vídeos buscados na API
+        """
+        self._data.reset()
+        seconds, videos = _timed(self._videos_handler().get_videos)
+        return {"seconds": seconds, "videos": len(videos), **self._data.stats()}
+
+    def get_videos_cached(self) -> dict:
+        """
+        Benchmark de VideosHandler.get_videos com o cache de metadados já preenchido
+        """
+        path = f"{self._folder}/metadata.sqlite3"
+        if os.path.exists(path):
+            os.remove(path)
+        metadata_cache = cache.MetadataCache(path)
+        self._videos_handler(metadata_cache).get_videos()
+
+        self._data.reset()
+        seconds, videos = _timed(self._videos_handler(metadata_cache).get_videos)
+        return {"seconds": seconds, "videos": len(videos), **self._data.stats()}
+
+    def run_job(self) -> dict:
+        """
+        Benchmark de bigquery.run_job com os vídeos e com um relatório processado inteiro
+        """
+        bigquery._loader = bigquery.BigQueryLoader(client=self._bigquery)
+        videos = pd.DataFrame(self._videos_handler().get_videos())
+        report = storage.read_report(
+            _list_files(self._processed_folder, "processed")[0],
+            schema=generator.REPORT_SCHEMA,
+        )
+
+        self._bigquery.reset()
+        seconds, rows = _timed(
+            lambda: bigquery.run_job(videos, generator.TABLES["videos"])
+            + bigquery.run_job(report, generator.TABLES["reports"])
+        )
+        return {"seconds": seconds, "rows": rows, **self._bigquery.stats()}
+
+    def load_files(self) -> dict:
+        """
+        Benchmark de bigquery.load_files com todos os relatórios processados em um único job
+        """
+        bigquery._loader = bigquery.BigQueryLoader(client=self._bigquery)
+        files = _list_files(self._processed_folder, "processed")
+
+        self._bigquery.reset()
+        seconds, rows = _timed(bigquery.load_files, files, generator.TABLES["reports"])
+        return {"seconds": seconds, "rows": rows, **self._bigquery.stats()}
+
+
+# Benchmarks in execution order; the later ones use the files processed by
+# process_revenue_reports
+BENCHMARKS = [
+    "run_reports",
+    "backfill",
+    "process_revenue_reports",
+    "list_videos",
+    "get_videos",
+    "get_videos_cached",
+    "run_job",
+    "load_files",
+]
+
+
+def _git_commit() -> str:
+    """
+    Função para obter o commit atual do repositório
+
+    Returns:
+        str: Hash do commit, ou None fora de um repositório git
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> dict:
+    """
+    Função para executar os benchmarks
+
+    Cada benchmark é executado args.repeat vezes e o menor tempo é mantido
+
+    Args:
+        args (argparse.Namespace): Parâmetros da linha de comando
+
+    Returns:
+        dict: Resultado dos benchmarks, com os parâmetros usados e o tempo de cada benchmark
+    """
+    folder = tempfile.mkdtemp(prefix="youtube-benchmarks-")
+    cwd = os.getcwd()
+    try:
+        # Earlier versions keep LAST_DATE in ./config.json and write to ./<report folder>
+        os.chdir(folder)
+        with open("config.json", "w") as jsonfile:
+            json.dump({"REPORTING": {"LAST_DATE": "1970-01-01T00:00:00Z"}}, jsonfile)
+        logger.info(f"Generating {args.rows} rows across {args.days} days in {folder}")
+        benchmarks = Benchmarks(args, folder)
+
+        results = {}
+        for name in BENCHMARKS:
+            missing = _missing(REQUIREMENTS.get(name, []))
+            if missing:
+                logger.info(f"{name}: skipped, missing {', '.join(missing)}")
+                continue
+            runs = [getattr(benchmarks, name)() for _ in range(args.repeat)]
+            best = min(runs, key=lambda result: result["seconds"])
+            results[name] = {**best, "runs": [result["seconds"] for result in runs]}
+            logger.info(f"{name}: {best['seconds']:.3f}s")
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            logger.info(f"Benchmark files kept in {folder}")
+        else:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "params": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare", "tolerance", "keep", "verbose")
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Função para comparar o resultado dos benchmarks com um resultado anterior
+
+    Args:
+        results (dict): Resultado atual
+        baseline (dict): Resultado anterior, lido do json gravado com --output
+        tolerance (float): Razão máxima entre o tempo atual e o anterior
+
+    Returns:
+        list: Nomes dos benchmarks que ficaram mais lentos que a tolerância
+    """
+    if results["params"] != baseline["params"]:
+        logger.warning("Baseline was run with different parameters, ratios are not comparable")
+
+    regressions = []
+    for name, result in results["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        ratio = result["seconds"] / previous["seconds"] if previous["seconds"] else float("inf")
+        flag = "REGRESSION" if ratio > tolerance else ""
+        print(
+            f"{name:<25} {previous['seconds']:9.3f}s -> {result['seconds']:9.3f}s "
+            f"x{ratio:5.2f} {flag}"
+        )
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="total report rows")
+    parser.add_argument("--days", type=int, default=30, help="number of daily reports")
+    parser.add_argument("--videos", type=int, default=50000, help="videos in the catalog")
+    parser.add_argument("--channels", type=int, default=200, help="channels in the catalog")
+    parser.add_argument("--start-date", default="2022-01-01", help="date of the first report")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="seconds per fake HTTP round trip"
+    )
+    parser.add_argument("--download-workers", type=int, default=1)
+    parser.add_argument("--streaming", action="store_true")
+    formats = sorted(storage.EXTENSIONS) if storage is not None else ["csv"]
+    parser.add_argument("--format", choices=formats, default="csv")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--concurrent-batches", type=int, default=1)
+    parser.add_argument("--scan-workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="runs of each benchmark")
+    parser.add_argument("--output", help="json file where the results are written")
+    parser.add_argument("--compare", help="json file of a previous run to compare against")
+    parser.add_argument(
+        "--tolerance", type=float, default=1.2, help="max slowdown ratio before failing"
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the generated files")
+    parser.add_argument("--verbose", action="store_true", help="show the handlers' logs")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(argv)
+    # The handlers log every report and batch; keep only the benchmark lines by default
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s :: %(levelname)s :: %(message)s",
+    )
+    logger.setLevel(logging.INFO)
+
+    results = run(args)
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as jsonfile:
+            jsonfile.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r") as jsonfile:
+            baseline = json.load(jsonfile)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,642 @@
 from google.cloud import bigquery
+from io import BufferedReader, RawIOBase
+import compression
+from delta import OPERATION
+from metrics import METRICS
 import pandas as pd
+import storage
 import logging
+import os
+import re
+import tempfile
 
 
-def run_job(df: pd.DataFrame, table_info: dict) -> None:
+class _ConcatenatedCsv(RawIOBase):
+    def __init__(self, paths: list) -> None:
+        """
+        Arquivo somente leitura que concatena arquivos csv, mantendo apenas o cabeçalho do
+        primeiro arquivo
+
+        Args:
+            paths (list): Caminhos dos arquivos csv, todos com o mesmo cabeçalho
+        """
+        self._paths = list(paths)
+        self._fh = None
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def readinto(self, b) -> int:
+        while True:
+            if self._fh is None:
+                if not self._paths:
+                    return 0
+                first = self._position == 0
+                self._fh = compression.open_file(self._paths.pop(0), "rb")
+                if not first:
+                    self._fh.readline()
+
+            size = self._fh.readinto(b)
+            if size:
+                self._position += size
+                return size
+            self._fh.close()
+            self._fh = None
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        super().close()
+
+
+def _group_by_format(paths: list) -> dict:
+    """
+    Função para separar os arquivos pelo formato, já que cada formato é carregado em um job
+
+    Args:
+        paths (list): Caminhos dos arquivos
+
+    Returns:
+        dict: Dict com o formato (chave de storage.EXTENSIONS) e os seus arquivos, em ordem
+    """
+    groups = {}
+    for path in paths:
+        groups.setdefault(storage.get_report_format(path), []).append(path)
+    return groups
+
+
+# Functions that truncate a TIMESTAMP or DATETIME partition column to its daily partition
+_DAY_TRUNC = {"TIMESTAMP": "TIMESTAMP_TRUNC", "DATETIME": "DATETIME_TRUNC"}
+
+
+def _partition_day(table_info: dict, column: str) -> tuple:
+    """
+    Função para montar a expressão do dia da partição da coluna de partição, que pode ser
+    DATE, TIMESTAMP ou DATETIME
+
+    Args:
+        table_info (dict): Informações do schema e da coluna de partição (partition_field) da
+            tabela no BQ
+        column (str): Coluna na query, ex: T.`date`
+
+    Returns:
+        tuple: Expressão do dia e o seu tipo, ex: TIMESTAMP_TRUNC(T.`time`, DAY) e TIMESTAMP
+    """
+    types = {field["name"]: field["type"].upper() for field in table_info["schema"]}
+    field_type = types.get(table_info["partition_field"], "DATE")
+    if field_type in _DAY_TRUNC:
+        return f"{_DAY_TRUNC[field_type]}({column}, DAY)", field_type
+    return column, field_type
+
+
+class BigQueryLoader:
+    def __init__(self, client: bigquery.Client = None) -> None:
+        """
+        Inicialização da classe
+
+        Mantém um único cliente do BigQuery para todas as cargas da execução
+
+        Args:
+            client (bigquery.Client): Cliente do BigQuery. Se None, é criado no primeiro uso
+        """
+        self._client = client
+
+    @property
+    def client(self) -> bigquery.Client:
+        # Construct a BigQuery client object.
+        if self._client is None:
+            self._client = bigquery.Client()
+        return self._client
+
+    def load_dataframe(self, df: pd.DataFrame, table_info: dict) -> int:
+        """
+        Função para carregar um dataframe no BigQuery
+
+        Args:
+            df (pd.DataFrame): Dataframe de dados para inserção no BQ
+            table_info (dict): Informações do nome completo e do schema da tabela no BQ
+
+        Returns:
+            int: Número de linhas carregadas
+        """
+        with METRICS.stage("bigquery.load"):
+            if table_info.get("owner_field"):
+                # Shared tables only replace the rows of the content owner
+                staging_id = self._staging_id(table_info)
+                try:
+                    rows = self._load_table(df, {**table_info, "name": staging_id})
+                    self._replace_rows(staging_id, table_info)
+                finally:
+                    self._drop_table(staging_id)
+            elif table_info.get("partition_field"):
+                rows = self._load_partitions(df, table_info)
+            else:
+                rows = self._load_table(df, table_info)
+        METRICS.increment("bigquery.rows_loaded", rows)
+        return rows
+
+    def _load_table(self, df: pd.DataFrame, table_info: dict) -> int:
+        """
+        Função para carregar um dataframe em uma tabela, substituindo todo o seu conteúdo
+
+        Args:
+            df (pd.DataFrame): Dataframe de dados para inserção no BQ
+            table_info (dict): Informações do nome completo e do schema da tabela no BQ
+
+        Returns:
+            int: Número de linhas carregadas
+        """
+        table_id = table_info["name"]
+        job_config = bigquery.LoadJobConfig(
+            schema=format_schema(table_info["schema"]), write_disposition="WRITE_TRUNCATE"
+        )
+
+        job = self.client.load_table_from_dataframe(
+            df, table_id, job_config=job_config
+        )  # Make an API request.
+        METRICS.api_call("bigquery.jobs.load")
+
+        job.result()  # Wait for the job to complete.
+
+        logging.info("Loaded {} rows to {}".format(job.output_rows, table_id))
+        return job.output_rows
+
+    def _load_partitions(self, df: pd.DataFrame, table_info: dict) -> int:
+        """
+        Função para carregar um dataframe em uma tabela particionada por data, substituindo
+        apenas as partições presentes no dataframe
+
+        Cada partição é carregada com o decorator <tabela>$<AAAAMMDD> e WRITE_TRUNCATE, então
+        dias reprocessados são reescritos e os demais dias da tabela não são alterados
+
+        Args:
+            df (pd.DataFrame): Dataframe de dados para inserção no BQ
+            table_info (dict): Informações do nome completo, do schema e da coluna de partição
+                (partition_field) da tabela no BQ
+
+        Returns:
+            int: Número de linhas carregadas
+        """
+        table_id = table_info["name"]
+        partition_field = table_info["partition_field"]
+        job_config = bigquery.LoadJobConfig(
+            schema=format_schema(table_info["schema"]),
+            write_disposition="WRITE_TRUNCATE",
+            time_partitioning=self._create_partitioned_table(table_info),
+        )
+
+        rows = 0
+        partitions = pd.to_datetime(df[partition_field]).dt.strftime("%Y%m%d")
+        for partition, df_partition in df.groupby(partitions):
+            job = self.client.load_table_from_dataframe(
+                df_partition, f"{table_id}${partition}", job_config=job_config
+            )  # Make an API request.
+            METRICS.api_call("bigquery.jobs.load")
+
+            job.result()  # Wait for the job to complete.
+
+            logging.info(
+                "Loaded {} rows to partition {} of {}".format(
+                    job.output_rows, partition, table_id
+                )
+            )
+            rows += job.output_rows
+        return rows
+
+    def _create_partitioned_table(self, table_info: dict) -> bigquery.TimePartitioning:
+        """
+        Função para criar a tabela particionada por data, caso ela ainda não exista
+
+        Args:
+            table_info (dict): Informações do nome completo, do schema e da coluna de partição
+                (partition_field) da tabela no BQ
+
+        Returns:
+            bigquery.TimePartitioning: Particionamento da tabela
+        """
+        time_partitioning = bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.DAY, field=table_info["partition_field"]
+        )
+
+        # Partition decorators can only be loaded into an existing partitioned table
+        table = bigquery.Table(table_info["name"], schema=format_schema(table_info["schema"]))
+        table.time_partitioning = time_partitioning
+        self.client.create_table(table, exists_ok=True)  # Make an API request.
+        METRICS.api_call("bigquery.tables.insert")
+        return time_partitioning
+
+    def load_files(self, paths: list, table_info: dict) -> int:
+        """
+        Função para carregar arquivos de relatório (csv ou parquet) no BigQuery em um job por
+        formato, enviando os arquivos direto do disco, sem passar pelo pandas. Arquivos csv
+        comprimidos são descomprimidos aos poucos durante o envio
+
+        Em tabelas com partition_field ou owner_field, os arquivos são carregados em uma tabela
+        de staging e apenas as partições presentes nos arquivos, e apenas as linhas do content
+        owner, são substituídas na tabela final. A staging é removida depois da substituição
+
+        Args:
+            paths (list): Caminhos dos arquivos
+            table_info (dict): Informações do nome completo e do schema da tabela no BQ
+
+        Returns:
+            int: Número de linhas carregadas
+        """
+        if not paths:
+            return 0
+
+        scoped = table_info.get("partition_field") or table_info.get("owner_field")
+        destination = self._staging_id(table_info) if scoped else table_info["name"]
+
+        rows = 0
+        with METRICS.stage("bigquery.load"):
+            try:
+                # Files written before FORMAT changed are loaded in a job of their own
+                for i, (file_format, group) in enumerate(_group_by_format(paths).items()):
+                    # The jobs after the first one append to the table it truncated
+                    write_disposition = "WRITE_APPEND" if i else "WRITE_TRUNCATE"
+                    if file_format == "parquet":
+                        loaded = self._load_parquet_files(
+                            group, destination, table_info, write_disposition
+                        )
+                    else:
+                        loaded = self._load_csv_files(
+                            group, destination, table_info, write_disposition
+                        )
+                    logging.info(f"Loaded {loaded} rows from {len(group)} files to {destination}")
+                    rows += loaded
+
+                # A single replace, otherwise each format would replace the rows of the previous
+                # one
+                if scoped:
+                    self._replace_rows(destination, table_info)
+            finally:
+                if scoped:
+                    self._drop_table(destination)
+        METRICS.increment("bigquery.rows_loaded", rows)
+        return rows
+
+    def _load_csv_files(
+        self,
+        paths: list,
+        table_id: str,
+        table_info: dict,
+        write_disposition: str = "WRITE_TRUNCATE",
+    ) -> int:
+        """
+        Função para carregar arquivos csv em uma tabela, em um job por cabeçalho dos arquivos
+
+        Args:
+            paths (list): Caminhos dos arquivos csv
+            table_id (str): Nome completo da tabela de destino
+            table_info (dict): Informações do schema da tabela no BQ
+            write_disposition (str): WRITE_TRUNCATE substitui o conteúdo da tabela e
+                WRITE_APPEND adiciona as linhas
+
+        Returns:
+            int: Número de linhas carregadas
+        """
+        # CSV columns are matched by position, so the schema follows the file header. Files
+        # written with another column order are loaded in a job of their own
+        groups = {}
+        for path in paths:
+            with compression.open_file(path, "rt") as fh:
+                header = tuple(fh.readline().strip().split(","))
+            groups.setdefault(header, []).append(path)
+        if len(groups) > 1:
+            logging.info(f"Loading {len(paths)} csv files with {len(groups)} headers to {table_id}")
+
+        types = {column["name"]: column["type"] for column in table_info["schema"]}
+        rows = 0
+        for i, (header, group) in enumerate(groups.items()):
+            job_config = bigquery.LoadJobConfig(
+                schema=format_schema([{"name": name, "type": types[name]} for name in header]),
+                source_format=bigquery.SourceFormat.CSV,
+                skip_leading_rows=1,
+                # The jobs after the first one append to the table it loaded
+                write_disposition="WRITE_APPEND" if i else write_disposition,
+            )
+            with BufferedReader(_ConcatenatedCsv(group)) as stream:
+                job = self.client.load_table_from_file(
+                    stream, table_id, job_config=job_config
+                )  # Make an API request.
+                METRICS.api_call("bigquery.jobs.load")
+
+                job.result()  # Wait for the job to complete.
+            rows += job.output_rows
+
+        return rows
+
+    def _load_parquet_files(
+        self,
+        paths: list,
+        table_id: str,
+        table_info: dict,
+        write_disposition: str = "WRITE_TRUNCATE",
+    ) -> int:
+        """
+        Função para carregar arquivos parquet em uma tabela em um único job
+
+        Vários arquivos são unidos, grupo de linhas a grupo de linhas, em um arquivo temporário
+
+        Args:
+            paths (list): Caminhos dos arquivos parquet
+            table_id (str): Nome completo da tabela de destino
+            table_info (dict): Informações do schema da tabela no BQ
+            write_disposition (str): WRITE_TRUNCATE substitui o conteúdo da tabela e
+                WRITE_APPEND adiciona as linhas
+
+        Returns:
+            int: Número de linhas carregadas
+        """
+        import pyarrow.parquet as pq
+
+        job_config = bigquery.LoadJobConfig(
+            schema=format_schema(table_info["schema"]),
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=write_disposition,
+        )
+
+        path = paths[0]
+        if len(paths) > 1:
+            fd, path = tempfile.mkstemp(suffix=".parquet")
+            os.close(fd)
+            writer = None
+            for file in paths:
+                parquet_file = pq.ParquetFile(file)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, parquet_file.schema_arrow)
+                for i in range(parquet_file.num_row_groups):
+                    writer.write_table(parquet_file.read_row_group(i))
+            writer.close()
+
+        try:
+            with open(path, "rb") as fh:
+                job = self.client.load_table_from_file(
+                    fh, table_id, job_config=job_config
+                )  # Make an API request.
+                METRICS.api_call("bigquery.jobs.load")
+
+                job.result()  # Wait for the job to complete.
+        finally:
+            if len(paths) > 1:
+                os.remove(path)
+
+        return job.output_rows
+
+    def _staging_id(self, table_info: dict, suffix: str = "staging") -> str:
+        """
+        Função para montar o nome da tabela de staging de uma tabela
+
+        Em tabelas compartilhadas entre content owners, cada content owner tem a sua staging,
+        para que cargas simultâneas não se sobrescrevam
+
+        Args:
+            table_info (dict): Informações do nome completo da tabela no BQ, da coluna do content
+                owner (owner_field) e do content owner (owner)
+            suffix (str): Sufixo do nome da staging
+
+        Returns:
+            str: Nome completo da tabela de staging
+        """
+        staging_id = f"{table_info['name']}_{suffix}"
+        if table_info.get("owner_field"):
+            staging_id += "_" + re.sub(r"\W", "_", table_info["owner"])
+        return staging_id
+
+    def _replace_rows(self, staging_id: str, table_info: dict) -> None:
+        """
+        Função para substituir na tabela final as linhas presentes na tabela de staging
+
+        São substituídas as partições presentes na staging (partition_field) e, em tabelas
+        compartilhadas (owner_field), apenas as linhas do content owner
+
+        Args:
+            staging_id (str): Nome completo da tabela de staging
+            table_info (dict): Informações do nome completo, do schema, da coluna de partição
+                (partition_field), da coluna do content owner (owner_field) e do content owner
+                (owner) da tabela no BQ
+        """
+        table_id = table_info["name"]
+        partition_field = table_info.get("partition_field")
+        owner_field = table_info.get("owner_field")
+        self._create_table(table_info)
+
+        conditions = []
+        if partition_field:
+            day, _ = _partition_day(table_info, f"`{partition_field}`")
+            conditions.append(f"{day} IN (SELECT DISTINCT {day} FROM `{staging_id}`)")
+        if owner_field:
+            conditions.append(f"`{owner_field}` = @owner")
+
+        columns = ", ".join(f"`{column['name']}`" for column in table_info["schema"])
+        where = " AND ".join(conditions)
+        query = f"""
+            BEGIN TRANSACTION;
+            DELETE FROM `{table_id}`
+            WHERE {where};
+            INSERT INTO `{table_id}` ({columns})
+            SELECT {columns} FROM `{staging_id}`;
+            COMMIT TRANSACTION;
+        """
+        self.client.query(
+            query, job_config=self._owner_job_config(table_info)
+        ).result()  # Make an API request.
+        METRICS.api_call("bigquery.jobs.query")
+        logging.info(f"Replaced rows of {table_id} from {staging_id}")
+
+    def _drop_table(self, table_id: str) -> None:
+        """
+        Função para remover uma tabela de staging depois do seu uso, para que ela não fique no
+        dataset
+
+        Args:
+            table_id (str): Nome completo da tabela
+        """
+        self.client.delete_table(table_id, not_found_ok=True)  # Make an API request.
+        METRICS.api_call("bigquery.tables.delete")
+
+    def _create_table(self, table_info: dict) -> None:
+        """
+        Função para criar a tabela final, caso ela ainda não exista
+
+        Args:
+            table_info (dict): Informações do nome completo, do schema e da coluna de partição
+                (partition_field) da tabela no BQ
+        """
+        if table_info.get("partition_field"):
+            self._create_partitioned_table(table_info)
+            return
+        table = bigquery.Table(table_info["name"], schema=format_schema(table_info["schema"]))
+        self.client.create_table(table, exists_ok=True)  # Make an API request.
+        METRICS.api_call("bigquery.tables.insert")
+
+    def _owner_job_config(self, table_info: dict) -> bigquery.QueryJobConfig:
+        """
+        Função para montar a configuração das queries com o parâmetro @owner das tabelas
+        compartilhadas
+
+        Args:
+            table_info (dict): Informações da coluna do content owner (owner_field) e do content
+                owner (owner) da tabela no BQ
+
+        Returns:
+            bigquery.QueryJobConfig: Configuração da query, ou None em tabelas não compartilhadas
+        """
+        if not table_info.get("owner_field"):
+            return None
+        return bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("owner", "STRING", table_info["owner"])]
+        )
+
+    def merge_files(self, paths: list, table_info: dict, key_columns: list) -> int:
+        """
+        Função para aplicar arquivos de delta (linhas inseridas, alteradas e removidas) na tabela
+        com um MERGE, sem recarregar os relatórios inteiros
+
+        Os arquivos são carregados em uma tabela de staging e cada linha é comparada com a
+        tabela final pelas colunas da chave, apenas nas partições presentes nos arquivos e nas
+        linhas do content owner. A staging é removida depois do MERGE
+
+        Args:
+            paths (list): Caminhos dos arquivos de delta
+            table_info (dict): Informações do nome completo, do schema, da coluna de partição
+                (partition_field) e da coluna do content owner (owner_field) da tabela no BQ
+            key_columns (list): Colunas que identificam uma linha
+
+        Returns:
+            int: Número de linhas do delta
+        """
+        if not paths:
+            return 0
+
+        table_id = table_info["name"]
+        staging_id = self._staging_id(table_info, "delta")
+        staging_info = {
+            **table_info,
+            "schema": table_info["schema"] + [{"name": OPERATION, "type": "STRING"}],
+        }
+        with METRICS.stage("bigquery.merge"):
+            rows = 0
+            for i, (file_format, group) in enumerate(_group_by_format(paths).items()):
+                write_disposition = "WRITE_APPEND" if i else "WRITE_TRUNCATE"
+                if file_format == "parquet":
+                    rows += self._load_parquet_files(
+                        group, staging_id, staging_info, write_disposition
+                    )
+                else:
+                    rows += self._load_csv_files(group, staging_id, staging_info, write_disposition)
+            self._create_table(table_info)
+
+            partition_field = table_info.get("partition_field")
+            owner_field = table_info.get("owner_field")
+            # Keys may have nulls, which = never matches
+            conditions = [
+                f"T.`{column}` IS NOT DISTINCT FROM S.`{column}`" for column in key_columns
+            ]
+            declare = ""
+            if partition_field:
+                # A constant list of partitions lets BigQuery prune the target table
+                day, field_type = _partition_day(table_info, f"`{partition_field}`")
+                declare = (
+                    f"DECLARE partitions ARRAY<{field_type}> DEFAULT "
+                    f"(SELECT ARRAY_AGG(DISTINCT {day}) FROM `{staging_id}`);"
+                )
+                day, _ = _partition_day(table_info, f"T.`{partition_field}`")
+                conditions.append(f"{day} IN UNNEST(partitions)")
+            if owner_field:
+                conditions.append(f"T.`{owner_field}` = @owner")
+
+            columns = [column["name"] for column in table_info["schema"]]
+            on = " AND ".join(conditions)
+            updates = ", ".join(
+                f"`{column}` = S.`{column}`" for column in columns if column not in key_columns
+            )
+            names = ", ".join(f"`{column}`" for column in columns)
+            values = ", ".join(f"S.`{column}`" for column in columns)
+            query = f"""
+                {declare}
+                MERGE `{table_id}` T
+                USING `{staging_id}` S
+                ON {on}
+                WHEN MATCHED AND S.`{OPERATION}` = 'D' THEN DELETE
+                WHEN MATCHED THEN UPDATE SET {updates}
+                WHEN NOT MATCHED AND S.`{OPERATION}` = 'U' THEN INSERT ({names}) VALUES ({values})
+            """
+            try:
+                self.client.query(
+                    query, job_config=self._owner_job_config(table_info)
+                ).result()  # Make an API request.
+                METRICS.api_call("bigquery.jobs.query")
+            finally:
+                self._drop_table(staging_id)
+        logging.info(f"Merged {rows} changed rows from {len(paths)} files into {table_id}")
+        METRICS.increment("bigquery.rows_merged", rows)
+        return rows
+
+
+_loader = None
+
+
+def get_loader() -> BigQueryLoader:
+    """
+    Função para obter o loader compartilhado pela execução
+
+    Returns:
+        BigQueryLoader: Loader do BigQuery
+    """
+    global _loader
+    if _loader is None:
+        _loader = BigQueryLoader()
+    return _loader
+
+
+def run_job(df: pd.DataFrame, table_info: dict) -> int:
     """
     Função para rodar um job no BigQuery
 
     Args:
         df (pd.DataFrame): Dataframe de dados para inserção no BQ
         table_info (dict): Informações do nome completo e do schema da tabela no BQ
+
+    Returns:
+        int: Número de linhas carregadas
     """
-    # Construct a BigQuery client object.
-    client = bigquery.Client()
+    return get_loader().load_dataframe(df, table_info)
 
-    table_id = table_info["name"]
-    schema = format_schema(table_info["schema"])
 
-    job_config = bigquery.LoadJobConfig(
-        schema=schema, write_disposition="WRITE_TRUNCATE"
-    )
+def load_files(paths: list, table_info: dict) -> int:
+    """
+    Função para carregar arquivos de relatório no BigQuery em um único job
 
-    job = client.load_table_from_dataframe(
-        df, table_id, job_config=job_config
-    )  # Make an API request.
-    
-    job.result()  # Wait for the job to complete.
+    Args:
+        paths (list): Caminhos dos arquivos
+        table_info (dict): Informações do nome completo e do schema da tabela no BQ
 
-    table = client.get_table(table_id)  # Make an API request.
-    logging.info(
-        "Loaded {} rows and {} columns to {}".format(
-            table.num_rows, len(table.schema), table_id
-        )
-    )
+    Returns:
+        int: Número de linhas carregadas
+    """
+    return get_loader().load_files(paths, table_info)
+
+
+def merge_files(paths: list, table_info: dict, key_columns: list) -> int:
+    """
+    Função para aplicar arquivos de delta na tabela com um MERGE
+
+    Args:
+        paths (list): Caminhos dos arquivos de delta
+        table_info (dict): Informações do nome completo e do schema da tabela no BQ
+        key_columns (list): Colunas que identificam uma linha
+
+    Returns:
+        int: Número de linhas do delta
+    """
+    return get_loader().merge_files(paths, table_info, key_columns)
 
 
 def format_schema(schema_dict: dict) -> list:
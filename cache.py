@@ -0,0 +1,111 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+
+class MetadataCache:
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_entries: int = 100000) -> None:
+        """
+        Inicialização da classe
+
+        Cache local, em um arquivo SQLite, dos metadados retornados pela API de dados do
+        Youtube (vídeos e categorias), para não buscar novamente ids que não mudaram
+
+        Args:
+            path (str): Caminho do arquivo SQLite do cache
+            ttl (float): Tempo em segundos em que um item do cache é válido
+            max_entries (int): Número máximo de itens no cache. Os itens acessados há mais tempo
+                são removidos primeiro
+        """
+        self._path = path
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._execute(
+            """
+            CREATE TABLE IF NOT EXISTS metadata (
+                kind TEXT,
+                id TEXT,
+                value TEXT,
+                fetched_at REAL,
+                accessed_at REAL,
+                PRIMARY KEY (kind, id)
+            )
+            """
+        )
+
+    def _execute(self, query: str, params=(), many: bool = False) -> list:
+        """
+        Função para executar uma query no cache
+
+        Args:
+            query (str): Query SQL
+            params (tuple | list): Parâmetros da query, ou lista de parâmetros se many=True
+            many (bool): Se True, executa a query para cada item de params
+
+        Returns:
+            list: Linhas retornadas pela query
+        """
+        with self._lock, closing(sqlite3.connect(self._path, timeout=30)) as conn, conn:
+            if many:
+                conn.executemany(query, params)
+                return []
+            return conn.execute(query, params).fetchall()
+
+    def get_many(self, kind: str, ids: list) -> dict:
+        """
+        Função para buscar no cache os itens válidos de uma lista de ids
+
+        Args:
+            kind (str): Tipo do item, ex: video ou category
+            ids (list): Ids dos itens
+
+        Returns:
+            dict: Dict com o id e o valor de cada item encontrado e não expirado
+        """
+        now = time.time()
+        ids = [str(i) for i in ids]
+        found = {}
+        # SQLite limits the number of parameters of a query
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            rows = self._execute(
+                f"""
+                SELECT id, value FROM metadata
+                WHERE kind = ? AND fetched_at >= ? AND id IN ({','.join('?' * len(chunk))})
+                """,
+                (kind, now - self._ttl, *chunk),
+            )
+            found.update({id_: json.loads(value) for id_, value in rows})
+
+        self._execute(
+            "UPDATE metadata SET accessed_at = ? WHERE kind = ? AND id = ?",
+            [(now, kind, id_) for id_ in found],
+            many=True,
+        )
+        return found
+
+    def set_many(self, kind: str, items: dict) -> None:
+        """
+        Função para gravar itens no cache, removendo os mais antigos se o limite for atingido
+
+        Args:
+            kind (str): Tipo do item, ex: video ou category
+            items (dict): Dict com o id e o valor de cada item
+        """
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)",
+            [(kind, str(id_), json.dumps(value), now, now) for id_, value in items.items()],
+            many=True,
+        )
+        self._execute(
+            """
+            DELETE FROM metadata WHERE rowid IN (
+                SELECT rowid FROM metadata ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self._max_entries,),
+        )
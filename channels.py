@@ -1,18 +1,27 @@
 import logging
 import apiclient.discovery
+from batch import BatchExecutor
+from metrics import METRICS
 
 
 class ChannelsHandler:
-    def __init__(self, youtube_data: apiclient.discovery, content_owner_id: str) -> None:
+    def __init__(
+        self,
+        youtube_data: apiclient.discovery,
+        content_owner_id: str,
+        executor: BatchExecutor = None,
+    ) -> None:
         """
         Inicialização da classe
 
         Args:
             youtube_data (apiclient.discovery.object): Objeto da conexão com a API do Youtube
             content_owner_id (str): Id do content owner da conta do Youtube
+            executor (BatchExecutor): Executor das requisições da API
         """
         self._youtube_data = youtube_data
         self._content_owner_id = content_owner_id
+        self._executor = executor or BatchExecutor(youtube_data)
 
     def _save_channels(self, page_token: str, channels_list: list) -> str:
         """
@@ -31,7 +40,7 @@ class ChannelsHandler:
 
         # Second to last API executions, with page_token
         if page_token:
-            channels = (
+            channels = self._executor.execute_one(
                 self._youtube_data.channels()
                 .list(
                     onBehalfOfContentOwner=self._content_owner_id,
@@ -40,12 +49,11 @@ class ChannelsHandler:
                     part="snippet",
                     pageToken=page_token,
                 )
-                .execute()
             )
 
         # First API execution, without page_token
         else:
-            channels = (
+            channels = self._executor.execute_one(
                 self._youtube_data.channels()
                 .list(
                     onBehalfOfContentOwner=self._content_owner_id,
@@ -53,7 +61,6 @@ class ChannelsHandler:
                     maxResults=50,
                     part="snippet",
                 )
-                .execute()
             )
 
         for channel in channels["items"]:
@@ -70,12 +77,14 @@ class ChannelsHandler:
             list: Lista de canais do youtube
         """
         channels_list = []
-        page_token = self._save_channels(None, channels_list)
+        with METRICS.stage("channels.get"):
+            page_token = self._save_channels(None, channels_list)
 
-        logging.info("Started listing channels")
-        while page_token:
-            page_token = self._save_channels(page_token, channels_list)
+            logging.info("Started listing channels")
+            while page_token:
+                page_token = self._save_channels(page_token, channels_list)
 
         logging.info("Channels listed")
+        METRICS.increment("channels.listed", len(channels_list))
 
         return channels_list
@@ -0,0 +1,62 @@
+import gzip
+import io
+
+
+# Compressed files are recognized by the extension
+GZIP_EXTENSION = ".gz"
+ZSTD_EXTENSION = ".zst"
+# Level 6 keeps most of the ratio of level 9 at a fraction of the time
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _zstandard():
+    """
+    Função para importar o zstandard, dependência opcional usada apenas nos arquivos .zst
+
+    Returns:
+        module: Módulo zstandard
+    """
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Reports compressed with zstd need the zstandard package") from e
+    return zstandard
+
+
+def open_file(path: str, mode: str = "rb", newline: str = None):
+    """
+    Função para abrir um arquivo, comprimindo na escrita e descomprimindo na leitura aos poucos,
+    de acordo com a extensão (.gz ou .zst)
+
+    Args:
+        path (str): Caminho do arquivo
+        mode (str): Modo de abertura, ex: rb, wb, rt ou wt
+        newline (str): Separador de linhas dos modos texto
+
+    Returns:
+        IO: Arquivo aberto
+    """
+    text = "t" in mode
+    if path.endswith(GZIP_EXTENSION):
+        if text:
+            return gzip.open(path, mode, compresslevel=GZIP_LEVEL, newline=newline)
+        return gzip.open(path, mode, compresslevel=GZIP_LEVEL)
+
+    if path.endswith(ZSTD_EXTENSION):
+        zstandard = _zstandard()
+        binary_mode = mode.replace("t", "") + ("" if "b" in mode else "b")
+        if "r" in mode:
+            # The zstd reader has no readline, the buffer adds it
+            fh = io.BufferedReader(
+                zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+            )
+        else:
+            fh = zstandard.open(
+                path, binary_mode, cctx=zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+            )
+        return io.TextIOWrapper(fh, newline=newline) if text else fh
+
+    if text:
+        return open(path, mode, newline=newline)
+    return open(path, mode)
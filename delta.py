@@ -0,0 +1,210 @@
+import logging
+import os
+import pandas as pd
+from manifest import Manifest
+from metrics import METRICS
+import storage
+
+
+# Column with the operation of each delta row: U inserts or updates, D deletes
+OPERATION = "_op"
+# Column of the snapshots with the hash of the values of each row
+ROW_HASH = "_row_hash"
+_METRIC_TYPES = ("INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC")
+
+
+def get_key_columns(schema: list, key: list = None) -> list:
+    """
+    Função para obter as colunas que identificam uma linha do relatório
+
+    Args:
+        schema (list): Schema das colunas do relatório
+        key (list): Colunas da chave. Se None, todas as colunas que não são métricas numéricas
+
+    Returns:
+        list: Colunas da chave
+    """
+    if key:
+        return list(key)
+    return [column["name"] for column in schema if column["type"].upper() not in _METRIC_TYPES]
+
+
+def get_delta_schema(schema: list) -> list:
+    """
+    Função para montar o schema dos arquivos de delta
+
+    Args:
+        schema (list): Schema das colunas do relatório
+
+    Returns:
+        list: Schema do relatório com a coluna da operação
+    """
+    return schema + [{"name": OPERATION, "type": "STRING"}]
+
+
+def get_snapshot_schema(schema: list, key_columns: list) -> list:
+    """
+    Função para montar o schema dos snapshots
+
+    Args:
+        schema (list): Schema das colunas do relatório
+        key_columns (list): Colunas da chave
+
+    Returns:
+        list: Schema das colunas da chave com a coluna do hash dos valores
+    """
+    types = {column["name"]: column["type"] for column in schema}
+    return [{"name": name, "type": types.get(name, "STRING")} for name in key_columns] + [
+        {"name": ROW_HASH, "type": "INTEGER"}
+    ]
+
+
+def _hash_values(df: pd.DataFrame, key_columns: list) -> pd.Series:
+    """
+    Função para calcular o hash dos valores de cada linha, sem as colunas da chave
+
+    Args:
+        df (pd.DataFrame): Linhas do relatório
+        key_columns (list): Colunas da chave
+
+    Returns:
+        pd.Series: Hash de cada linha
+    """
+    values = df.drop(columns=key_columns)
+    # Integers read back with another downcast must hash the same
+    values = values.astype(
+        {
+            column: "float64" if pd.api.types.is_numeric_dtype(values[column]) else "string"
+            for column in values.columns
+        }
+    )
+    return pd.util.hash_pandas_object(values, index=False)
+
+
+def get_snapshot(df: pd.DataFrame, key_columns: list) -> pd.DataFrame:
+    """
+    Função para montar o snapshot de um relatório carregado: a chave e o hash dos valores de
+    cada linha, sem as métricas
+
+    Args:
+        df (pd.DataFrame): Linhas do relatório
+        key_columns (list): Colunas da chave
+
+    Returns:
+        pd.DataFrame: Colunas da chave e o hash dos valores
+    """
+    snapshot = df[key_columns].copy()
+    # Parquet and BigQuery have no unsigned 64-bit integers
+    snapshot[ROW_HASH] = _hash_values(df, key_columns).to_numpy().view("int64")
+    return snapshot
+
+
+def get_delta(
+    df: pd.DataFrame, snapshot: pd.DataFrame, key_columns: list
+) -> pd.DataFrame:
+    """
+    Função para calcular as linhas inseridas, alteradas e removidas de um relatório em relação
+    ao snapshot da versão carregada anteriormente
+
+    Args:
+        df (pd.DataFrame): Linhas da nova versão do relatório
+        snapshot (pd.DataFrame): Snapshot da versão carregada
+        key_columns (list): Colunas da chave
+
+    Returns:
+        pd.DataFrame: Linhas novas e alteradas com a operação U e chaves removidas com a
+            operação D, ou None quando a chave não identifica as linhas de forma única
+    """
+    if df.duplicated(key_columns).any() or snapshot.duplicated(key_columns).any():
+        logging.warning(f"Key {key_columns} is not unique, delta can not be computed")
+        return None
+
+    current = get_snapshot(df, key_columns)
+    current["_position"] = range(len(current))
+    merged = current.merge(
+        snapshot, on=key_columns, how="outer", suffixes=("", "_loaded"), indicator=True
+    )
+
+    changed = (merged["_merge"] == "left_only") | (
+        (merged["_merge"] == "both") & (merged[ROW_HASH] != merged[f"{ROW_HASH}_loaded"])
+    )
+    upserts = df.iloc[merged.loc[changed, "_position"].astype("int64").to_numpy()]
+    deletes = merged.loc[merged["_merge"] == "right_only", key_columns]
+    return pd.concat(
+        [upserts.assign(**{OPERATION: "U"}), deletes.assign(**{OPERATION: "D"})],
+        ignore_index=True,
+    )
+
+
+def write_delta(
+    file: str, snapshot_file: str, delta_file: str, schema: list, key_columns: list
+) -> int:
+    """
+    Função para gravar o delta de um relatório processado em relação ao snapshot carregado
+
+    Args:
+        file (str): Caminho do relatório processado
+        snapshot_file (str): Caminho do snapshot da versão carregada
+        delta_file (str): Caminho do arquivo de delta
+        schema (list): Schema das colunas do relatório
+        key_columns (list): Colunas da chave
+
+    Returns:
+        int: Número de linhas do delta, ou None quando ele não pode ser calculado
+    """
+    df = storage.read_report(file, schema=schema)
+    snapshot = storage.read_report(
+        snapshot_file, schema=get_snapshot_schema(schema, key_columns)
+    )
+    delta = get_delta(df, snapshot, key_columns)
+    if delta is None:
+        return None
+
+    with storage.ReportWriter(delta_file, get_delta_schema(schema)) as writer:
+        writer.write(delta)
+    logging.info(
+        f"Delta {delta_file} written: {len(delta)} changed rows of {len(df)} "
+        f"({(delta[OPERATION] == 'D').sum()} deleted)"
+    )
+    return len(delta)
+
+
+def write_snapshot(file: str, snapshot_file: str, schema: list, key_columns: list) -> None:
+    """
+    Função para gravar o snapshot de um relatório carregado
+
+    Args:
+        file (str): Caminho do relatório processado
+        snapshot_file (str): Caminho do snapshot
+        schema (list): Schema das colunas do relatório
+        key_columns (list): Colunas da chave
+    """
+    df = storage.read_report(file, schema=schema)
+    with storage.ReportWriter(snapshot_file, get_snapshot_schema(schema, key_columns)) as writer:
+        writer.write(get_snapshot(df, key_columns))
+
+
+def expire_snapshots(manifest: Manifest, date: str, report_name: str = None) -> int:
+    """
+    Função para remover os snapshots dos relatórios anteriores a uma data, que o Youtube não
+    reprocessa mais. Um relatório sem snapshot volta a ser carregado inteiro
+
+    Args:
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        date (str): Data limite do relatório, exclusiva, no formato AAAAMMDD
+        report_name (str): Nome do job dos relatórios. Se None, remove os snapshots de todos os
+            jobs do manifesto
+
+    Returns:
+        int: Número de snapshots removidos
+    """
+    reports = manifest.snapshots_before(date, report_name)
+    for report in reports:
+        if os.path.exists(report["snapshot_file"]):
+            os.remove(report["snapshot_file"])
+        manifest.mark_snapshot(report["report"], None)
+
+    if reports:
+        logging.info(f"Expired {len(reports)} snapshots of reports before {date}")
+    METRICS.increment("delta.snapshots_expired", len(reports))
+    return len(reports)
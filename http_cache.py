@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import threading
+
+
+class BoundedFileCache:
+    def __init__(
+        self,
+        folder: str,
+        max_bytes: int = 100 * 1024 * 1024,
+        max_entry_bytes: int = 5 * 1024 * 1024,
+    ) -> None:
+        """
+        Inicialização da classe
+
+        Cache em disco das respostas HTTP, usado pelo httplib2 para enviar If-None-Match com o
+        ETag das respostas anteriores e reaproveitar o conteúdo quando a API responde 304.
+        O tamanho total é limitado e as respostas acessadas há mais tempo são removidas primeiro
+
+        Args:
+            folder (str): Caminho da pasta do cache
+            max_bytes (int): Tamanho máximo em bytes de todo o cache
+            max_entry_bytes (int): Tamanho máximo em bytes de cada resposta guardada
+        """
+        self._folder = folder
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+    def _path(self, key: str) -> str:
+        """
+        Função para montar o caminho do arquivo de uma chave do cache
+
+        Args:
+            key (str): Chave do cache, a url da requisição
+
+        Returns:
+            str: Caminho do arquivo
+        """
+        return os.path.join(self._folder, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def get(self, key: str) -> bytes:
+        """
+        Função para buscar uma resposta no cache
+
+        Args:
+            key (str): Chave do cache, a url da requisição
+
+        Returns:
+            bytes: Resposta guardada, ou None se ela não está no cache
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "rb") as fh:
+                    value = fh.read()
+            except FileNotFoundError:
+                return None
+            # The modification time is used as the last access time for eviction
+            os.utime(path)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """
+        Função para guardar uma resposta no cache
+
+        Args:
+            key (str): Chave do cache, a url da requisição
+            value (bytes): Resposta, com os cabeçalhos
+        """
+        if len(value) > self._max_entry_bytes:
+            return
+
+        path = self._path(key)
+        with self._lock:
+            self._size -= self._remove(path)
+            with open(f"{path}.tmp", "wb") as fh:
+                fh.write(value)
+            os.replace(f"{path}.tmp", path)
+            self._size += len(value)
+            if self._size > self._max_bytes:
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        """
+        Função para remover uma resposta do cache
+
+        Args:
+            key (str): Chave do cache, a url da requisição
+        """
+        with self._lock:
+            self._size -= self._remove(self._path(key))
+
+    def _remove(self, path: str) -> int:
+        """
+        Função para remover o arquivo de uma resposta, se ele existir
+
+        Args:
+            path (str): Caminho do arquivo
+
+        Returns:
+            int: Tamanho em bytes do arquivo removido
+        """
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def _evict(self) -> None:
+        """
+        Função para remover as respostas acessadas há mais tempo até o cache caber no limite
+        """
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(self._folder)
+            if entry.is_file()
+        )
+        # Evict down to 90% of the limit so that the folder is not scanned on every write
+        for _, path in entries:
+            if self._size <= self._max_bytes * 0.9:
+                break
+            self._size -= self._remove(path)
+        logging.info(f"HTTP cache evicted down to {self._size} bytes")
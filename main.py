@@ -1,10 +1,10 @@
-from auth_service import get_authenticated_service
-from channels import ChannelsHandler
-from reports import ReportsHandler
-from videos import VideosHandler
-from bigquery import run_job
-import pandas as pd
+from timing import TIMER
+from manifest import Manifest
+from metrics import METRICS
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
 import datetime
+import functools
 import logging
 import json
 import os
@@ -15,84 +15,960 @@ logging.basicConfig(
 )
 
 # Read config file
-with open("config.json", "r") as jsonfile:
+with TIMER.stage("read config"), open("config.json", "r") as jsonfile:
     data = json.load(jsonfile)
     logging.info("Config file read successfully!")
 
 # Global Constants
-CONTENT_OWNER = data["CONTENT_OWNER"]
+CONTENT_OWNER = data.get("CONTENT_OWNER")
 CLIENT_SECRETS_FILE = data["AUTH"]["CLIENT_SECRETS_FILE"]
+CREDENTIALS_FILE = data["AUTH"].get("CREDENTIALS_FILE", "youtube-extraction.json")
 SCOPES = data["AUTH"]["SCOPES"]
+HTTP_CACHE = data["AUTH"].get("HTTP_CACHE")
+DISCOVERY_CACHE = data["AUTH"].get("DISCOVERY_CACHE", ".discovery_cache")
+MAX_PARALLEL_OWNERS = data.get("MAX_PARALLEL_OWNERS", os.cpu_count())
 
 # Reporting Constants
 REPORTING_API_SERVICE_NAME = data["AUTH"]["REPORTING_API_SERVICE_NAME"]
 REPORTING_API_VERSION = data["AUTH"]["REPORTING_API_VERSION"]
 REPORT_FOLDER = data["REPORTING"]["FOLDER"]
-REPORT_SCHEMA = data["TABLES"]["reports"]["schema"]
-REPORT_NAME = data["REPORTING"]["NAME"]
+REPORT_NAME = data["REPORTING"].get("NAME")
 START_DATE = data["REPORTING"]["START_DATE"]
 LAST_DATE = data["REPORTING"]["LAST_DATE"]
-JOB_ID = data["REPORTING"]["JOB_ID"]
+JOB_ID = data["REPORTING"].get("JOB_ID")
+DOWNLOAD_WORKERS = data["REPORTING"].get("DOWNLOAD_WORKERS", 1)
+DOWNLOAD_RETRIES = data["REPORTING"].get("DOWNLOAD_RETRIES", 3)
+STREAMING = data["REPORTING"].get("STREAMING", False)
+CHUNK_SIZE = data["REPORTING"].get("CHUNK_SIZE", 8 * 1024 * 1024)
+BATCH_ROWS = data["REPORTING"].get("BATCH_ROWS", 100000)
+FILE_FORMAT = data["REPORTING"].get("FORMAT", "csv")
+RAW_FORMAT = data["REPORTING"].get("RAW_FORMAT", "csv")
+COMPRESSION = data["REPORTING"].get("COMPRESSION", "snappy")
+SUMMARIES = data["REPORTING"].get("SUMMARIES", ["summary"])
+PIPELINE = data["REPORTING"].get("PIPELINE", False)
+PIPELINE_QUEUE_SIZE = data["REPORTING"].get("PIPELINE_QUEUE_SIZE", 2)
+ROLLUPS = data["REPORTING"].get("ROLLUPS", [])
+DELTA = data["REPORTING"].get("DELTA", False)
+DELTA_KEY = data["REPORTING"].get("DELTA_KEY")
+# Days in which YouTube may still restate a report. Older reports lose their snapshots
+DELTA_WINDOW_DAYS = data["REPORTING"].get("DELTA_WINDOW_DAYS", 60)
+BACKFILL_SHARD_DAYS = data["REPORTING"].get("BACKFILL_SHARD_DAYS", 30)
+BACKFILL_WORKERS = data["REPORTING"].get("BACKFILL_WORKERS", 4)
+# Days YouTube may take to generate a report; newer dates without one are retried
+BACKFILL_GENERATION_LAG_DAYS = data["REPORTING"].get("BACKFILL_GENERATION_LAG_DAYS", 7)
+# Without RETENTION the report files are kept forever
+RETENTION = data["REPORTING"].get("RETENTION")
 
 # Data Constants
 DATA_API_SERVICE_NAME = data["AUTH"]["DATA_API_SERVICE_NAME"]
 DATA_API_VERSION = data["AUTH"]["DATA_API_VERSION"]
+BATCH_SIZE = data.get("DATA_API", {}).get("BATCH_SIZE", 10)
+CONCURRENT_BATCHES = data.get("DATA_API", {}).get("CONCURRENT_BATCHES", 1)
+SCAN_WORKERS = data.get("DATA_API", {}).get("SCAN_WORKERS", os.cpu_count())
+CACHE = data.get("CACHE", {})
+CACHE_TTL_HOURS = CACHE.get("TTL_HOURS", 24)
+CACHE_MAX_ENTRIES = CACHE.get("MAX_ENTRIES", 100000)
 
+# Scheduler Constants
+SCHEDULER_CONFIG = data.get("SCHEDULER", {})
 
-if __name__ == "__main__":
-    if(LAST_DATE <= datetime.date.today().strftime("%Y-%m-%dT%H:%M:%SZ")):
-        youtube_reporting = get_authenticated_service(
-            CLIENT_SECRETS_FILE,
-            SCOPES,
-            REPORTING_API_SERVICE_NAME,
-            REPORTING_API_VERSION,
+# Metrics Constants
+METRICS_PATH = data.get("METRICS", {}).get("PATH")
+PROMETHEUS_PATH = data.get("METRICS", {}).get("PROMETHEUS_PATH")
+
+
+# Heavy modules (pandas, numpy, google clients) are imported only by the stage that
+# uses them, so a run with nothing new to do exits before loading any of them.
+
+
+def get_owners() -> list:
+    """
+    Função para montar a configuração de cada content owner
+
+    Cada item de OWNERS tem CONTENT_OWNER e JOBS (lista com JOB_ID, NAME e, opcionalmente,
+    TABLE, a chave da tabela dos relatórios em TABLES, e ROLLUPS). Pasta, manifesto, caches,
+    credenciais e tabelas podem ser definidos por content owner (FOLDER, MANIFEST, CACHE_PATH,
+    HTTP_CACHE_PATH, CREDENTIALS_FILE, TABLES); as tabelas de TABLES do content owner substituem
+    as chaves das tabelas compartilhadas. Cada content owner tem o seu token OAuth e o seu cache
+    HTTP, já que os content owners rodam em processos paralelos. Sem OWNERS, usa o content owner
+    e o job únicos de CONTENT_OWNER e REPORTING
+
+    Returns:
+        list: Lista de dicts com a configuração de cada content owner
+    """
+    if "OWNERS" not in data:
+        owners = [
+            {
+                "CONTENT_OWNER": CONTENT_OWNER,
+                "JOBS": [{"JOB_ID": JOB_ID, "NAME": REPORT_NAME}],
+                "FOLDER": REPORT_FOLDER,
+                "MANIFEST": data["REPORTING"].get("MANIFEST"),
+                "CACHE_PATH": CACHE.get("PATH"),
+                "CREDENTIALS_FILE": CREDENTIALS_FILE,
+                "HTTP_CACHE_PATH": HTTP_CACHE and HTTP_CACHE["PATH"],
+            }
+        ]
+    else:
+        owners = data["OWNERS"]
+
+    configs = []
+    for owner in owners:
+        content_owner = owner["CONTENT_OWNER"]
+        name = owner.get("NAME", content_owner)
+        folder = owner.get("FOLDER") or (
+            REPORT_FOLDER if "OWNERS" not in data else f"{REPORT_FOLDER}/{name}"
+        )
+        http_cache_path = owner.get("HTTP_CACHE_PATH")
+        if not http_cache_path and HTTP_CACHE:
+            http_cache_path = f"{HTTP_CACHE['PATH']}/{name}"
+
+        rollups = owner.get("ROLLUPS", ROLLUPS)
+        tables = {}
+        for key, table in data["TABLES"].items():
+            table = {**table, **owner.get("TABLES", {}).get(key, {})}
+            # Shared tables keep the rows of each content owner apart by owner_field
+            if table.get("owner_field"):
+                table["owner"] = content_owner
+            tables[key] = table
+
+        configs.append(
+            {
+                "NAME": name,
+                "CONTENT_OWNER": content_owner,
+                "CLIENT_SECRETS_FILE": owner.get("CLIENT_SECRETS_FILE", CLIENT_SECRETS_FILE),
+                "CREDENTIALS_FILE": owner.get("CREDENTIALS_FILE")
+                or f"{folder}/.youtube-extraction.json",
+                "HTTP_CACHE_PATH": http_cache_path,
+                "JOBS": [
+                    {
+                        "JOB_ID": job["JOB_ID"],
+                        "NAME": job["NAME"],
+                        "TABLE": job.get("TABLE", "reports"),
+                        "START_DATE": job.get("START_DATE", owner.get("START_DATE", START_DATE)),
+                        "LAST_DATE": job.get("LAST_DATE", owner.get("LAST_DATE", LAST_DATE)),
+                        "ROLLUPS": get_rollups(
+                            job.get("ROLLUPS", rollups), tables[job.get("TABLE", "reports")]
+                        ),
+                    }
+                    for job in owner["JOBS"]
+                ],
+                "FOLDER": folder,
+                "MANIFEST": owner.get("MANIFEST") or f"{folder}/.manifest.sqlite3",
+                "CACHE_PATH": owner.get("CACHE_PATH") or f"{folder}/.metadata.sqlite3",
+                "TABLES": tables,
+            }
+        )
+    return configs
+
+
+def get_rollups(rollups: list, table_info: dict) -> list:
+    """
+    Função para montar os rollups de um job
+
+    Em tabelas compartilhadas entre content owners, a coluna do content owner entra nas
+    dimensões de todos os rollups
+
+    Args:
+        rollups (list): Rollups, cada um com NAME, DIMENSIONS, METRICS e TABLE
+        table_info (dict): Informações da tabela dos relatórios no BQ
+
+    Returns:
+        list: Rollups do job
+    """
+    owner_field = table_info.get("owner_field")
+    if not owner_field:
+        return rollups
+    return [
+        rollup
+        if owner_field in rollup["DIMENSIONS"]
+        else {**rollup, "DIMENSIONS": [owner_field] + rollup["DIMENSIONS"]}
+        for rollup in rollups
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_service_factory(
+    client_secrets_file: str = CLIENT_SECRETS_FILE,
+    credentials_file: str = CREDENTIALS_FILE,
+    http_cache_path: str = None,
+):
+    """
+    Função para criar, uma única vez por execução e content owner, a fábrica de serviços das
+    APIs do Youtube
+
+    Args:
+        client_secrets_file (str): Caminho do arquivo de credenciais do cliente OAuth
+        credentials_file (str): Caminho do arquivo em que o token OAuth do content owner é
+            guardado
+        http_cache_path (str): Pasta do cache HTTP do content owner. Se None, sem cache
+
+    Returns:
+        ServiceFactory: Fábrica de serviços e conexões autorizadas
+    """
+    with TIMER.stage("import auth_service"):
+        from auth_service import ServiceFactory
+    from http_cache import BoundedFileCache
+
+    # Only the Data API listings are cached; report downloads are too large
+    http_cache = None
+    if HTTP_CACHE and http_cache_path:
+        http_cache = BoundedFileCache(
+            http_cache_path,
+            max_bytes=HTTP_CACHE.get("MAX_BYTES", 100 * 1024 * 1024),
+            max_entry_bytes=HTTP_CACHE.get("MAX_ENTRY_BYTES", 5 * 1024 * 1024),
         )
 
-        reports_handler = ReportsHandler(
-            youtube_reporting,
-            CONTENT_OWNER,
-            JOB_ID,
-            LAST_DATE,
-            START_DATE,
-            REPORT_SCHEMA,
-            REPORT_NAME,
-            REPORT_FOLDER,
+    with TIMER.stage("authenticate"):
+        return ServiceFactory(
+            client_secrets_file,
+            SCOPES,
+            discovery_folder=DISCOVERY_CACHE,
+            cache=http_cache,
+            credentials_file=credentials_file,
         )
-        
-        # Run Reports
-        reports_handler.run_reports()
-        for report in os.scandir(REPORT_FOLDER):
-            if('processed' in report.name):
-                df = pd.read_csv(report)
-                df['date'] = pd.to_datetime(df["date"])
-                run_job(df, data["TABLES"]["reports"])
-
-    if os.listdir(REPORT_FOLDER):
-        youtube_data = get_authenticated_service(
-            CLIENT_SECRETS_FILE, 
-            SCOPES, 
-            DATA_API_SERVICE_NAME, 
-            DATA_API_VERSION
+
+
+def get_owner_service_factory(owner: dict):
+    """
+    Função para obter a fábrica de serviços de um content owner
+
+    Args:
+        owner (dict): Configuração do content owner
+
+    Returns:
+        ServiceFactory: Fábrica de serviços e conexões autorizadas do content owner
+    """
+    return get_service_factory(
+        owner["CLIENT_SECRETS_FILE"], owner["CREDENTIALS_FILE"], owner["HTTP_CACHE_PATH"]
+    )
+
+
+def configure_scheduler(processes: int) -> None:
+    """
+    Função para configurar o limite de taxa e as retentativas das chamadas às APIs
+
+    Os limites de SCHEDULER.LIMITS valem para o projeto, então são divididos entre os
+    processos dos content owners que rodam ao mesmo tempo
+
+    Args:
+        processes (int): Número de processos rodando ao mesmo tempo
+    """
+    from scheduler import SCHEDULER
+
+    limits = {
+        key: {
+            name: value / processes if name in ("RATE", "BURST", "MIN_RATE") else value
+            for name, value in limit.items()
+        }
+        for key, limit in SCHEDULER_CONFIG.get("LIMITS", {}).items()
+    }
+    SCHEDULER.configure(
+        limits,
+        max_retries=SCHEDULER_CONFIG.get("MAX_RETRIES", 5),
+        base_delay=SCHEDULER_CONFIG.get("BASE_DELAY", 1.0),
+        max_delay=SCHEDULER_CONFIG.get("MAX_DELAY", 64.0),
+    )
+
+
+def with_owner(df, table_info: dict):
+    """
+    Função para adicionar a coluna do content owner a um dataframe de uma tabela compartilhada
+
+    Args:
+        df (pd.DataFrame): Dataframe de dados para inserção no BQ
+        table_info (dict): Informações da tabela no BQ
+
+    Returns:
+        pd.DataFrame: Dataframe com a coluna owner_field, quando a tabela tem essa coluna
+    """
+    if table_info.get("owner_field"):
+        df[table_info["owner_field"]] = table_info["owner"]
+    return df
+
+
+def get_derived_file(owner: dict, kind: str, file: str) -> str:
+    """
+    Função para montar o caminho de um arquivo derivado de um relatório processado, como os
+    rollups, deltas e snapshots, que são gravados no formato do arquivo processado
+
+    Args:
+        owner (dict): Configuração do content owner
+        kind (str): Tipo do arquivo, ex: snapshot
+        file (str): Caminho do arquivo processado
+
+    Returns:
+        str: Caminho do arquivo derivado
+    """
+    import storage
+
+    return storage.get_report_path(
+        owner["FOLDER"],
+        kind,
+        storage.get_report_stem(file),
+        storage.get_report_format(file),
+    )
+
+
+def load_rollups(owner: dict, job: dict, files: list) -> None:
+    """
+    Função para carregar no BigQuery os rollups dos relatórios processados
+
+    Cada rollup é carregado na sua tabela (a chave TABLE do rollup em TABLES), substituindo
+    apenas as partições dos relatórios carregados. Sem partition_field na tabela, a dimensão de
+    data do rollup é usada como partição
+
+    Args:
+        owner (dict): Configuração do content owner
+        job (dict): Configuração do job dos relatórios
+        files (list): Caminhos dos arquivos processados
+    """
+    import pandas as pd
+    import storage
+    import summaries
+    from bigquery import run_job
+
+    report_schema = owner["TABLES"][job["TABLE"]]["schema"]
+    for rollup in job["ROLLUPS"]:
+        kind = summaries.get_rollup_kind(rollup["NAME"])
+        # The format of the processed file, which may be older than the current FORMAT
+        paths = [get_derived_file(owner, kind, file) for file in files]
+        # Reports processed before the rollup was configured have no rollup file
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            continue
+
+        table_info = owner["TABLES"][rollup["TABLE"]]
+        schema = summaries.get_rollup_schema(rollup, report_schema)
+        if not table_info.get("partition_field"):
+            # Without a partition the load would replace the days loaded before, also in
+            # tables shared by content owners, where all the rows of the owner are replaced
+            date_columns = storage.get_date_columns(schema)
+            if not date_columns:
+                logging.warning(
+                    f"Rollup {rollup['NAME']} has no date dimension, each load replaces "
+                    f"{table_info['name']}"
+                )
+            else:
+                partition_field = "date" if "date" in date_columns else date_columns[0]
+                table_info = {**table_info, "partition_field": partition_field}
+        df = pd.concat(
+            [storage.read_report(path, schema=schema) for path in paths], ignore_index=True
         )
+        run_job(df, table_info)
+
+
+def get_delta_cutoff() -> str:
+    """
+    Função para obter a data do relatório mais antigo que ainda pode ser reprocessado pelo
+    Youtube, de acordo com DELTA_WINDOW_DAYS
+
+    Returns:
+        str: Data no formato AAAAMMDD
+    """
+    cutoff = datetime.date.today() - datetime.timedelta(days=DELTA_WINDOW_DAYS)
+    return cutoff.strftime("%Y%m%d")
+
+
+def get_deltas(owner: dict, manifest: Manifest, table_info: dict, files: list) -> tuple:
+    """
+    Função para separar os relatórios que são carregados inteiros dos relatórios reprocessados
+    pelo Youtube, dos quais só as linhas alteradas são carregadas
+
+    Relatórios que já foram carregados têm um snapshot, registrado no manifesto, com a chave e
+    o hash de cada linha; para eles é gravado um arquivo de delta com as linhas inseridas,
+    alteradas e removidas. Relatórios sem snapshot, ou com o snapshot expirado, são carregados
+    inteiros
+
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        table_info (dict): Informações da tabela dos relatórios no BQ
+        files (list): Caminhos dos arquivos processados
+
+    Returns:
+        tuple: Arquivos carregados inteiros e arquivos de delta
+    """
+    import delta
+    import storage
 
-        channels_handler = ChannelsHandler(
-            youtube_data=youtube_data, content_owner_id=CONTENT_OWNER
+    if not DELTA:
+        return files, []
+    if not table_info.get("partition_field"):
+        # Full loads of unpartitioned tables truncate the table, so the days are not kept
+        logging.warning(f"Delta mode needs a partition_field in {table_info['name']}")
+        return files, []
+
+    key_columns = delta.get_key_columns(table_info["schema"], DELTA_KEY)
+    full_files, delta_files = [], []
+    for file in files:
+        stem = storage.get_report_stem(file)
+        row = manifest.get(stem)
+        snapshot_file = row["snapshot_file"] if row else None
+        if not snapshot_file or not os.path.exists(snapshot_file):
+            full_files.append(file)
+            continue
+
+        delta_file = get_derived_file(owner, "delta", file)
+        rows = delta.write_delta(
+            file, snapshot_file, delta_file, table_info["schema"], key_columns
         )
+        if rows is None:
+            full_files.append(file)
+        elif rows:
+            delta_files.append(delta_file)
+        else:
+            logging.info(f"Report {stem} has no changed rows")
+            os.remove(delta_file)
+    return full_files, delta_files
+
+
+def write_snapshots(owner: dict, manifest: Manifest, job: dict, files: list) -> None:
+    """
+    Função para gravar o snapshot dos relatórios carregados, usado no delta da próxima versão
+
+    Apenas os relatórios dentro de DELTA_WINDOW_DAYS têm snapshot, e os snapshots dos
+    relatórios mais antigos do job são removidos
+
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        job (dict): Configuração do job dos relatórios
+        files (list): Caminhos dos arquivos processados
+    """
+    import delta
+    import storage
+
+    table_info = owner["TABLES"][job["TABLE"]]
+    if not DELTA or not table_info.get("partition_field"):
+        return
+
+    cutoff = get_delta_cutoff()
+    key_columns = delta.get_key_columns(table_info["schema"], DELTA_KEY)
+    for file in files:
+        stem = storage.get_report_stem(file)
+        if stem.split("-")[-1] < cutoff:
+            continue
+        snapshot_file = get_derived_file(owner, "snapshot", file)
+        delta.write_snapshot(file, snapshot_file, table_info["schema"], key_columns)
+        manifest.mark_snapshot(stem, snapshot_file)
+    delta.expire_snapshots(manifest, cutoff, job["NAME"])
+
+
+def load_reports(owner: dict, manifest: Manifest, job: dict, files: list) -> None:
+    """
+    Função para carregar os relatórios processados e os seus rollups no BigQuery e registrar a
+    carga no manifesto
 
-        videos_handler = VideosHandler(
-            youtube_data=youtube_data, content_owner_id=CONTENT_OWNER, report_folder=REPORT_FOLDER
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        job (dict): Configuração do job dos relatórios
+        files (list): Caminhos dos arquivos processados
+    """
+    if not files:
+        return
+
+    with TIMER.stage("import bigquery"):
+        from bigquery import load_files, merge_files
+    import delta
+    import storage
+
+    table_info = owner["TABLES"][job["TABLE"]]
+    full_files, delta_files = get_deltas(owner, manifest, table_info, files)
+    load_files(full_files, table_info)
+    if delta_files:
+        # Restated reports only send the rows that changed since the loaded version
+        merge_files(
+            delta_files, table_info, delta.get_key_columns(table_info["schema"], DELTA_KEY)
         )
+        for delta_file in delta_files:
+            os.remove(delta_file)
+    write_snapshots(owner, manifest, job, files)
+    load_rollups(owner, job, files)
+    for file in files:
+        manifest.mark_loaded(storage.get_report_stem(file))
+
+
+def load_pending_reports(owner: dict, manifest: Manifest, job: dict) -> None:
+    """
+    Função para carregar os relatórios de um job processados desde a última carga
+
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        job (dict): Configuração do job dos relatórios
+    """
+    reports = manifest.pending("processed", job["NAME"])
+    load_reports(owner, manifest, job, [report["processed_file"] for report in reports])
+
+
+def get_last_date(manifest: Manifest, job: dict) -> str:
+    """
+    Função para obter a última data de processamento de um job
+
+    Args:
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        job (dict): Configuração do job dos relatórios
+
+    Returns:
+        str: Última data guardada no manifesto, ou LAST_DATE do config antes da primeira execução
+    """
+    return manifest.get_last_date(job["NAME"]) or job["LAST_DATE"]
 
+
+def reports_due(manifest: Manifest, job: dict) -> bool:
+    """
+    Função para verificar se a extração de relatórios de um job deve rodar hoje
+
+    Args:
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        job (dict): Configuração do job dos relatórios
+
+    Returns:
+        bool: True se a última extração foi antes de hoje
+    """
+    return get_last_date(manifest, job) <= datetime.date.today().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def data_api_due(manifest: Manifest) -> bool:
+    """
+    Função para verificar se há relatórios processados depois da última extração da API de dados
+
+    Args:
+        manifest (Manifest): Manifesto com o estado dos relatórios
+
+    Returns:
+        bool: True se a API de dados deve rodar
+    """
+    last_processed = manifest.last_processed_at()
+    last_run = manifest.get_state("DATA_API_LAST_RUN")
+    return last_processed is not None and (last_run is None or last_processed > last_run)
+
+
+def run_data_api(owner: dict, manifest: Manifest) -> None:
+    """
+    Função para extrair canais, vídeos e categorias da API de dados do Youtube
+
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+    """
+    if not data_api_due(manifest):
+        logging.info('No new reports for the Data API')
+        return
+
+    started_at = datetime.datetime.utcnow().isoformat()
+    with TIMER.stage("import data api stage"):
+        import pandas as pd
+        from batch import BatchExecutor
+        from bigquery import run_job
+        from cache import MetadataCache
+        from channels import ChannelsHandler
+        from videos import VideosHandler
+
+    service_factory = get_owner_service_factory(owner)
+    youtube_data = service_factory.service(
+        DATA_API_SERVICE_NAME, DATA_API_VERSION, cached=True
+    )
+
+    executor = BatchExecutor(
+        youtube_data,
+        batch_size=BATCH_SIZE,
+        max_concurrent=CONCURRENT_BATCHES,
+        http_factory=functools.partial(service_factory.http, cached=True),
+        # With the HTTP cache the calls are single cached GETs instead of batches
+        cached=bool(HTTP_CACHE and owner["HTTP_CACHE_PATH"]),
+    )
+
+    channels_handler = ChannelsHandler(
+        youtube_data=youtube_data, content_owner_id=owner["CONTENT_OWNER"], executor=executor
+    )
+
+    videos_handler = VideosHandler(
+        youtube_data=youtube_data,
+        content_owner_id=owner["CONTENT_OWNER"],
+        report_folder=owner["FOLDER"],
+        cache=MetadataCache(owner["CACHE_PATH"], CACHE_TTL_HOURS * 3600, CACHE_MAX_ENTRIES),
+        executor=executor,
+        scan_workers=SCAN_WORKERS,
+        manifest=manifest,
+    )
+
+    tables = owner["TABLES"]
+    with METRICS.stage("data_api"):
         # Run Channels
         channels = pd.DataFrame(channels_handler.get_channels())
-        run_job(channels, data["TABLES"]["channels"])
+        run_job(with_owner(channels, tables["channels"]), tables["channels"])
 
         # Run Videos
         videos = pd.DataFrame(videos_handler.get_videos())
-        run_job(videos, data["TABLES"]["videos"])
+        run_job(with_owner(videos, tables["videos"]), tables["videos"])
 
         # Run Video Categories
         categories = pd.DataFrame(videos_handler.get_categories(videos=videos))
-        run_job(categories, data["TABLES"]["video_categories"])
+        run_job(
+            with_owner(categories, tables["video_categories"]), tables["video_categories"]
+        )
+
+    manifest.set_state("DATA_API_LAST_RUN", started_at)
+
+
+def get_reports_handler(owner: dict, manifest: Manifest, job: dict):
+    """
+    Função para criar o handler dos relatórios de um job
+
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        job (dict): Configuração do job dos relatórios
+
+    Returns:
+        ReportsHandler: Handler dos relatórios
+    """
+    with TIMER.stage("import reports stage"):
+        from reports import ReportsHandler
+
+    service_factory = get_owner_service_factory(owner)
+    youtube_reporting = service_factory.service(
+        REPORTING_API_SERVICE_NAME, REPORTING_API_VERSION
+    )
+
+    table_info = owner["TABLES"][job["TABLE"]]
+    return ReportsHandler(
+        youtube_reporting,
+        owner["CONTENT_OWNER"],
+        job["JOB_ID"],
+        get_last_date(manifest, job),
+        job["START_DATE"],
+        table_info["schema"],
+        job["NAME"],
+        owner["FOLDER"],
+        download_workers=DOWNLOAD_WORKERS,
+        download_retries=DOWNLOAD_RETRIES,
+        http_factory=service_factory.http,
+        manifest=manifest,
+        streaming=STREAMING,
+        chunk_size=CHUNK_SIZE,
+        batch_rows=BATCH_ROWS,
+        file_format=FILE_FORMAT,
+        raw_format=RAW_FORMAT,
+        compression=COMPRESSION,
+        summary_kinds=SUMMARIES,
+        rollups=job["ROLLUPS"],
+        constant_columns=(
+            {table_info["owner_field"]: table_info["owner"]}
+            if table_info.get("owner_field")
+            else None
+        ),
+    )
+
+
+def run_reports(owner: dict, manifest: Manifest, job: dict, on_processed=None) -> None:
+    """
+    Função para baixar, processar e carregar os relatórios novos de um job
+
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+        job (dict): Configuração do job dos relatórios
+        on_processed (Callable[[], None]): Função executada no modo pipeline assim que todos os
+            relatórios foram processados
+    """
+    reports_handler = get_reports_handler(owner, manifest, job)
+    table_info = owner["TABLES"][job["TABLE"]]
+
+    with METRICS.stage("reports"):
+        if PIPELINE:
+            from pipeline import Pipeline
+
+            # Download, process and load run concurrently; the Data API phase starts as
+            # soon as every report is processed
+            Pipeline(
+                reports_handler,
+                load=functools.partial(load_reports, owner, manifest, job),
+                pending_loads=[
+                    report["processed_file"]
+                    for report in manifest.pending("processed", job["NAME"])
+                ],
+                per_report_loads=bool(table_info.get("partition_field")),
+                queue_size=PIPELINE_QUEUE_SIZE,
+                on_processed=on_processed,
+            ).run()
+        else:
+            # Run Reports
+            reports_handler.run_reports()
+            # Load only the reports processed since the last load, in a single job
+            load_pending_reports(owner, manifest, job)
+
+
+def apply_retention(owner: dict, manifest: Manifest) -> None:
+    """
+    Função para remover ou arquivar os arquivos dos relatórios já carregados, de acordo com a
+    configuração RETENTION
+
+    Sem a chave KINDS, a política vale para os arquivos raw, processados e dos rollups. Com
+    ARCHIVE_FOLDER, cada content owner é arquivado em uma subpasta com o seu nome
+
+    Args:
+        owner (dict): Configuração do content owner
+        manifest (Manifest): Manifesto com o estado dos relatórios
+    """
+    if not RETENTION:
+        return
+
+    import summaries
+    from retention import RetentionPolicy
+
+    archive_folder = RETENTION.get("ARCHIVE_FOLDER")
+    if archive_folder:
+        archive_folder = os.path.join(archive_folder, owner["NAME"])
+    for job in owner["JOBS"]:
+        kinds = RETENTION.get("KINDS") or ["raw", "processed"] + [
+            summaries.get_rollup_kind(rollup["NAME"]) for rollup in job["ROLLUPS"]
+        ]
+        policy = RetentionPolicy(
+            RETENTION.get("MODE", "delete"),
+            RETENTION.get("KEEP_DAYS", 0),
+            archive_folder,
+            kinds,
+        )
+        with METRICS.stage("retention"):
+            policy.apply(manifest, owner["FOLDER"], job["NAME"])
+
+
+def owner_path(path: str, owner: dict, owners: int) -> str:
+    """
+    Função para montar o caminho de um arquivo de saída de um content owner
+
+    Args:
+        path (str): Caminho do arquivo, que pode ter {owner} no lugar do nome do content owner
+        owner (dict): Configuração do content owner
+        owners (int): Número de content owners da execução
+
+    Returns:
+        str: Caminho do arquivo do content owner
+    """
+    if "{owner}" in path:
+        return path.replace("{owner}", owner["NAME"])
+    if owners == 1:
+        return path
+    # Each owner runs in its own process and writes its own file
+    root, extension = os.path.splitext(path)
+    return f"{root}.{owner['NAME']}{extension}"
+
+
+def write_metrics(owner: dict, owners: int) -> None:
+    """
+    Função para gravar as métricas da execução de um content owner, em json e no formato do
+    Prometheus
+
+    Args:
+        owner (dict): Configuração do content owner
+        owners (int): Número de content owners da execução
+    """
+    if METRICS_PATH:
+        METRICS.write_json(owner_path(METRICS_PATH, owner, owners))
+    if PROMETHEUS_PATH:
+        METRICS.write_prometheus(
+            owner_path(PROMETHEUS_PATH, owner, owners), labels={"owner": owner["NAME"]}
+        )
+
+
+def run_owner(owner: dict, owners: int = 1, processes: int = 1, timings: bool = False) -> None:
+    """
+    Função para executar a extração de um content owner
+
+    Args:
+        owner (dict): Configuração do content owner
+        owners (int): Número de content owners da execução
+        processes (int): Número de content owners rodando ao mesmo tempo
+        timings (bool): Se True, registra no log o tempo de cada etapa da inicialização
+    """
+    try:
+        logging.info(f"Started content owner {owner['NAME']}")
+        os.makedirs(owner["FOLDER"], exist_ok=True)
+        manifest = Manifest(owner["MANIFEST"])
+        due_jobs = [job for job in owner["JOBS"] if reports_due(manifest, job)]
+
+        # Cheap pre-check: exit before importing or authenticating anything
+        if (
+            not due_jobs
+            and not manifest.pending("processed")
+            and not data_api_due(manifest)
+        ):
+            logging.info(f"Nothing new to process for {owner['NAME']}")
+            return
+
+        configure_scheduler(processes)
+
+        for job in owner["JOBS"]:
+            if job not in due_jobs:
+                load_pending_reports(owner, manifest, job)
+                continue
+            # In pipeline mode the Data API runs alongside the loads of the last job
+            on_processed = None
+            if PIPELINE and job is due_jobs[-1]:
+                on_processed = functools.partial(run_data_api, owner, manifest)
+            run_reports(owner, manifest, job, on_processed)
+
+        run_data_api(owner, manifest)
+        # After the Data API, which reads the processed files without a summary
+        apply_retention(owner, manifest)
+        logging.info(f"Finished content owner {owner['NAME']}")
+    finally:
+        # Metrics are written for failed runs too, so that alerts can see them
+        write_metrics(owner, owners)
+        if timings:
+            TIMER.report()
+
+
+def backfill_owner(
+    owner: dict,
+    start_date: str,
+    end_date: str,
+    jobs: list = None,
+    owners: int = 1,
+    processes: int = 1,
+    timings: bool = False,
+) -> None:
+    """
+    Função para executar o backfill dos relatórios de um content owner em um intervalo de datas
+
+    Os relatórios são baixados, processados e carregados; as datas concluídas ficam no
+    manifesto, então o mesmo comando continua um backfill interrompido
+
+    Args:
+        owner (dict): Configuração do content owner
+        start_date (str): Primeira data do backfill, ex: 2022-01-01
+        end_date (str): Última data do backfill, inclusiva
+        jobs (list): Nomes dos jobs do backfill. Se None, todos os jobs do content owner
+        owners (int): Número de content owners da execução
+        processes (int): Número de content owners rodando ao mesmo tempo
+        timings (bool): Se True, registra no log o tempo de cada etapa da inicialização
+    """
+    from backfill import Backfill
+
+    try:
+        os.makedirs(owner["FOLDER"], exist_ok=True)
+        manifest = Manifest(owner["MANIFEST"])
+        configure_scheduler(processes)
+
+        failed = []
+        for job in owner["JOBS"]:
+            if jobs and job["NAME"] not in jobs:
+                continue
+            with METRICS.stage("backfill"):
+                failed_dates = Backfill(
+                    get_reports_handler(owner, manifest, job),
+                    manifest,
+                    job["NAME"],
+                    start_date,
+                    end_date,
+                    shard_days=BACKFILL_SHARD_DAYS,
+                    workers=BACKFILL_WORKERS,
+                    generation_lag_days=BACKFILL_GENERATION_LAG_DAYS,
+                ).run()
+            # Dates processed before a failure are still loaded
+            load_pending_reports(owner, manifest, job)
+            if failed_dates:
+                logging.error(f"Backfill of {job['NAME']} failed for {len(failed_dates)} dates")
+                failed.append(job["NAME"])
+        apply_retention(owner, manifest)
+
+        if failed:
+            raise RuntimeError(
+                f"Backfill failed for jobs: {', '.join(failed)}, run it again to resume"
+            )
+    finally:
+        write_metrics(owner, owners)
+        if timings:
+            TIMER.report()
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """
+    Função para ler os parâmetros da linha de comando
+
+    Args:
+        argv (list): Parâmetros. Se None, usa sys.argv
+
+    Returns:
+        argparse.Namespace: Parâmetros lidos
+    """
+    parser = argparse.ArgumentParser(description="Youtube revenue reports extraction")
+    parser.add_argument("--timings", action="store_true", help="Print the startup timings")
+    commands = parser.add_subparsers(dest="command")
+    backfill = commands.add_parser("backfill", help="Backfill the reports of a date range")
+    backfill.add_argument("start_date", help="First report date, e.g. 2022-01-01")
+    backfill.add_argument("end_date", help="Last report date, inclusive")
+    backfill.add_argument("--owner", action="append", help="Content owner name, may repeat")
+    backfill.add_argument("--job", action="append", help="Job name, may repeat")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace = None) -> None:
+    """
+    Função para executar a extração de todos os content owners
+
+    Com mais de um content owner, cada um roda em um processo, ao mesmo tempo que os demais.
+    Os content owners sem credenciais válidas falham sem rodar, já que um processo não pode
+    pedir a autorização interativa
+
+    Args:
+        args (argparse.Namespace): Parâmetros da linha de comando
+    """
+    args = args or parse_args([])
+    owners = get_owners()
+    if args.command == "backfill":
+        if args.owner:
+            owners = [owner for owner in owners if owner["NAME"] in args.owner]
+        target = functools.partial(
+            backfill_owner,
+            start_date=args.start_date,
+            end_date=args.end_date,
+            jobs=args.job,
+            owners=len(owners),
+            timings=args.timings,
+        )
     else:
-        logging.log('No reports to process')
\ No newline at end of file
+        target = functools.partial(run_owner, owners=len(owners), timings=args.timings)
+
+    if len(owners) == 1:
+        target(owners[0])
+        return
+
+    with TIMER.stage("import auth_service"):
+        from auth_service import has_valid_credentials
+
+    # A worker process would wait forever on the interactive authorization flow
+    failed = []
+    authorized = []
+    for owner in owners:
+        if has_valid_credentials(owner["CREDENTIALS_FILE"]):
+            authorized.append(owner)
+            continue
+        logging.error(
+            f"Content owner {owner['NAME']} has no valid credentials in "
+            f"{owner['CREDENTIALS_FILE']}, run it alone to authorize it"
+        )
+        failed.append(owner["NAME"])
+
+    workers = max(1, min(len(authorized), MAX_PARALLEL_OWNERS))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(target, owner, processes=workers): owner["NAME"]
+            for owner in authorized
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logging.exception(f"Content owner {futures[future]} failed")
+                failed.append(futures[future])
+
+    if failed:
+        raise RuntimeError(f"Content owners failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main(parse_args())
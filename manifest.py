@@ -0,0 +1,506 @@
+import hashlib
+import sqlite3
+import threading
+import compression
+from contextlib import closing
+from datetime import datetime
+
+
+class Manifest:
+    def __init__(self, path: str) -> None:
+        """
+        Inicialização da classe
+
+        Guarda o estado de cada relatório (url, createTime, hash do conteúdo e etapas já
+        executadas) em um arquivo SQLite, para que cada etapa processe apenas relatórios
+        novos ou reprocessados pelo Youtube
+
+        Args:
+            path (str): Caminho do arquivo SQLite do manifesto
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._execute(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                report TEXT PRIMARY KEY,
+                date TEXT,
+                url TEXT,
+                created_time TEXT,
+                content_hash TEXT,
+                raw_file TEXT,
+                processed_file TEXT,
+                summary_file TEXT,
+                snapshot_file TEXT,
+                status TEXT,
+                downloaded_at TEXT,
+                processed_at TEXT,
+                loaded_at TEXT,
+                retained_at TEXT
+            )
+            """
+        )
+        columns = {row["name"] for row in self._execute("PRAGMA table_info(reports)")}
+        # Manifests created before the retention policy and the index of the summaries and
+        # snapshots
+        for column in ("retained_at", "summary_file", "snapshot_file"):
+            if column not in columns:
+                self._execute(f"ALTER TABLE reports ADD COLUMN {column} TEXT")
+        self._execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        self._execute(
+            """
+            CREATE TABLE IF NOT EXISTS backfill (
+                report_name TEXT,
+                date TEXT,
+                completed_at TEXT,
+                PRIMARY KEY (report_name, date)
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Função para abrir uma conexão com o manifesto
+
+        Returns:
+            sqlite3.Connection: Conexão com o arquivo SQLite
+        """
+        conn = sqlite3.connect(self._path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, query: str, params: tuple = ()) -> list:
+        """
+        Função para executar uma query no manifesto
+
+        Args:
+            query (str): Query SQL
+            params (tuple): Parâmetros da query
+
+        Returns:
+            list: Linhas retornadas pela query, como dicts
+        """
+        with self._lock, closing(self._connect()) as conn, conn:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def get(self, report: str) -> dict:
+        """
+        Função para buscar o estado de um relatório
+
+        Args:
+            report (str): Nome do relatório com a data, ex: <nome>-<data>
+
+        Returns:
+            dict: Estado do relatório, ou None se ele não está no manifesto
+        """
+        rows = self._execute("SELECT * FROM reports WHERE report = ?", (report,))
+        return rows[0] if rows else None
+
+    def is_current(self, report: str, created_time: str) -> bool:
+        """
+        Função para verificar se a versão de um relatório já foi baixada
+
+        Args:
+            report (str): Nome do relatório com a data
+            created_time (str): createTime do relatório na API
+
+        Returns:
+            bool: True se essa versão do relatório já foi baixada
+        """
+        row = self.get(report)
+        return row is not None and row["created_time"] == created_time
+
+    def record_download(
+        self,
+        report: str,
+        date: str,
+        url: str,
+        created_time: str,
+        content_hash: str,
+        raw_file: str,
+    ) -> None:
+        """
+        Função para registrar o download de um relatório
+
+        Se o conteúdo é igual ao da versão já registrada, as etapas seguintes não são refeitas
+
+        Args:
+            report (str): Nome do relatório com a data
+            date (str): Data do relatório
+            url (str): url do relatório
+            created_time (str): createTime do relatório na API
+            content_hash (str): Hash do conteúdo do relatório
+            raw_file (str): Caminho do arquivo raw
+        """
+        now = datetime.utcnow().isoformat()
+        row = self.get(report)
+        if row is not None and row["content_hash"] == content_hash:
+            self._execute(
+                """
+                UPDATE reports SET url = ?, created_time = ?, raw_file = ?, downloaded_at = ?
+                WHERE report = ?
+                """,
+                (url, created_time, raw_file, now, report),
+            )
+            return
+
+        # A new version keeps the snapshot of the loaded one, which its delta is computed from
+        self._execute(
+            """
+            INSERT OR REPLACE INTO reports
+                (report, date, url, created_time, content_hash, raw_file, snapshot_file, status,
+                downloaded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'downloaded', ?)
+            """,
+            (
+                report,
+                date,
+                url,
+                created_time,
+                content_hash,
+                raw_file,
+                row["snapshot_file"] if row else None,
+                now,
+            ),
+        )
+
+    def needs_processing(self, report: str, raw_file: str) -> bool:
+        """
+        Função para verificar se um arquivo raw precisa ser processado
+
+        Arquivos que ainda não estão no manifesto são registrados
+
+        Args:
+            report (str): Nome do relatório com a data
+            raw_file (str): Caminho do arquivo raw
+
+        Returns:
+            bool: True se o relatório ainda não foi processado
+        """
+        row = self.get(report)
+        if row is None:
+            self.record_download(
+                report, report.split("-")[-1], None, None, hash_file(raw_file), raw_file
+            )
+            return True
+        return row["status"] == "downloaded"
+
+    def mark_processed(self, report: str, processed_file: str, summary_file: str = None) -> None:
+        """
+        Função para registrar o processamento de um relatório
+
+        Args:
+            report (str): Nome do relatório com a data
+            processed_file (str): Caminho do arquivo processado
+            summary_file (str): Caminho do resumo por vídeo, ou None se ele não é gravado
+        """
+        self._execute(
+            """
+            UPDATE reports
+            SET processed_file = ?, summary_file = ?, status = 'processed', processed_at = ?
+            WHERE report = ?
+            """,
+            (processed_file, summary_file, datetime.utcnow().isoformat(), report),
+        )
+
+    def add_processed(self, files: list) -> None:
+        """
+        Função para registrar arquivos processados que ainda não estão no manifesto
+
+        Args:
+            files (list): Lista de tuplas com o nome do relatório com a data, o caminho do
+                arquivo processado e o caminho do resumo por vídeo (ou None)
+        """
+        now = datetime.utcnow().isoformat()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO reports
+                    (report, date, processed_file, summary_file, status, processed_at)
+                VALUES (?, ?, ?, ?, 'processed', ?)
+                """,
+                [
+                    (report, report.split("-")[-1], file, summary_file, now)
+                    for report, file, summary_file in files
+                ],
+            )
+
+    def mark_summary(self, report: str, summary_file: str) -> None:
+        """
+        Função para registrar o resumo por vídeo de um relatório já processado
+
+        Args:
+            report (str): Nome do relatório com a data
+            summary_file (str): Caminho do resumo por vídeo
+        """
+        self._execute(
+            "UPDATE reports SET summary_file = ? WHERE report = ?", (summary_file, report)
+        )
+
+    def mark_snapshot(self, report: str, snapshot_file: str) -> None:
+        """
+        Função para registrar o snapshot de um relatório carregado
+
+        Args:
+            report (str): Nome do relatório com a data
+            snapshot_file (str): Caminho do snapshot, ou None se ele foi removido
+        """
+        self._execute(
+            "UPDATE reports SET snapshot_file = ? WHERE report = ?", (snapshot_file, report)
+        )
+
+    def snapshots_before(self, date: str, report_name: str = None) -> list:
+        """
+        Função para listar os relatórios anteriores a uma data que ainda têm snapshot
+
+        Args:
+            date (str): Data limite do relatório, exclusiva, no formato AAAAMMDD
+            report_name (str): Nome do job dos relatórios. Se None, lista os relatórios de
+                todos os jobs
+
+        Returns:
+            list: Lista de dicts com o estado dos relatórios, ordenada pela data
+        """
+        if report_name is None:
+            return self._execute(
+                """
+                SELECT * FROM reports WHERE snapshot_file IS NOT NULL AND date < ?
+                ORDER BY date, report
+                """,
+                (date,),
+            )
+        return self._execute(
+            """
+            SELECT * FROM reports
+            WHERE snapshot_file IS NOT NULL AND date < ? AND report = ? || '-' || date
+            ORDER BY date, report
+            """,
+            (date, report_name),
+        )
+
+    def mark_loaded(self, report: str) -> None:
+        """
+        Função para registrar a carga de um relatório no BigQuery
+
+        Args:
+            report (str): Nome do relatório com a data
+        """
+        self._execute(
+            "UPDATE reports SET status = 'loaded', loaded_at = ? WHERE report = ?",
+            (datetime.utcnow().isoformat(), report),
+        )
+
+    def pending(self, status: str, report_name: str = None) -> list:
+        """
+        Função para listar os relatórios que estão em uma etapa
+
+        Args:
+            status (str): Etapa dos relatórios, downloaded, processed ou loaded
+            report_name (str): Nome do job dos relatórios. Se None, lista os relatórios de
+                todos os jobs
+
+        Returns:
+            list: Lista de dicts com o estado dos relatórios, ordenada pela data
+        """
+        if report_name is None:
+            return self._execute(
+                "SELECT * FROM reports WHERE status = ? ORDER BY date, report", (status,)
+            )
+        return self._execute(
+            """
+            SELECT * FROM reports WHERE status = ? AND report = ? || '-' || date
+            ORDER BY date, report
+            """,
+            (status, report_name),
+        )
+
+    def processed_reports(
+        self, report_name: str = None, start_date: str = None, end_date: str = None
+    ) -> list:
+        """
+        Função para listar os relatórios já processados (processed ou loaded), que são o índice
+        dos arquivos processados e dos resumos da pasta, sem listar a pasta
+
+        Args:
+            report_name (str): Nome do job dos relatórios. Se None, lista os relatórios de
+                todos os jobs
+            start_date (str): Primeira data, no formato AAAAMMDD. Se None, sem limite
+            end_date (str): Última data, no formato AAAAMMDD. Se None, sem limite
+
+        Returns:
+            list: Lista de dicts com o estado dos relatórios, ordenada pela data
+        """
+        conditions = ["status IN ('processed', 'loaded')"]
+        params = []
+        if report_name is not None:
+            conditions.append("report = ? || '-' || date")
+            params.append(report_name)
+        if start_date is not None:
+            conditions.append("date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append("date <= ?")
+            params.append(end_date)
+        return self._execute(
+            f"SELECT * FROM reports WHERE {' AND '.join(conditions)} ORDER BY date, report",
+            tuple(params),
+        )
+
+    def loaded_before(self, cutoff: str, report_name: str = None) -> list:
+        """
+        Função para listar os relatórios carregados antes de um momento cujos arquivos ainda
+        não passaram pela política de retenção
+
+        Args:
+            cutoff (str): Data e hora limite da carga, em formato ISO
+            report_name (str): Nome do job dos relatórios. Se None, lista os relatórios de
+                todos os jobs
+
+        Returns:
+            list: Lista de dicts com o estado dos relatórios, ordenada pela data
+        """
+        if report_name is None:
+            return self._execute(
+                """
+                SELECT * FROM reports
+                WHERE status = 'loaded' AND loaded_at < ? AND retained_at IS NULL
+                ORDER BY date, report
+                """,
+                (cutoff,),
+            )
+        return self._execute(
+            """
+            SELECT * FROM reports
+            WHERE status = 'loaded' AND loaded_at < ? AND retained_at IS NULL
+                AND report = ? || '-' || date
+            ORDER BY date, report
+            """,
+            (cutoff, report_name),
+        )
+
+    def mark_retained(
+        self, report: str, raw_file: str, processed_file: str, summary_file: str
+    ) -> None:
+        """
+        Função para registrar a aplicação da política de retenção a um relatório
+
+        Args:
+            report (str): Nome do relatório com a data
+            raw_file (str): Novo caminho do arquivo raw, ou None se ele foi removido
+            processed_file (str): Novo caminho do arquivo processado, ou None se ele foi removido
+            summary_file (str): Novo caminho do resumo por vídeo, ou None se ele foi removido
+        """
+        self._execute(
+            """
+            UPDATE reports SET raw_file = ?, processed_file = ?, summary_file = ?, retained_at = ?
+            WHERE report = ?
+            """,
+            (raw_file, processed_file, summary_file, datetime.utcnow().isoformat(), report),
+        )
+
+    def last_processed_at(self) -> str:
+        """
+        Função para obter o momento do último processamento de um relatório
+
+        Returns:
+            str: Data e hora do último processamento, ou None se nenhum relatório foi processado
+        """
+        rows = self._execute("SELECT MAX(processed_at) AS processed_at FROM reports")
+        return rows[0]["processed_at"]
+
+    def get_state(self, key: str) -> str:
+        """
+        Função para ler um valor de estado da execução
+
+        Args:
+            key (str): Nome do valor
+
+        Returns:
+            str: Valor guardado, ou None se ele não existe
+        """
+        rows = self._execute("SELECT value FROM state WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else None
+
+    def set_state(self, key: str, value: str) -> None:
+        """
+        Função para gravar um valor de estado da execução
+
+        Args:
+            key (str): Nome do valor
+            value (str): Valor
+        """
+        self._execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def get_last_date(self, report_name: str) -> str:
+        """
+        Função para ler a última data de processamento de um job de relatórios
+
+        Args:
+            report_name (str): Nome do job dos relatórios
+
+        Returns:
+            str: Última data de processamento, ou None se o job nunca foi concluído
+        """
+        return self.get_state(f"LAST_DATE:{report_name}")
+
+    def set_last_date(self, report_name: str, last_date: str) -> None:
+        """
+        Função para gravar a última data de processamento de um job de relatórios
+
+        Args:
+            report_name (str): Nome do job dos relatórios
+            last_date (str): Última data de processamento
+        """
+        self.set_state(f"LAST_DATE:{report_name}", last_date)
+
+    def mark_backfilled(self, report_name: str, date: str) -> None:
+        """
+        Função para registrar que uma data do backfill foi concluída
+
+        Args:
+            report_name (str): Nome do job dos relatórios
+            date (str): Data do relatório, ex: 2022-01-01
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO backfill (report_name, date, completed_at) VALUES (?, ?, ?)",
+            (report_name, date, datetime.utcnow().isoformat()),
+        )
+
+    def backfilled(self, report_name: str, start_date: str, end_date: str) -> set:
+        """
+        Função para listar as datas do backfill já concluídas em um intervalo
+
+        Args:
+            report_name (str): Nome do job dos relatórios
+            start_date (str): Primeira data do intervalo, ex: 2022-01-01
+            end_date (str): Última data do intervalo, inclusiva
+
+        Returns:
+            set: Datas concluídas
+        """
+        rows = self._execute(
+            """
+            SELECT date FROM backfill WHERE report_name = ? AND date BETWEEN ? AND ?
+            """,
+            (report_name, start_date, end_date),
+        )
+        return {row["date"] for row in rows}
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Função para calcular o hash do conteúdo de um arquivo, descomprimido quando o arquivo é
+    comprimido, igual ao hash calculado no download
+
+    Args:
+        path (str): Caminho do arquivo
+        chunk_size (int): Tamanho em bytes de cada leitura
+
+    Returns:
+        str: Hash sha256 do conteúdo
+    """
+    digest = hashlib.sha256()
+    with compression.open_file(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
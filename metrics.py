@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import psutil
+
+
+# Quota units of each API method. Data API costs come from the quota calculator; the
+# Reporting API and BigQuery count requests and load jobs, so each call costs one unit
+QUOTA_COSTS = {
+    "youtube.channels.list": 1,
+    "youtube.videos.list": 1,
+    "youtube.videoCategories.list": 1,
+    "youtubereporting.jobs.reports.list": 1,
+    "youtubereporting.media.download": 1,
+    "bigquery.jobs.load": 1,
+    "bigquery.jobs.query": 1,
+    "bigquery.tables.insert": 1,
+    "bigquery.tables.delete": 1,
+}
+
+
+class Metrics:
+    def __init__(self, sample_interval: float = 0.05) -> None:
+        """
+        Inicialização da classe
+
+        Acumula as métricas de uma execução: tempo, número de execuções e pico de memória de
+        cada etapa, contadores (bytes baixados, linhas processadas e carregadas...) e o número
+        de chamadas e de unidades de quota de cada endpoint das APIs
+
+        Args:
+            sample_interval (float): Intervalo em segundos entre as medições da memória do
+                processo durante as etapas
+        """
+        self._started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._active = Counter()
+        self._counters = Counter()
+        self._api = {}
+        self._sampler = None
+        self._process = psutil.Process()
+
+    def _rss(self) -> int:
+        """
+        Função para medir a memória residente do processo
+
+        Returns:
+            int: Memória em bytes
+        """
+        return self._process.memory_info().rss
+
+    def _update_peaks(self, rss: int) -> None:
+        """
+        Função para atualizar o pico de memória das etapas em execução
+
+        Args:
+            rss (int): Memória atual do processo em bytes
+        """
+        with self._lock:
+            for name, active in self._active.items():
+                if active and rss > self._stages[name]["peak_rss_bytes"]:
+                    self._stages[name]["peak_rss_bytes"] = rss
+
+    def _sample(self) -> None:
+        """
+        Função executada pela thread que mede a memória enquanto há etapas em execução
+        """
+        while True:
+            time.sleep(self._sample_interval)
+            self._update_peaks(self._rss())
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Função para medir uma etapa
+
+        Etapas com o mesmo nome, inclusive em threads diferentes, são acumuladas
+
+        Args:
+            name (str): Nome da etapa, ex: reports.download
+        """
+        with self._lock:
+            if name not in self._stages:
+                self._stages[name] = {
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "count": 0,
+                    "peak_rss_bytes": 0,
+                }
+            self._active[name] += 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, daemon=True)
+                self._sampler.start()
+        self._update_peaks(self._rss())
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._update_peaks(self._rss())
+            with self._lock:
+                stage = self._stages[name]
+                stage["seconds"] += elapsed
+                stage["max_seconds"] = max(stage["max_seconds"], elapsed)
+                stage["count"] += 1
+                self._active[name] -= 1
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Função para somar um valor a um contador
+
+        Args:
+            name (str): Nome do contador, ex: reports.rows_processed
+            value (float): Valor somado
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def api_call(self, endpoint: str, calls: int = 1) -> None:
+        """
+        Função para registrar chamadas a um endpoint das APIs e as unidades de quota usadas
+
+        Args:
+            endpoint (str): Id do método da API, ex: youtube.videos.list
+            calls (int): Número de chamadas
+        """
+        with self._lock:
+            api = self._api.setdefault(endpoint, {"calls": 0, "quota_units": 0})
+            api["calls"] += calls
+            api["quota_units"] += calls * QUOTA_COSTS.get(endpoint, 1)
+
+    def summary(self) -> dict:
+        """
+        Função para montar o resumo das métricas da execução
+
+        Returns:
+            dict: Dict com a duração da execução, as etapas, os contadores e as chamadas
+        """
+        with self._lock:
+            return {
+                "started_at": self._started_at.isoformat(),
+                "duration_seconds": time.perf_counter() - self._start,
+                "peak_rss_bytes": max(
+                    [self._rss()] + [stage["peak_rss_bytes"] for stage in self._stages.values()]
+                ),
+                "stages": {name: dict(stage) for name, stage in self._stages.items()},
+                "counters": dict(self._counters),
+                "api": {endpoint: dict(api) for endpoint, api in self._api.items()},
+            }
+
+    def write_json(self, path: str) -> None:
+        """
+        Função para gravar o resumo das métricas em json
+
+        Args:
+            path (str): Caminho do arquivo json
+        """
+        _write_atomic(path, json.dumps(self.summary(), indent=4))
+        logging.info(f"Metrics written to {path}")
+
+    def write_prometheus(
+        self, path: str, prefix: str = "youtube_revenue", labels: dict = None
+    ) -> None:
+        """
+        Função para gravar as métricas no formato texto do Prometheus, para o textfile
+        collector do node_exporter
+
+        Args:
+            path (str): Caminho do arquivo .prom
+            prefix (str): Prefixo do nome das métricas
+            labels (dict): Labels adicionados a todas as métricas, ex: o content owner
+        """
+        summary = self.summary()
+        lines = []
+
+        def add(name: str, help_text: str, samples: list) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for sample_labels, value in samples:
+                sample_labels = {**(labels or {}), **sample_labels}
+                label_text = ",".join(f'{key}="{label}"' for key, label in sample_labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+
+        add(
+            "last_run_timestamp_seconds",
+            "Start time of the last run",
+            [({}, datetime.fromisoformat(summary["started_at"]).timestamp())],
+        )
+        add("run_duration_seconds", "Duration of the last run", [({}, summary["duration_seconds"])])
+        add(
+            "run_peak_rss_bytes",
+            "Peak resident memory of the last run",
+            [({}, summary["peak_rss_bytes"])],
+        )
+        stages = summary["stages"].items()
+        add(
+            "stage_seconds",
+            "Time spent in each stage, summed over its executions",
+            [({"stage": name}, stage["seconds"]) for name, stage in stages],
+        )
+        add(
+            "stage_max_seconds",
+            "Longest single execution of each stage",
+            [({"stage": name}, stage["max_seconds"]) for name, stage in stages],
+        )
+        add(
+            "stage_count",
+            "Number of executions of each stage",
+            [({"stage": name}, stage["count"]) for name, stage in stages],
+        )
+        add(
+            "stage_peak_rss_bytes",
+            "Peak resident memory of the process while each stage ran",
+            [({"stage": name}, stage["peak_rss_bytes"]) for name, stage in stages],
+        )
+        for name, value in summary["counters"].items():
+            add(re.sub(r"[^a-zA-Z0-9_]", "_", name), f"{name} in the last run", [({}, value)])
+        api = summary["api"].items()
+        add(
+            "api_calls",
+            "API calls of each endpoint",
+            [({"endpoint": endpoint}, calls["calls"]) for endpoint, calls in api],
+        )
+        add(
+            "api_quota_units",
+            "API quota units used by each endpoint",
+            [({"endpoint": endpoint}, calls["quota_units"]) for endpoint, calls in api],
+        )
+
+        _write_atomic(path, "\n".join(lines) + "\n")
+        logging.info(f"Prometheus metrics written to {path}")
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """
+    Função para gravar um arquivo de uma vez, para que quem o lê nunca veja um arquivo parcial
+
+    Args:
+        path (str): Caminho do arquivo
+        content (str): Conteúdo do arquivo
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(f"{path}.tmp", "w") as fh:
+        fh.write(content)
+    os.replace(f"{path}.tmp", path)
+
+
+METRICS = Metrics()
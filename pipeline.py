@@ -0,0 +1,213 @@
+import logging
+import queue
+import threading
+from typing import Callable
+from reports import ReportsHandler
+
+
+# Marks the end of the items of a queue
+_DONE = object()
+
+
+class Pipeline:
+    def __init__(
+        self,
+        reports_handler: ReportsHandler,
+        load: Callable[[list], None],
+        pending_loads: list = (),
+        per_report_loads: bool = True,
+        queue_size: int = 2,
+        on_processed: Callable[[], None] = None,
+    ) -> None:
+        """
+        Inicialização da classe
+
+        Executa o download, o processamento e a carga dos relatórios ao mesmo tempo, ligados por
+        filas limitadas: o relatório N+1 é baixado enquanto o relatório N é processado e o
+        relatório N-1 é carregado no BigQuery
+
+        Args:
+            reports_handler (ReportsHandler): Handler dos relatórios do Youtube
+            load (Callable[[list], None]): Função que carrega uma lista de arquivos processados
+                no BigQuery
+            pending_loads (list): Arquivos processados em execuções anteriores e ainda não
+                carregados
+            per_report_loads (bool): Se True, cada relatório é carregado assim que é processado.
+                Se False, todos são carregados juntos no fim, para tabelas que são sobrescritas
+                a cada carga
+            queue_size (int): Tamanho máximo de cada fila entre as etapas
+            on_processed (Callable[[], None]): Função executada, em paralelo com as cargas,
+                assim que todos os relatórios foram processados. Um erro dela é lançado por run
+                no fim do pipeline
+        """
+        self._reports_handler = reports_handler
+        self._load = load
+        self._pending_loads = list(pending_loads)
+        self._per_report_loads = per_report_loads
+        self._process_queue = queue.Queue(maxsize=queue_size)
+        self._load_queue = queue.Queue(maxsize=queue_size)
+        self._on_processed = on_processed
+        self._on_processed_thread = None
+        self._on_processed_errors = []
+        self._failed = []
+        self._lock = threading.Lock()
+
+    def _fail(self, item) -> None:
+        """
+        Função para registrar uma falha em alguma etapa
+
+        Args:
+            item: Relatório ou arquivo que falhou
+        """
+        with self._lock:
+            self._failed.append(item)
+
+    def _download(self, reports: queue.Queue) -> None:
+        """
+        Etapa de download, executada por cada thread de download
+
+        Args:
+            reports (queue.Queue): Fila com os relatórios a serem baixados
+        """
+        # Streamed reports are already processed when the download ends
+        streaming = self._reports_handler.streaming
+        next_queue = self._load_queue if streaming else self._process_queue
+        while True:
+            try:
+                report = reports.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                file = self._reports_handler.fetch_report(report)
+            except Exception:
+                logging.exception(f"Download of report {report['date']} failed")
+                self._fail(report)
+                continue
+            # A report downloaded again with the same content is not loaded again
+            if streaming and not self._reports_handler.needs_load(file):
+                logging.info(f"Report {file} unchanged, skipping load")
+                continue
+            next_queue.put(file)
+
+    def _run_on_processed(self) -> None:
+        """
+        Função para executar o on_processed, guardando o erro para que run o lance
+        """
+        try:
+            self._on_processed()
+        except Exception as e:
+            logging.exception("on_processed failed")
+            self._on_processed_errors.append(e)
+
+    def _process(self, files: list) -> None:
+        """
+        Etapa de processamento dos arquivos raw
+
+        A carga sempre recebe o fim da fila, mesmo quando esta etapa falha, para que o pipeline
+        termine com a falha registrada em vez de ficar parado
+
+        Args:
+            files (list): Arquivos raw baixados em execuções anteriores e ainda não processados,
+                listados antes do início dos downloads
+        """
+        done = False
+        files = list(files)
+        try:
+            while True:
+                if files:
+                    file = files.pop(0)
+                else:
+                    file = self._process_queue.get()
+                    if file is _DONE:
+                        done = True
+                        break
+                try:
+                    processed_file = self._reports_handler.process_report(file)
+                    if processed_file:
+                        self._load_queue.put(processed_file)
+                except Exception:
+                    logging.exception(f"Processing of {file} failed")
+                    self._fail(file)
+
+            if self._on_processed is not None:
+                self._on_processed_thread = threading.Thread(target=self._run_on_processed)
+                self._on_processed_thread.start()
+        except Exception:
+            logging.exception("Processing stage failed")
+            self._fail("process")
+            # Downloads still running would block on a full queue nobody reads
+            while not done:
+                file = self._process_queue.get()
+                done = file is _DONE
+                if not done:
+                    self._fail(file)
+        finally:
+            self._load_queue.put(_DONE)
+
+    def _load_files(self, files: list) -> None:
+        """
+        Função para carregar arquivos processados, registrando a falha sem parar o pipeline
+
+        Args:
+            files (list): Caminhos dos arquivos processados
+        """
+        try:
+            self._load(files)
+        except Exception:
+            logging.exception(f"Load of {files} failed")
+            self._fail(files)
+
+    def _load_reports(self) -> None:
+        """
+        Etapa de carga dos arquivos processados no BigQuery
+        """
+        files = list(self._pending_loads)
+        while True:
+            file = self._load_queue.get()
+            if file is _DONE:
+                break
+            files.append(file)
+            if self._per_report_loads:
+                self._load_files(files)
+                files = []
+
+        if files:
+            self._load_files(files)
+
+    def run(self) -> list:
+        """
+        Função para executar o pipeline até que todas as etapas terminem
+
+        Returns:
+            list: Relatórios e arquivos que falharam em alguma etapa
+        """
+        # Listed before the downloads start, otherwise the files downloaded by this run would
+        # be taken from the folder and from the queue
+        pending = self._reports_handler.get_pending_raw_files()
+        reports = queue.Queue()
+        for report in self._reports_handler.get_new_reports():
+            reports.put(report)
+        logging.info(f"Pipeline started with {reports.qsize()} new reports")
+
+        downloaders = [
+            threading.Thread(target=self._download, args=(reports,))
+            for _ in range(self._reports_handler.download_workers)
+        ]
+        processor = threading.Thread(target=self._process, args=(pending,))
+        loader = threading.Thread(target=self._load_reports)
+        for thread in [*downloaders, processor, loader]:
+            thread.start()
+
+        for thread in downloaders:
+            thread.join()
+        self._process_queue.put(_DONE)
+        processor.join()
+        loader.join()
+        if self._on_processed_thread is not None:
+            self._on_processed_thread.join()
+
+        self._reports_handler.finish_run(self._failed)
+        logging.info("Pipeline finished")
+        if self._on_processed_errors:
+            raise self._on_processed_errors[0]
+        return self._failed
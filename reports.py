@@ -1,12 +1,90 @@
 import logging
 from apiclient.http import MediaIoBaseDownload
-from io import FileIO
-from urllib.error import HTTPError
+from apiclient.errors import HttpError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BufferedReader, BytesIO, FileIO, RawIOBase
+from manifest import Manifest
+from metrics import METRICS
+from scheduler import SCHEDULER, Scheduler
+from typing import Callable
 import pandas as pd
 import os
 from datetime import datetime, timedelta
 import apiclient.discovery
+import hashlib
+import httplib2
+import threading
 import json
+import compression
+import storage
+import summaries
+
+
+# Raw columns used to compute the processed columns, read even when not in the schema
+_RAW_COLUMNS = ["date", "ad_impressions", "estimated_cpm", "uploader_type"]
+# Format of the date column of the raw reports
+_RAW_DATE_FORMAT = "%Y%m%d"
+
+class _HashingFile:
+    def __init__(self, fh: FileIO, digest) -> None:
+        """
+        Arquivo que calcula o hash do conteúdo enquanto ele é gravado
+
+        Args:
+            fh (FileIO): Arquivo em que o conteúdo é gravado
+            digest (hashlib._Hash): Hash atualizado a cada escrita
+        """
+        self._fh = fh
+        self._digest = digest
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        return self._fh.write(data)
+
+
+class _DownloadStream(RawIOBase):
+    def __init__(self, request, chunksize: int, scheduler: Scheduler, name: str) -> None:
+        """
+        Arquivo somente leitura que baixa o relatório sob demanda, um pedaço por vez
+
+        Args:
+            request (apiclient.http.HttpRequest): Requisição de download do relatório
+            chunksize (int): Tamanho em bytes de cada pedaço baixado
+            scheduler (Scheduler): Limite de taxa e retentativas do download de cada pedaço
+            name (str): Nome usado nos logs de progresso
+        """
+        self._buffer = BytesIO()
+        self._downloader = MediaIoBaseDownload(self._buffer, request, chunksize=chunksize)
+        self._scheduler = scheduler
+        self._name = name
+        self._chunk = b""
+        self._offset = 0
+        self._done = False
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        # Only one downloaded chunk is kept in memory at a time
+        while self._offset >= len(self._chunk) and not self._done:
+            status, self._done = self._scheduler.call(
+                "youtubereporting.media.download", self._downloader.next_chunk
+            )
+            METRICS.api_call("youtubereporting.media.download")
+            if status:
+                logging.info(f"Download of {self._name} {int(status.progress() * 100)}%.")
+            self._chunk = self._buffer.getvalue()
+            self.digest.update(self._chunk)
+            METRICS.increment("reports.downloaded_bytes", len(self._chunk))
+            self._offset = 0
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+        size = min(len(b), len(self._chunk) - self._offset)
+        b[:size] = self._chunk[self._offset : self._offset + size]
+        self._offset += size
+        return size
 
 
 class ReportsHandler:
@@ -20,6 +98,20 @@ class ReportsHandler:
         report_schema: dict,
         report_name: str,
         report_folder: str,
+        download_workers: int = 1,
+        download_retries: int = 3,
+        http_factory: Callable[[], httplib2.Http] = None,
+        manifest: Manifest = None,
+        streaming: bool = False,
+        chunk_size: int = 8 * 1024 * 1024,
+        batch_rows: int = 100000,
+        file_format: str = "csv",
+        compression: str = "snappy",
+        summary_kinds: list = ("summary",),
+        constant_columns: dict = None,
+        scheduler: Scheduler = None,
+        rollups: list = (),
+        raw_format: str = "csv",
     ) -> None:
         """
         Inicialização da classe
@@ -33,15 +125,55 @@ class ReportsHandler:
             report_schema (dict): Schema dos dados do relatório
             report_name (str): Nome do job dos relatórios do Youtube
             report_folder (str): Caminho da pasta dos relatórios baixados
+            download_workers (int): Número máximo de downloads simultâneos. Com 1, os relatórios
+                são baixados sequencialmente com a conexão de youtube_reporting
+            download_retries (int): Número de tentativas de download de cada relatório
+            http_factory (Callable[[], httplib2.Http]): Função que cria uma nova conexão HTTP
+                autorizada, usada por cada thread de download
+            manifest (Manifest): Manifesto com o estado dos relatórios. Se None, todos os
+                relatórios da pasta são processados em toda execução
+            streaming (bool): Se True, os relatórios são baixados em pedaços e processados
+                durante o download, sem gravar o arquivo raw
+            chunk_size (int): Tamanho em bytes de cada pedaço baixado no modo streaming
+            batch_rows (int): Número de linhas processadas por vez no modo streaming
+            file_format (str): Formato dos relatórios processados, csv ou parquet
+            compression (str): Compressão dos relatórios processados em parquet
+            summary_kinds (list): Resumos de receita gravados junto de cada relatório processado,
+                summary (por vídeo) e/ou summary_channel (por canal)
+            constant_columns (dict): Colunas com um valor fixo adicionadas a todas as linhas
+                processadas, ex: o id do content owner em tabelas compartilhadas
+            scheduler (Scheduler): Limite de taxa e retentativas das chamadas da API. Se None,
+                usa o scheduler compartilhado do processo
+            rollups (list): Rollups gravados junto de cada relatório processado, cada um com
+                NAME, DIMENSIONS e METRICS, ex: receita por date e channel_id
+            raw_format (str): Formato dos relatórios raw, csv, csv.gz ou csv.zst. Relatórios
+                comprimidos são comprimidos durante o download
         """
         self._youtube_reporting = youtube_reporting
         self._content_owner_id = content_owner_id
         self._last_date = last_date
         self._job_id = job_id
+        self._schema = report_schema
         self._columns = self._get_columns_from_schema(report_schema)
+        self._raw_columns = list(dict.fromkeys(self._columns + _RAW_COLUMNS))
         self._report_name = report_name
         self._temp_folder = report_folder
         self._start_date = start_date
+        self._download_workers = max(1, download_workers)
+        self._download_retries = max(1, download_retries)
+        self._http_factory = http_factory
+        self._local = threading.local()
+        self._manifest = manifest
+        self._streaming = streaming
+        self._chunk_size = chunk_size
+        self._batch_rows = batch_rows
+        self._file_format = file_format
+        self._compression = compression
+        self._summary_kinds = list(summary_kinds)
+        self._constant_columns = constant_columns or {}
+        self._scheduler = scheduler or SCHEDULER
+        self._rollups = list(rollups)
+        self._raw_format = raw_format
 
     def _get_columns_from_schema(self, report_schema: dict) -> list:
         """
@@ -56,39 +188,60 @@ class ReportsHandler:
         return [column["name"] for column in report_schema]
 
     # Call the YouTube Reporting API's reports.list method to retrieve reports created by a job.
-    def _retrieve_reports(self) -> list:
+    def _retrieve_reports(self, start_time: str = None, end_time: str = None) -> list:
         """
         Função para extrair todos os relatórios do youtube para o job selecionado, para o Content Owner definido e
-        criados após a última data analisada
+        criados após a última data analisada, percorrendo todas as páginas da listagem
+
+        Com start_time e end_time, lista os relatórios com startTime no intervalo, independente
+        da data de criação e de start_date, como no backfill
+
+        Args:
+            start_time (str): Primeiro startTime dos relatórios, ex: 2022-01-01T00:00:00Z
+            end_time (str): startTime final dos relatórios, exclusivo
 
         Returns:
             list: lista de dicts contendo as principais informações sobre os relatórios
         """
+        if start_time is None and end_time is None:
+            params = {"createdAfter": self._last_date}
+            start_date = self._start_date
+        else:
+            params = {"startTimeAtOrAfter": start_time, "startTimeBefore": end_time}
+            # The range is the backfill's, which may start before START_DATE
+            start_date = start_time
+
         logging.info('Retrieving reports')
-        results = (
-            self._youtube_reporting.jobs()
-            .reports()
-            .list(
-                jobId=self._job_id,
-                onBehalfOfContentOwner=self._content_owner_id,
-                createdAfter=self._last_date,
-            )
-            .execute()
-        )
-        logging.info("Reports retrieved")
-
-        if "reports" in results and results["reports"]:
-            reports = []
-            for report in results["reports"]:
-                if report["startTime"] >= self._start_date:
-                    reports.append(
-                        {
-                            "url": report["downloadUrl"],
-                            "created_date": report["createTime"],
-                            "date": report["startTime"],
-                        }
-                    )
-            return reports
+        reports = []
+        page_token = None
+        with METRICS.stage("reports.list"):
+            while True:
+                results = self._scheduler.execute(
+                    self._youtube_reporting.jobs()
+                    .reports()
+                    .list(
+                        jobId=self._job_id,
+                        onBehalfOfContentOwner=self._content_owner_id,
+                        pageToken=page_token,
+                        **params,
+                    ),
+                    http=self._get_http(),
+                )
+                METRICS.api_call("youtubereporting.jobs.reports.list")
+                for report in results.get("reports", []):
+                    if report["startTime"] >= start_date:
+                        reports.append(
+                            {
+                                "url": report["downloadUrl"],
+                                "created_date": report["createTime"],
+                                "date": report["startTime"],
+                            }
+                        )
+                page_token = results.get("nextPageToken")
+                if not page_token:
+                    break
+        logging.info(f"{len(reports)} reports retrieved")
+        return reports
 
     # If there's more than one report with same date but different created_date
     # get only the latest report
@@ -113,55 +266,554 @@ class ReportsHandler:
         return df.to_dict("records")
 
     # Call the YouTube Reporting API's media.download method to download the report.
-    def _download_report(self, report_url: str, local_file: str) -> None:
+    def _download_report(self, report_url: str, local_file: str, http: httplib2.Http = None) -> str:
         """
         Função para baixar os relatórios listados na API
 
         Args:
             report_url (str): url do relatório
             local_file (str): nome do arquivo local em que o relatório será salvo
+            http (httplib2.Http): Conexão autorizada usada no download. Se None, usa a
+                conexão de self._youtube_reporting
+
+        Returns:
+            str: Hash sha256 do conteúdo do relatório
         """
         request = self._youtube_reporting.media().download(resourceName=" ")
         request.uri = report_url
+        if http is not None:
+            request.http = http
 
-        fh = FileIO(local_file, mode="wb")
-        # Stream/download the report in a single request.
-        downloader = MediaIoBaseDownload(fh, request, chunksize=-1)
+        digest = hashlib.sha256()
+        with compression.open_file(local_file, "wb") as fh:
+            # Stream/download the report in a single request.
+            downloader = MediaIoBaseDownload(_HashingFile(fh, digest), request, chunksize=-1)
 
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-            if status:
-                logging.info(
-                    f"Download of {local_file} {int(status.progress() * 100)}%."
+            done = False
+            while done is False:
+                status, done = self._scheduler.call(
+                    "youtubereporting.media.download", downloader.next_chunk
                 )
+                METRICS.api_call("youtubereporting.media.download")
+                if status:
+                    logging.info(
+                        f"Download of {local_file} {int(status.progress() * 100)}%."
+                    )
         logging.info(f"Download of {local_file} Complete!")
+        METRICS.increment("reports.downloaded_bytes", os.path.getsize(local_file))
+        return digest.hexdigest()
+
+    def _get_http(self) -> httplib2.Http:
+        """
+        Função para obter a conexão HTTP autorizada da thread atual
+
+        Returns:
+            httplib2.Http: Conexão da thread, ou None quando não há http_factory
+        """
+        if self._http_factory is None:
+            return None
+
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._http_factory()
+            self._local.http = http
+        return http
+
+    def _stream_report(self, report_url: str, local_file: str, http: httplib2.Http = None) -> str:
+        """
+        Função para baixar e processar um relatório em pedaços, sem gravar o arquivo raw
+
+        Os bytes baixados alimentam diretamente o leitor de CSV, que processa o relatório em lotes
+        de self._batch_rows linhas, mantendo a memória limitada independente do tamanho do relatório
+
+        Args:
+            report_url (str): url do relatório
+            local_file (str): nome do arquivo processado em que o relatório será salvo
+            http (httplib2.Http): Conexão autorizada usada no download. Se None, usa a
+                conexão de self._youtube_reporting
+
+        Returns:
+            str: Hash sha256 do conteúdo do relatório
+        """
+        request = self._youtube_reporting.media().download(resourceName=" ")
+        request.uri = report_url
+        if http is not None:
+            request.http = http
+
+        download = _DownloadStream(request, self._chunk_size, self._scheduler, local_file)
+        stream = BufferedReader(download)
+        writer = storage.ReportWriter(local_file, self._schema, self._compression)
+        aggregators = self._get_aggregators()
+        with stream, writer:
+            batches = storage.read_typed_csv(
+                stream,
+                self._schema,
+                self._raw_columns,
+                _RAW_DATE_FORMAT,
+                chunksize=self._batch_rows,
+            )
+            for batch in batches:
+                df = self._transform_report(batch)
+                writer.write(df)
+                for aggregator in aggregators.values():
+                    aggregator.add(df)
+        logging.info(f"Report {local_file} streamed, {writer.rows} rows processed")
+        METRICS.increment("reports.rows_processed", writer.rows)
+        self._write_summaries(aggregators, local_file)
+        return download.digest.hexdigest()
+
+    def _get_local_file(self, report: dict, kind: str = "raw") -> str:
+        """
+        Função para montar o caminho do arquivo local de um relatório
+
+        Args:
+            report (dict): Relatório vindo do youtube
+            kind (str): Tipo do arquivo, raw ou processed
+
+        Returns:
+            str: Caminho do arquivo do relatório
+        """
+        report_date = report["date"].split("T")[0].replace("-", "")
+        file_format = self._raw_format if kind == "raw" else self._file_format
+        return storage.get_report_path(
+            self._temp_folder, kind, f"{self._report_name}-{report_date}", file_format
+        )
+
+    def _download_with_retry(self, report: dict) -> str:
+        """
+        Função para baixar um relatório, tentando novamente em caso de falha
+
+        No modo streaming o relatório é processado durante o download
+
+        Args:
+            report (dict): Relatório vindo do youtube
+
+        Returns:
+            str: Caminho do arquivo baixado
+        """
+        if self._streaming:
+            local_file = self._get_local_file(report, "processed")
+            fetch = self._stream_report
+            stage = "reports.stream"
+        else:
+            local_file = self._get_local_file(report)
+            fetch = self._download_report
+            stage = "reports.download"
+
+        for attempt in range(1, self._download_retries + 1):
+            try:
+                with METRICS.stage(stage):
+                    content_hash = fetch(report["url"], local_file, http=self._get_http())
+                self._record_download(report, local_file, content_hash)
+                METRICS.increment("reports.downloaded")
+                return local_file
+            except (HttpError, httplib2.HttpLib2Error, OSError) as e:
+                METRICS.increment("reports.download_errors")
+                logging.warning(
+                    f"Download of {local_file} failed "
+                    f"(attempt {attempt}/{self._download_retries}): {e}"
+                )
+
+        # Do not leave a truncated file behind to be processed
+        if os.path.exists(local_file):
+            os.remove(local_file)
+        METRICS.increment("reports.download_failures")
+        raise RuntimeError(f"Download of {local_file} failed")
+
+    def _record_download(self, report: dict, local_file: str, content_hash: str) -> None:
+        """
+        Função para registrar o download de um relatório no manifesto
+
+        Args:
+            report (dict): Relatório vindo do youtube
+            local_file (str): Caminho do arquivo baixado
+            content_hash (str): Hash do conteúdo do relatório
+        """
+        if self._manifest is None:
+            return
+
+        stem = storage.get_report_stem(local_file)
+        self._manifest.record_download(
+            stem,
+            stem.split("-")[-1],
+            report["url"],
+            report["created_date"],
+            content_hash,
+            None if self._streaming else local_file,
+        )
+        # Streamed reports are processed while downloading
+        if self._streaming and self._manifest.get(stem)["status"] == "downloaded":
+            self._manifest.mark_processed(stem, local_file, self._get_summary_file(local_file))
+
+    @property
+    def download_workers(self) -> int:
+        """
+        Número de downloads simultâneos. Sem http_factory os downloads são sequenciais
+        """
+        if self._download_workers > 1 and self._http_factory is None:
+            logging.warning("No http_factory given, downloading reports sequentially")
+            return 1
+        return self._download_workers
+
+    @property
+    def streaming(self) -> bool:
+        """
+        Se True, os relatórios são processados durante o download
+        """
+        return self._streaming
+
+    def list_reports(self, start_time: str = None, end_time: str = None) -> list:
+        """
+        Função para listar a versão mais recente de cada relatório
+
+        Args:
+            start_time (str): Primeiro startTime dos relatórios. Se None, lista os relatórios
+                criados após a última data de processamento
+            end_time (str): startTime final dos relatórios, exclusivo
+
+        Returns:
+            list: Relatórios vindos do youtube, um por data
+        """
+        reports = self._retrieve_reports(start_time, end_time)
+        if not reports:
+            return []
+        return [report for report in self._filter_reports(reports) if report]
+
+    def get_new_reports(self) -> list:
+        """
+        Função para listar os relatórios que ainda precisam ser baixados
+
+        Returns:
+            list: Relatórios vindos do youtube, sem as versões já baixadas
+        """
+        reports = self.list_reports()
+        if not reports:
+            logging.info("No new reports")
+            return []
+        if self._manifest is not None:
+            current = [
+                report
+                for report in reports
+                if self._manifest.is_current(
+                    storage.get_report_stem(self._get_local_file(report)),
+                    report["created_date"],
+                )
+            ]
+            if current:
+                logging.info(f"Skipping {len(current)} reports already downloaded")
+            reports = [report for report in reports if report not in current]
+        return reports
+
+    def fetch_report(self, report: dict) -> str:
+        """
+        Função para baixar um relatório. No modo streaming o relatório é processado
+        durante o download
+
+        Args:
+            report (dict): Relatório vindo do youtube
+
+        Returns:
+            str: Caminho do arquivo raw, ou do arquivo processado no modo streaming
+        """
+        return self._download_with_retry(report)
+
+    def needs_load(self, processed_file: str) -> bool:
+        """
+        Função para verificar se um arquivo processado ainda precisa ser carregado
+
+        Um relatório baixado de novo com o mesmo conteúdo mantém o estado loaded no manifesto
+
+        Args:
+            processed_file (str): Caminho do arquivo processado
+
+        Returns:
+            bool: True se o relatório ainda não foi carregado
+        """
+        if self._manifest is None:
+            return True
+        row = self._manifest.get(storage.get_report_stem(processed_file))
+        return row is None or row["status"] == "processed"
+
+    def fetch_and_process(self, report: dict) -> str:
+        """
+        Função para baixar e processar um relatório, retomando de onde uma execução anterior
+        parou: relatórios já baixados não são baixados de novo e relatórios já processados não
+        são processados de novo
+
+        Args:
+            report (dict): Relatório vindo do youtube
+
+        Returns:
+            str: Caminho do arquivo processado, ou None se ele já foi processado antes
+        """
+        stem = storage.get_report_stem(self._get_local_file(report))
+        if self._manifest is not None and self._manifest.is_current(stem, report["created_date"]):
+            file = self._manifest.get(stem)["raw_file"]
+        else:
+            file = self.fetch_report(report)
+            if self._streaming:
+                return file
+
+        # Streamed reports have no raw file and were processed while downloading
+        if not file:
+            return None
+        return self.process_report(file)
+
+    def _download_reports(self, reports: list) -> list:
+        """
+        Função para baixar os relatórios, em paralelo quando download_workers > 1
+
+        Uma falha de download não interrompe os demais downloads
+
+        Args:
+            reports (list): Relatórios vindos do youtube
+
+        Returns:
+            list: Relatórios cujo download falhou
+        """
+        workers = self.download_workers
+        failed = []
+        total = len(reports)
+        logging.info(f"Downloading {total} reports with {workers} workers")
+        if workers == 1:
+            for i, report in enumerate(reports, start=1):
+                try:
+                    self._download_with_retry(report)
+                    logging.info(f"Downloaded {i}/{total} reports")
+                except RuntimeError as e:
+                    logging.error(e)
+                    failed.append(report)
+            return failed
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._download_with_retry, report): report
+                for report in reports
+            }
+            for i, future in enumerate(as_completed(futures), start=1):
+                try:
+                    future.result()
+                    logging.info(f"Downloaded {i}/{total} reports")
+                except RuntimeError as e:
+                    logging.error(e)
+                    failed.append(futures[future])
+        return failed
+
+    def _transform_report(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Função para calcular as colunas do relatório processado a partir do relatório raw
+
+        Args:
+            df (pd.DataFrame): Linhas do relatório raw
+
+        Returns:
+            pd.DataFrame: Linhas do relatório processado
+        """
+        # Reports read with storage.read_typed_csv already have the dates parsed
+        if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+            df["date"] = storage.parse_date(df["date"], _RAW_DATE_FORMAT)
+        df["estimated_youtube_ad_revenue"] = (df["ad_impressions"] * (df["estimated_cpm"])) / 1000
+        df["is_self_uploaded"] = df["uploader_type"] == "self"
+        for column, value in self._constant_columns.items():
+            df[column] = value
+        return df[df.columns.intersection(self._columns)]
+
+    def _get_aggregators(self) -> dict:
+        """
+        Função para criar os agregadores dos resumos e dos rollups de um relatório
+
+        Returns:
+            dict: Dict com o tipo do resumo ou do rollup e o seu agregador
+        """
+        aggregators = summaries.get_aggregators(self._summary_kinds)
+        aggregators.update(summaries.get_rollup_aggregators(self._rollups))
+        return aggregators
+
+    def _get_summary_file(self, processed_file: str) -> str:
+        """
+        Função para montar o caminho do resumo por vídeo de um relatório processado, gravado no
+        formato do arquivo processado
+
+        Args:
+            processed_file (str): Caminho do arquivo processado
+
+        Returns:
+            str: Caminho do resumo, ou None se o resumo por vídeo não é gravado
+        """
+        if "summary" not in self._summary_kinds:
+            return None
+        return storage.get_report_path(
+            self._temp_folder,
+            "summary",
+            storage.get_report_stem(processed_file),
+            storage.get_report_format(processed_file),
+        )
+
+    def _write_summaries(self, aggregators: dict, processed_file: str) -> None:
+        """
+        Função para gravar os resumos de receita de um relatório processado
+
+        Args:
+            aggregators (dict): Dict com o tipo do resumo e o seu agregador
+            processed_file (str): Caminho do arquivo processado
+        """
+        summaries.write_summaries(
+            aggregators,
+            self._temp_folder,
+            storage.get_report_stem(processed_file),
+            self._file_format,
+            self._compression,
+            schemas={
+                summaries.get_rollup_kind(rollup["NAME"]): summaries.get_rollup_schema(
+                    rollup, self._schema
+                )
+                for rollup in self._rollups
+            },
+        )
+
+    def get_pending_raw_files(self) -> list:
+        """
+        Função para listar os arquivos raw que ainda não foram processados
+
+        Returns:
+            list: Caminhos dos arquivos raw
+        """
+        if self._manifest is None:
+            return self._list_own_reports("raw")
+        self._index_folder()
+        return [
+            row["raw_file"]
+            for row in self._manifest.pending("downloaded", self._report_name)
+            if row["raw_file"]
+        ]
+
+    def _index_folder(self) -> None:
+        """
+        Função para registrar no manifesto, uma única vez, os arquivos gravados na pasta antes do
+        manifesto existir. Depois disso o manifesto é o índice dos arquivos e a pasta não é mais
+        listada
+        """
+        self._index_summaries()
+        key = f"FOLDER_INDEXED:{self._report_name}"
+        if self._manifest.get_state(key):
+            return
+
+        # Processed files first, so that their raw files are not processed again
+        files = []
+        for file in self._list_own_reports("processed"):
+            summary_file = self._get_summary_file(file)
+            if summary_file and not os.path.exists(summary_file):
+                summary_file = None
+            files.append((storage.get_report_stem(file), file, summary_file))
+        self._manifest.add_processed(files)
+        for file in self._list_own_reports("raw"):
+            self._manifest.needs_processing(storage.get_report_stem(file), file)
+        self._manifest.set_state(key, datetime.utcnow().isoformat())
+
+    def _index_summaries(self) -> None:
+        """
+        Função para registrar no manifesto, uma única vez, os resumos dos relatórios processados
+        antes do manifesto guardar o caminho dos resumos
+        """
+        key = f"SUMMARIES_INDEXED:{self._report_name}"
+        if self._manifest.get_state(key):
+            return
+
+        for row in self._manifest.processed_reports(self._report_name):
+            if row["summary_file"] or "summary" not in self._summary_kinds:
+                continue
+            file_format = (
+                storage.get_report_format(row["processed_file"])
+                if row["processed_file"]
+                else self._file_format
+            )
+            summary_file = storage.get_report_path(
+                self._temp_folder, "summary", row["report"], file_format
+            )
+            if os.path.exists(summary_file):
+                self._manifest.mark_summary(row["report"], summary_file)
+        self._manifest.set_state(key, datetime.utcnow().isoformat())
+
+    def _list_own_reports(self, kind: str) -> list:
+        """
+        Função para listar os arquivos de um tipo que pertencem a este job, já que a pasta pode
+        ter relatórios de outros jobs do mesmo content owner
+
+        Args:
+            kind (str): Tipo do arquivo, raw ou processed
+
+        Returns:
+            list: Lista ordenada com os caminhos dos arquivos
+        """
+        return [
+            file
+            for file in storage.list_reports(self._temp_folder, kind)
+            if storage.get_report_stem(file).rsplit("-", 1)[0] == self._report_name
+        ]
+
+    def process_report(self, file: str) -> str:
+        """
+        Função para processar um relatório de receita, calculando valores mais precisos
+        para o estimated_youtube_ad_revenue
+
+        Args:
+            file (str): Caminho do arquivo raw
+
+        Returns:
+            str: Caminho do arquivo processado, ou None se o relatório já foi processado
+        """
+        stem = storage.get_report_stem(file)
+        if self._manifest is not None and not self._manifest.needs_processing(stem, file):
+            logging.info(f"Report {file} already processed, skipping")
+            return None
+
+        with METRICS.stage("reports.process"):
+            df = storage.read_typed_csv(file, self._schema, self._raw_columns, _RAW_DATE_FORMAT)
+
+            # Formats columns
+            df = self._transform_report(df)
+
+            # Save in the intermediate format
+            processed_file = storage.get_report_path(
+                self._temp_folder, "processed", stem, self._file_format
+            )
+            with storage.ReportWriter(processed_file, self._schema, self._compression) as writer:
+                writer.write(df)
+            logging.info(f"Report {processed_file} processed")
+
+            aggregators = self._get_aggregators()
+            for aggregator in aggregators.values():
+                aggregator.add(df)
+            self._write_summaries(aggregators, processed_file)
+        METRICS.increment("reports.rows_processed", len(df))
+
+        if self._manifest is not None:
+            self._manifest.mark_processed(
+                stem, processed_file, self._get_summary_file(processed_file)
+            )
+        return processed_file
 
     def _process_revenue_reports(self) -> None:
         """
         Função para processar os relatórios de receita, calculando valores mais precisos
         para o estimated_youtube_ad_revenue
         """
-        for file in os.scandir(self._temp_folder):
-            if 'raw' in file.name:
-                df = pd.read_csv(file)
-
-                # Formats columns
-                df["date"] = pd.to_datetime(df["date"], format="%Y%m%d")
-                df["estimated_youtube_ad_revenue"] = (df["ad_impressions"] * (df["estimated_cpm"])) / 1000
-                df["is_self_uploaded"] = df["uploader_type"] == "self"
-                df = df[df.columns.intersection(self._columns)]
-                
-                # Save as csv
-                file_name = '-'.join(file.name.split("-")[1:])
-                df.to_csv(f"./{self._temp_folder}/processed-{file_name}", index=False)
-                logging.info(f"Report processed-{file.name} processed")
+        for file in self.get_pending_raw_files():
+            self.process_report(file)
 
     def _update_report_date(self) -> None:
         """
         Função para atualizar a última data de processamento
+
+        Com manifesto, a data fica no estado do manifesto, separada por job, e não no
+        config.json compartilhado entre os content owners
         """
         last_date = datetime.today().strftime("%Y-%m-%dT%H:%M:%SZ")
+        if self._manifest is not None:
+            self._manifest.set_last_date(self._report_name, last_date)
+            logging.info("Date updated")
+            return
+
         with open("config.json", "r") as jsonfile:
             data = json.load(jsonfile)
             data["REPORTING"]["LAST_DATE"] = last_date
@@ -170,20 +822,28 @@ class ReportsHandler:
             json.dump(data, jsonfile, indent=4)
             logging.info("Date updated")
 
+    def finish_run(self, failed: list) -> None:
+        """
+        Função para finalizar a execução, atualizando a última data de processamento
+
+        Args:
+            failed (list): Relatórios que falharam na execução
+        """
+        # Keep the last date so that failed reports are retrieved again on the next run
+        if failed:
+            logging.error(f"{len(failed)} reports failed, date not updated")
+        else:
+            self._update_report_date()
+
     def run_reports(self) -> None:
         """
         Função para executar a sequência dos relatórios
         """
         try:
-            reports = self._retrieve_reports()
-            reports = self._filter_reports(reports)
-            for report in reports:
-                # Download the selected report.
-                if report:
-                    local_file = f'{self._temp_folder}/raw-{self._report_name}-{report["date"].split("T")[0].replace("-","")}.csv'
-                    self._download_report(report["url"], local_file)
+            reports = self.get_new_reports()
+            failed = self._download_reports(reports)
 
             self._process_revenue_reports()
-            self._update_report_date()
-        except HTTPError as e:
+            self.finish_run(failed)
+        except HttpError as e:
             logging.error("An HTTP error %d occurred:\n%s" % (e.resp.status, e.content))
@@ -0,0 +1,110 @@
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+from manifest import Manifest
+from metrics import METRICS
+import storage
+
+
+# Kinds of files whose paths are kept in the manifest
+_MANIFEST_COLUMNS = {"raw": "raw_file", "processed": "processed_file", "summary": "summary_file"}
+MODES = ("delete", "archive")
+
+
+class RetentionPolicy:
+    def __init__(
+        self,
+        mode: str = "delete",
+        keep_days: int = 0,
+        archive_folder: str = None,
+        kinds: list = None,
+    ) -> None:
+        """
+        Inicialização da classe
+
+        Remove ou arquiva os arquivos dos relatórios carregados no BigQuery há mais de keep_days
+        dias. Resumos e snapshots não entram na política, pois são lidos pelas execuções
+        seguintes. Os snapshots expiram depois de DELTA_WINDOW_DAYS (delta.expire_snapshots)
+
+        Args:
+            mode (str): delete remove os arquivos e archive os move para archive_folder
+            keep_days (int): Número de dias que os arquivos são mantidos depois da carga
+            archive_folder (str): Pasta dos arquivos arquivados. Se None, a pasta archive
+                dentro da pasta dos relatórios
+            kinds (list): Tipos dos arquivos da política, ex: raw, processed ou os tipos dos
+                rollups. Se None, raw e processed
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown retention mode: {mode}, expected one of {MODES}")
+        self._mode = mode
+        self._keep_days = max(0, keep_days)
+        self._archive_folder = archive_folder
+        self._kinds = list(kinds or ("raw", "processed"))
+
+    def _retain(self, path: str, folder: str) -> str:
+        """
+        Função para remover ou arquivar um arquivo
+
+        Args:
+            path (str): Caminho do arquivo
+            folder (str): Pasta dos relatórios
+
+        Returns:
+            str: Novo caminho do arquivo, ou None se ele foi removido ou não existe
+        """
+        if not path or not os.path.exists(path):
+            return None
+        if self._mode == "delete":
+            os.remove(path)
+            return None
+
+        archive_folder = self._archive_folder or f"{folder}/archive"
+        os.makedirs(archive_folder, exist_ok=True)
+        archived = f"{archive_folder}/{os.path.basename(path)}"
+        shutil.move(path, archived)
+        return archived
+
+    def apply(self, manifest: Manifest, folder: str, report_name: str = None) -> int:
+        """
+        Função para aplicar a política aos relatórios carregados
+
+        Args:
+            manifest (Manifest): Manifesto com o estado dos relatórios
+            folder (str): Pasta dos relatórios
+            report_name (str): Nome do job dos relatórios. Se None, aplica aos relatórios de
+                todos os jobs do manifesto
+
+        Returns:
+            int: Número de relatórios cujos arquivos passaram pela política
+        """
+        cutoff = (datetime.utcnow() - timedelta(days=self._keep_days)).isoformat()
+        reports = manifest.loaded_before(cutoff, report_name)
+        for report in reports:
+            files = {
+                kind: report[column]
+                for kind, column in _MANIFEST_COLUMNS.items()
+                if kind in self._kinds
+            }
+            if report["processed_file"]:
+                # Rollups are written next to the processed file, in the same format
+                file_format = storage.get_report_format(report["processed_file"])
+                for kind in self._kinds:
+                    if kind not in _MANIFEST_COLUMNS:
+                        files[kind] = storage.get_report_path(
+                            folder, kind, report["report"], file_format
+                        )
+
+            retained = {kind: self._retain(path, folder) for kind, path in files.items()}
+            manifest.mark_retained(
+                report["report"],
+                retained.get("raw", report["raw_file"]),
+                retained.get("processed", report["processed_file"]),
+                retained.get("summary", report["summary_file"]),
+            )
+
+        if reports:
+            verb = "deleted" if self._mode == "delete" else "archived"
+            logging.info(f"Retention policy: files of {len(reports)} loaded reports {verb}")
+        METRICS.increment("retention.reports", len(reports))
+        return len(reports)
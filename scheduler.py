@@ -0,0 +1,298 @@
+import functools
+import logging
+import random
+import socket
+import threading
+import time
+from typing import Callable
+import httplib2
+from metrics import METRICS, QUOTA_COSTS
+
+
+# HTTP statuses worth retrying: rate limits and transient server errors
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# 403 is also used for rate limits; daily quota errors (quotaExceeded) are not retried
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+_TRANSIENT_ERRORS = (httplib2.HttpLib2Error, socket.timeout, ConnectionError, TimeoutError)
+
+
+class TokenBucket:
+    def __init__(self, rate: float = None, burst: float = None, min_rate: float = None) -> None:
+        """
+        Inicialização da classe
+
+        Limita as chamadas de uma API a rate unidades de quota por segundo, permitindo rajadas
+        de até burst unidades. A taxa é reduzida pela metade a cada erro de limite e volta
+        aos poucos para a taxa configurada enquanto as chamadas têm sucesso. Uma falha também
+        pausa todas as chamadas do bucket até o fim do backoff
+
+        Args:
+            rate (float): Unidades de quota por segundo. Se None, as chamadas não são limitadas,
+                só pausadas após erros
+            burst (float): Número máximo de unidades acumuladas. Se None, igual a rate
+            min_rate (float): Taxa mínima após as reduções. Se None, 5% de rate
+        """
+        self._max_rate = rate
+        self._rate = rate
+        self._burst = burst or rate or 0
+        self._min_rate = min_rate or (rate * 0.05 if rate else None)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """
+        Taxa atual em unidades de quota por segundo
+        """
+        return self._rate
+
+    @property
+    def failures(self) -> int:
+        """
+        Número de falhas seguidas desde o último sucesso
+        """
+        return self._failures
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Função para aguardar até que a chamada possa ser feita
+
+        Args:
+            tokens (float): Unidades de quota da chamada
+
+        Returns:
+            float: Tempo de espera em segundos
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0 and self._rate is None:
+                    return waited
+                if wait <= 0:
+                    self._tokens = min(
+                        self._burst, self._tokens + (now - self._updated) * self._rate
+                    )
+                    self._updated = now
+                    # Calls larger than the burst wait for a full bucket instead of forever
+                    needed = min(tokens, self._burst)
+                    if self._tokens >= needed:
+                        self._tokens -= tokens
+                        return waited
+                    wait = (needed - self._tokens) / self._rate
+            time.sleep(wait)
+            waited += wait
+
+    def success(self) -> None:
+        """
+        Função para registrar uma chamada com sucesso, recuperando a taxa aos poucos
+        """
+        with self._lock:
+            self._failures = 0
+            if self._rate is not None and self._rate < self._max_rate:
+                self._rate = min(self._max_rate, self._rate + self._max_rate * 0.05)
+
+    def failure(self, delay: float, throttled: bool) -> None:
+        """
+        Função para registrar uma chamada com falha, pausando o bucket
+
+        Args:
+            delay (float): Tempo em segundos da pausa
+            throttled (bool): Se True, a falha foi um erro de limite e a taxa é reduzida
+        """
+        with self._lock:
+            self._failures += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            if throttled and self._rate is not None:
+                self._rate = max(self._min_rate, self._rate / 2)
+                self._tokens = min(self._tokens, 0)
+
+
+class Scheduler:
+    def __init__(
+        self,
+        limits: dict = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 64.0,
+    ) -> None:
+        """
+        Inicialização da classe
+
+        Executa as chamadas às APIs do Google respeitando um token bucket por API e por bucket
+        de quota, com retentativas das chamadas idempotentes em erros de limite (429, 403
+        rateLimitExceeded), erros 5xx e falhas de conexão. A espera entre as tentativas segue
+        um backoff exponencial com jitter, ou o Retry-After da resposta quando existe
+
+        Args:
+            limits (dict): Limites por API ou endpoint, ex: {"youtube": {"RATE": 50, "BURST":
+                100}, "youtubereporting.media.download": {"RATE": 5}}. O endpoint usa o limite
+                do prefixo mais específico; sem limite, só o backoff é aplicado
+            max_retries (int): Número máximo de retentativas de cada chamada
+            base_delay (float): Espera em segundos antes da primeira retentativa
+            max_delay (float): Espera máxima em segundos entre as tentativas
+        """
+        self._limits = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.configure(limits, max_retries, base_delay, max_delay)
+
+    def configure(
+        self,
+        limits: dict = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 64.0,
+    ) -> None:
+        """
+        Função para configurar os limites e as retentativas, descartando os buckets atuais
+
+        Args:
+            limits (dict): Limites por API ou endpoint
+            max_retries (int): Número máximo de retentativas de cada chamada
+            base_delay (float): Espera em segundos antes da primeira retentativa
+            max_delay (float): Espera máxima em segundos entre as tentativas
+        """
+        with self._lock:
+            self._limits = dict(limits or {})
+            self._buckets = {}
+        self._max_retries = max(0, max_retries)
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        """
+        Função para obter o token bucket de um endpoint
+
+        Args:
+            endpoint (str): Id do método da API, ex: youtube.videos.list
+
+        Returns:
+            TokenBucket: Bucket do prefixo mais específico com limite configurado, ou o bucket
+                sem limite da API
+        """
+        parts = endpoint.split(".")
+        prefixes = [".".join(parts[:size]) for size in range(len(parts), 0, -1)]
+        key = next((prefix for prefix in prefixes if prefix in self._limits), parts[0])
+        with self._lock:
+            if key not in self._buckets:
+                limit = self._limits.get(key, {})
+                self._buckets[key] = TokenBucket(
+                    limit.get("RATE"), limit.get("BURST"), limit.get("MIN_RATE")
+                )
+            return self._buckets[key]
+
+    def _is_retryable(self, error: Exception) -> tuple:
+        """
+        Função para classificar um erro de uma chamada
+
+        Args:
+            error (Exception): Erro da chamada
+
+        Returns:
+            tuple: Se o erro é transitório e se é um erro de limite
+        """
+        resp = getattr(error, "resp", None)
+        status = getattr(resp, "status", None)
+        if status is None:
+            return isinstance(error, _TRANSIENT_ERRORS), False
+        status = int(status)
+        if status == 403:
+            content = getattr(error, "content", b"") or b""
+            if isinstance(content, bytes):
+                content = content.decode("utf-8", "replace")
+            throttled = any(reason in content for reason in _RATE_LIMIT_REASONS)
+            return throttled, throttled
+        return status in _RETRY_STATUSES, status == 429
+
+    def _delay(self, error: Exception, failures: int) -> float:
+        """
+        Função para calcular a espera antes da próxima tentativa
+
+        Args:
+            error (Exception): Erro da chamada
+            failures (int): Número de falhas seguidas do bucket
+
+        Returns:
+            float: Espera em segundos, com full jitter sobre o backoff exponencial
+        """
+        resp = getattr(error, "resp", None)
+        retry_after = resp.get("retry-after") if hasattr(resp, "get") else None
+        if retry_after is not None and str(retry_after).isdigit():
+            return min(self._max_delay, float(retry_after))
+        backoff = min(self._max_delay, self._base_delay * 2 ** max(0, failures - 1))
+        return random.uniform(backoff / 2, backoff)
+
+    def call(
+        self,
+        endpoint: str,
+        function: Callable[[], object],
+        cost: float = None,
+        idempotent: bool = True,
+    ):
+        """
+        Função para executar uma chamada com limite de taxa e retentativas
+
+        Args:
+            endpoint (str): Id do método da API, ex: youtube.videos.list
+            function (Callable[[], object]): Função que faz a chamada
+            cost (float): Unidades de quota da chamada. Se None, usa QUOTA_COSTS
+            idempotent (bool): Se False, a chamada não é repetida após uma falha
+
+        Returns:
+            object: Retorno da função
+        """
+        bucket = self.bucket(endpoint)
+        cost = QUOTA_COSTS.get(endpoint, 1) if cost is None else cost
+        attempt = 0
+        while True:
+            waited = bucket.acquire(cost)
+            if waited:
+                METRICS.increment("scheduler.wait_seconds", waited)
+            try:
+                result = function()
+            except Exception as e:
+                retryable, throttled = self._is_retryable(e)
+                if not retryable:
+                    raise
+                if throttled:
+                    METRICS.increment("scheduler.throttled")
+                delay = self._delay(e, bucket.failures + 1)
+                bucket.failure(delay, throttled)
+                if not idempotent or attempt >= self._max_retries:
+                    raise
+                attempt += 1
+                METRICS.increment("scheduler.retries")
+                logging.warning(
+                    f"Call to {endpoint} failed (attempt {attempt}/{self._max_retries}), "
+                    f"retrying in {delay:.1f}s: {e}"
+                )
+                continue
+            bucket.success()
+            return result
+
+    def execute(self, request, http: httplib2.Http = None, idempotent: bool = True) -> dict:
+        """
+        Função para executar uma requisição da API
+
+        Args:
+            request (apiclient.http.HttpRequest): Requisição da API
+            http (httplib2.Http): Conexão autorizada usada na requisição. Se None, usa a
+                conexão da requisição
+            idempotent (bool): Se False, a requisição não é repetida após uma falha
+
+        Returns:
+            dict: Resposta da API
+        """
+        return self.call(
+            request.methodId,
+            functools.partial(request.execute, http=http),
+            idempotent=idempotent,
+        )
+
+
+SCHEDULER = Scheduler()
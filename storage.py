@@ -0,0 +1,468 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+import compression
+
+
+# Extension of the files for each intermediate format. Compressed csv files are decompressed
+# while read; parquet files are compressed internally
+EXTENSIONS = {
+    "csv": ".csv",
+    "csv.gz": ".csv" + compression.GZIP_EXTENSION,
+    "csv.zst": ".csv" + compression.ZSTD_EXTENSION,
+    "parquet": ".parquet",
+}
+
+# Pandas dtypes for each BigQuery column type
+_PANDAS_DTYPES = {
+    "STRING": "string",
+    "INTEGER": "Int64",
+    "INT64": "Int64",
+    "FLOAT": "float64",
+    "FLOAT64": "float64",
+    "NUMERIC": "float64",
+    "BOOLEAN": "boolean",
+    "BOOL": "boolean",
+}
+_DATE_TYPES = ("DATE", "DATETIME", "TIMESTAMP")
+_INTEGER_TYPES = ("INTEGER", "INT64")
+# Dimensions of the YouTube reports with few distinct values, read as category. Other STRING
+# columns (titles, asset and custom ids) may be almost unique, where a category costs more
+# memory than the strings. The "dtype" key of a schema column overrides this list
+CATEGORY_COLUMNS = {
+    "country_code",
+    "province_code",
+    "claimed_status",
+    "uploader_type",
+    "asset_type",
+    "content_type",
+    "device_type",
+    "operating_system",
+    "subscribed_status",
+    "live_or_on_demand",
+    "playback_location_type",
+    "traffic_source_type",
+    "sharing_service",
+    "annotation_type",
+    "card_type",
+    "end_screen_element_type",
+    "age_group",
+    "gender",
+}
+
+
+def get_dtypes(schema: list) -> dict:
+    """
+    Função para extrair os dtypes do pandas a partir do schema de uma tabela no BQ
+
+    Colunas de data não entram no dict, pois são lidas com parse_dates
+
+    Args:
+        schema (list): Schema das colunas no BQ, com nome e tipo do dado
+
+    Returns:
+        dict: Dict com o nome da coluna e o seu dtype
+    """
+    return {
+        column["name"]: _PANDAS_DTYPES[column["type"].upper()]
+        for column in schema
+        if column["type"].upper() in _PANDAS_DTYPES
+    }
+
+
+def get_date_columns(schema: list) -> list:
+    """
+    Função para listar as colunas de data do schema de uma tabela no BQ
+
+    Args:
+        schema (list): Schema das colunas no BQ, com nome e tipo do dado
+
+    Returns:
+        list: Lista com os nomes das colunas de data
+    """
+    return [column["name"] for column in schema if column["type"].upper() in _DATE_TYPES]
+
+
+def get_compact_dtypes(schema: list) -> dict:
+    """
+    Função para extrair os dtypes compactos usados na leitura dos relatórios a partir do schema
+    de uma tabela no BQ
+
+    Colunas STRING das dimensões com poucos valores distintos (CATEGORY_COLUMNS) usam category e
+    as demais usam strings do arrow. A chave "dtype" de uma coluna do schema substitui essa
+    escolha. Colunas inteiras não entram no dict, pois são reduzidas depois da leitura, e colunas
+    de data são lidas como category, para que cada data distinta seja convertida uma única vez
+
+    Args:
+        schema (list): Schema das colunas no BQ, com nome e tipo do dado
+
+    Returns:
+        dict: Dict com o nome da coluna e o seu dtype
+    """
+    dtypes = {}
+    for column in schema:
+        name = column["name"]
+        column_type = column["type"].upper()
+        if column.get("dtype"):
+            dtypes[name] = column["dtype"]
+        elif column_type == "STRING":
+            dtypes[name] = "category" if name in CATEGORY_COLUMNS else "string[pyarrow]"
+        elif column_type in _DATE_TYPES:
+            dtypes[name] = "category"
+        elif column_type not in _INTEGER_TYPES and column_type in _PANDAS_DTYPES:
+            dtypes[name] = _PANDAS_DTYPES[column_type]
+    return dtypes
+
+
+def parse_date(series: pd.Series, date_format: str = None) -> pd.Series:
+    """
+    Função para converter uma coluna de datas, convertendo cada data distinta uma única vez
+
+    Args:
+        series (pd.Series): Coluna com as datas em texto ou número, ex: 20220101
+        date_format (str): Formato das datas, ex: %Y%m%d. Se None, o formato é inferido
+
+    Returns:
+        pd.Series: Coluna com as datas em datetime64
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype("category")
+    dates = pd.to_datetime(series.cat.categories.astype(str), format=date_format).to_numpy()
+    codes = series.cat.codes.to_numpy()
+    values = dates.take(codes) if len(dates) else np.full(len(codes), np.datetime64("NaT", "ns"))
+    # Code -1 marks a missing value
+    values[codes == -1] = np.datetime64("NaT")
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def compact(df: pd.DataFrame, schema: list, date_format: str = None) -> pd.DataFrame:
+    """
+    Função para terminar a tipagem de um relatório lido com os dtypes compactos, convertendo as
+    datas e reduzindo as colunas inteiras para o menor tipo que comporta os valores
+
+    Args:
+        df (pd.DataFrame): Dataframe lido com get_compact_dtypes
+        schema (list): Schema das colunas no BQ, com nome e tipo do dado
+        date_format (str): Formato das datas, ex: %Y%m%d. Se None, o formato é inferido
+
+    Returns:
+        pd.DataFrame: Dataframe com as colunas convertidas
+    """
+    for column in schema:
+        name = column["name"]
+        column_type = column["type"].upper()
+        if name not in df.columns or column.get("dtype"):
+            continue
+        if column_type in _DATE_TYPES and not pd.api.types.is_datetime64_any_dtype(df[name]):
+            df[name] = parse_date(df[name], date_format)
+        # Columns with missing values are read as float and keep their type
+        elif column_type in _INTEGER_TYPES and pd.api.types.is_integer_dtype(df[name]):
+            df[name] = pd.to_numeric(df[name], downcast="integer")
+    return df
+
+
+def _is_compatible(dtype, pandas_dtype: str) -> bool:
+    """
+    Função para verificar se o dtype de uma coluna já corresponde ao dtype do schema, para não
+    converter colunas lidas com os dtypes compactos
+
+    Args:
+        dtype: Dtype atual da coluna
+        pandas_dtype (str): Dtype do pandas do tipo da coluna no BQ
+
+    Returns:
+        bool: True se a coluna não precisa ser convertida
+    """
+    if pandas_dtype == "string":
+        return isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype))
+    if pandas_dtype == "Int64":
+        return pd.api.types.is_integer_dtype(dtype)
+    if pandas_dtype == "float64":
+        return pd.api.types.is_float_dtype(dtype)
+    if pandas_dtype == "boolean":
+        return pd.api.types.is_bool_dtype(dtype)
+    return False
+
+
+def cast_to_schema(df: pd.DataFrame, schema: list) -> pd.DataFrame:
+    """
+    Função para converter as colunas de um dataframe para os tipos do schema
+
+    Colunas que já estão em um dtype compatível, como category ou inteiros reduzidos, não são
+    convertidas
+
+    Args:
+        df (pd.DataFrame): Dataframe a ser convertido
+        schema (list): Schema das colunas no BQ, com nome e tipo do dado
+
+    Returns:
+        pd.DataFrame: Dataframe com as colunas convertidas
+    """
+    dtypes = {
+        column: dtype
+        for column, dtype in get_dtypes(schema).items()
+        if column in df.columns and not _is_compatible(df[column].dtype, dtype)
+    }
+    if dtypes:
+        df = df.astype(dtypes)
+    for column in get_date_columns(schema):
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def _get_arrow_schema(df: pd.DataFrame, schema: list):
+    """
+    Função para montar o schema do arrow de um dataframe a partir do schema no BQ
+
+    Colunas que não estão no schema do BQ mantém o tipo inferido pelo arrow
+
+    Args:
+        df (pd.DataFrame): Dataframe que será gravado
+        schema (list): Schema das colunas no BQ, com nome e tipo do dado
+
+    Returns:
+        pyarrow.Schema: Schema do arrow
+    """
+    import pyarrow as pa
+
+    arrow_types = {
+        "STRING": pa.string(),
+        "INTEGER": pa.int64(),
+        "INT64": pa.int64(),
+        "FLOAT": pa.float64(),
+        "FLOAT64": pa.float64(),
+        "NUMERIC": pa.float64(),
+        "BOOLEAN": pa.bool_(),
+        "BOOL": pa.bool_(),
+        "DATE": pa.date32(),
+        "DATETIME": pa.timestamp("us"),
+        "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+    }
+    types = {column["name"]: arrow_types.get(column["type"].upper()) for column in schema or []}
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema(
+        [pa.field(field.name, types.get(field.name) or field.type) for field in inferred]
+    )
+
+
+def get_report_path(folder: str, kind: str, stem: str, file_format: str = "csv") -> str:
+    """
+    Função para montar o caminho de um arquivo de relatório
+
+    Args:
+        folder (str): Caminho da pasta dos relatórios
+        kind (str): Tipo do arquivo, ex: raw ou processed
+        stem (str): Nome do relatório com a data, ex: <nome>-<data>
+        file_format (str): Formato do arquivo, csv, csv.gz, csv.zst ou parquet
+
+    Returns:
+        str: Caminho do arquivo
+    """
+    return f"{folder}/{kind}-{stem}{EXTENSIONS[file_format]}"
+
+
+def get_report_format(path: str) -> str:
+    """
+    Função para obter o formato de um arquivo de relatório a partir da extensão
+
+    Args:
+        path (str): Caminho do arquivo
+
+    Returns:
+        str: Formato do arquivo, chave de EXTENSIONS
+    """
+    for file_format, extension in EXTENSIONS.items():
+        if path.endswith(extension):
+            return file_format
+    raise ValueError(f"Unknown report format: {path}")
+
+
+def get_report_stem(path: str) -> str:
+    """
+    Função para extrair o nome do relatório com a data a partir do caminho do arquivo
+
+    Args:
+        path (str): Caminho do arquivo, ex: <pasta>/<tipo>-<nome>-<data>.<extensão>
+
+    Returns:
+        str: Nome do relatório com a data, ex: <nome>-<data>
+    """
+    name = os.path.basename(path)
+    for extension in EXTENSIONS.values():
+        if name.endswith(extension):
+            name = name[: -len(extension)]
+            break
+    return "-".join(name.split("-")[1:])
+
+
+def list_reports(folder: str, kind: str) -> list:
+    """
+    Função para listar os arquivos de relatório de um tipo na pasta
+
+    Args:
+        folder (str): Caminho da pasta dos relatórios
+        kind (str): Tipo do arquivo, ex: raw ou processed
+
+    Returns:
+        list: Lista ordenada com os caminhos dos arquivos
+    """
+    return sorted(
+        f"{folder}/{file.name}"
+        for file in os.scandir(folder)
+        if file.name.startswith(f"{kind}-")
+        and any(file.name.endswith(extension) for extension in EXTENSIONS.values())
+    )
+
+
+def read_typed_csv(
+    source,
+    schema: list,
+    columns: list = None,
+    date_format: str = None,
+    chunksize: int = None,
+):
+    """
+    Função para ler um csv de relatório com os dtypes compactos derivados do schema
+
+    Args:
+        source (str | IO): Caminho ou arquivo aberto do csv
+        schema (list): Schema das colunas no BQ, com nome e tipo do dado
+        columns (list): Colunas a serem lidas. Colunas que não estão no arquivo são ignoradas.
+            Se None, lê todas as colunas
+        date_format (str): Formato das datas, ex: %Y%m%d. Se None, o formato é inferido
+        chunksize (int): Número de linhas de cada lote. Se None, lê o arquivo inteiro
+
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: Dataframe com os dados do relatório, ou os lotes
+            de linhas quando chunksize é definido
+    """
+    usecols = None
+    if columns is not None:
+        # A callable does not fail on columns missing from the file, like computed columns
+        wanted = set(columns)
+        usecols = lambda column: column in wanted  # noqa: E731
+    reader = pd.read_csv(
+        source, usecols=usecols, dtype=get_compact_dtypes(schema), chunksize=chunksize
+    )
+    if chunksize is None:
+        return compact(reader, schema, date_format)
+    return (compact(batch, schema, date_format) for batch in reader)
+
+
+def read_report(path: str, columns: list = None, schema: list = None) -> pd.DataFrame:
+    """
+    Função para ler um arquivo de relatório, csv ou parquet
+
+    Args:
+        path (str): Caminho do arquivo
+        columns (list): Colunas a serem lidas. Se None, lê todas as colunas
+        schema (list): Schema das colunas no BQ, usado para ler as colunas com os dtypes
+            compactos
+
+    Returns:
+        pd.DataFrame: Dataframe com os dados do relatório
+    """
+    if path.endswith(EXTENSIONS["parquet"]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not schema:
+            return pq.read_table(path, columns=columns).to_pandas(date_as_object=False)
+
+        # Categorical string columns are read as dictionaries, which become categoricals
+        # without building the strings first
+        dtypes = get_compact_dtypes(schema)
+        table = pq.read_table(
+            path,
+            columns=columns,
+            read_dictionary=[
+                column["name"]
+                for column in schema
+                if column["type"].upper() == "STRING"
+                and dtypes[column["name"]] == "category"
+                and (columns is None or column["name"] in columns)
+            ],
+        )
+        df = table.to_pandas(
+            date_as_object=False,
+            types_mapper=lambda arrow_type: (
+                pd.StringDtype("pyarrow") if arrow_type == pa.string() else None
+            ),
+        )
+        return compact(df, schema)
+
+    if not schema:
+        return pd.read_csv(path, usecols=columns)
+    return read_typed_csv(path, schema, columns)
+
+
+class ReportWriter:
+    def __init__(
+        self, path: str, schema: list = None, compression: str = "snappy"
+    ) -> None:
+        """
+        Inicialização da classe
+
+        Grava um relatório em csv ou parquet, de acordo com a extensão do arquivo, em um
+        ou mais lotes
+
+        Args:
+            path (str): Caminho do arquivo
+            schema (list): Schema das colunas no BQ, usado para tipar as colunas
+            compression (str): Compressão dos arquivos parquet
+        """
+        self.path = path
+        self.rows = 0
+        self._schema = schema
+        self._compression = compression
+        self._parquet = path.endswith(EXTENSIONS["parquet"])
+        self._writer = None
+        self._closed = False
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Função para gravar um lote de linhas no arquivo
+
+        Args:
+            df (pd.DataFrame): Lote de linhas do relatório
+        """
+        if self._schema:
+            df = cast_to_schema(df, self._schema)
+
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                arrow_schema = _get_arrow_schema(df, self._schema)
+                self._writer = pq.ParquetWriter(
+                    self.path, arrow_schema, compression=self._compression
+                )
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            if self._writer is None:
+                self._writer = compression.open_file(self.path, "wt", newline="")
+            df.to_csv(self._writer, index=False, header=self.rows == 0)
+
+        self.rows += len(df)
+
+    def close(self) -> None:
+        """
+        Função para fechar o arquivo
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is None:
+            logging.warning(f"No rows written to {self.path}")
+            return
+        self._writer.close()
@@ -0,0 +1,271 @@
+import logging
+import numpy as np
+import pandas as pd
+import storage
+from manifest import Manifest
+
+
+# Summary files written for each processed report, with the columns they are grouped by
+SUMMARIES = {"summary": ["video_id"], "summary_channel": ["channel_id"]}
+REVENUE = "estimated_youtube_ad_revenue"
+# Rollup files are named <ROLLUP_PREFIX><rollup name>-<report name>-<date>
+ROLLUP_PREFIX = "rollup_"
+
+
+class Aggregator:
+    def __init__(self, dimensions: list, metrics: list, compact_every: int = 10) -> None:
+        """
+        Inicialização da classe
+
+        Acumula, lote a lote, a soma das métricas agrupadas pelas dimensões, mantendo em
+        memória apenas os grupos já vistos
+
+        Args:
+            dimensions (list): Colunas de agrupamento
+            metrics (list): Colunas somadas
+            compact_every (int): Número de lotes acumulados antes de juntar as somas parciais
+        """
+        self._dimensions = dimensions
+        self._metrics = metrics
+        self._compact_every = compact_every
+        self._partials = []
+
+    def add(self, df: pd.DataFrame) -> None:
+        """
+        Função para somar um lote de linhas
+
+        Args:
+            df (pd.DataFrame): Lote de linhas do relatório
+        """
+        self._partials.append(
+            df.groupby(self._dimensions, sort=False, observed=True)[self._metrics].sum()
+        )
+        if len(self._partials) >= self._compact_every:
+            self._partials = [self._combine()]
+
+    def _combine(self) -> pd.DataFrame:
+        """
+        Função para juntar as somas parciais
+
+        Returns:
+            pd.DataFrame: Soma das métricas, com as dimensões no índice
+        """
+        if len(self._partials) == 1:
+            return self._partials[0]
+        return pd.concat(self._partials).groupby(level=self._dimensions, sort=False).sum()
+
+    def result(self) -> pd.DataFrame:
+        """
+        Função para obter o resultado da agregação
+
+        Returns:
+            pd.DataFrame: Dataframe com as dimensões e a soma das métricas
+        """
+        if not self._partials:
+            return pd.DataFrame(columns=self._dimensions + self._metrics)
+        return self._combine().reset_index()
+
+
+def get_aggregators(kinds: list) -> dict:
+    """
+    Função para criar os agregadores dos resumos de receita
+
+    Args:
+        kinds (list): Tipos de resumo, chaves de SUMMARIES
+
+    Returns:
+        dict: Dict com o tipo do resumo e o seu agregador
+    """
+    return {kind: Aggregator(SUMMARIES[kind], [REVENUE]) for kind in kinds}
+
+
+def get_rollup_kind(name: str) -> str:
+    """
+    Função para montar o tipo dos arquivos de um rollup
+
+    Args:
+        name (str): Nome do rollup, ex: channel_daily
+
+    Returns:
+        str: Tipo dos arquivos do rollup, ex: rollup_channel_daily
+    """
+    return f"{ROLLUP_PREFIX}{name}"
+
+
+def get_rollup_schema(rollup: dict, report_schema: list) -> list:
+    """
+    Função para montar o schema de um rollup a partir do schema do relatório
+
+    Args:
+        rollup (dict): Rollup com DIMENSIONS e METRICS
+        report_schema (list): Schema das colunas do relatório processado
+
+    Returns:
+        list: Schema das dimensões seguidas das métricas
+    """
+    types = {column["name"]: column["type"] for column in report_schema}
+    return [
+        {"name": name, "type": types.get(name, "STRING")}
+        for name in rollup["DIMENSIONS"] + rollup["METRICS"]
+    ]
+
+
+def get_rollup_aggregators(rollups: list) -> dict:
+    """
+    Função para criar os agregadores dos rollups configurados
+
+    Args:
+        rollups (list): Rollups, cada um com NAME, DIMENSIONS e METRICS
+
+    Returns:
+        dict: Dict com o tipo dos arquivos do rollup e o seu agregador
+    """
+    return {
+        get_rollup_kind(rollup["NAME"]): Aggregator(rollup["DIMENSIONS"], rollup["METRICS"])
+        for rollup in rollups
+    }
+
+
+def write_summaries(
+    aggregators: dict,
+    folder: str,
+    stem: str,
+    file_format: str = "csv",
+    compression: str = "snappy",
+    schemas: dict = None,
+) -> None:
+    """
+    Função para gravar os resumos de receita de um relatório
+
+    Args:
+        aggregators (dict): Dict com o tipo do resumo e o seu agregador
+        folder (str): Caminho da pasta dos relatórios
+        stem (str): Nome do relatório com a data, ex: <nome>-<data>
+        file_format (str): Formato do arquivo, csv ou parquet
+        compression (str): Compressão dos arquivos parquet
+        schemas (dict): Dict com o tipo do resumo e o schema das suas colunas, para os resumos
+            carregados no BigQuery
+    """
+    schemas = schemas or {}
+    for kind, aggregator in aggregators.items():
+        path = storage.get_report_path(folder, kind, stem, file_format)
+        with storage.ReportWriter(path, schemas.get(kind), compression) as writer:
+            writer.write(aggregator.result())
+        logging.info(f"Summary {path} written")
+
+
+def top_n(revenue: pd.Series, size: int) -> pd.Series:
+    """
+    Função para selecionar os itens de maior receita, sem ordenar todos os itens quando não há
+    empate no corte
+
+    Com empate no corte (ex: vídeos sem receita), os itens são escolhidos pela mesma ordenação
+    da versão original (groupby ordenado pelo id, sort_values e head), para que os ids
+    selecionados sejam exatamente os mesmos
+
+    Args:
+        revenue (pd.Series): Receita indexada pelo id do item
+        size (int): Número de itens
+
+    Returns:
+        pd.Series: Receita dos itens selecionados, sem ordem definida
+    """
+    if len(revenue) <= size:
+        return revenue
+    values = revenue.to_numpy()
+    selected = np.argpartition(-values, size - 1)[:size]
+    if np.count_nonzero(values >= values[selected].min()) == size:
+        return revenue.iloc[selected]
+    # sort_values is not stable, so ties are broken as the original sort does, not by id
+    return revenue.sort_index().sort_values(ascending=False).head(size)
+
+
+def _list_summaries(
+    folder: str, start_date: str = None, end_date: str = None, manifest: Manifest = None
+) -> list:
+    """
+    Função para listar os resumos por vídeo dentro de um intervalo de datas
+
+    Args:
+        folder (str): Caminho da pasta dos relatórios
+        start_date (str): Primeira data, no formato AAAAMMDD. Se None, sem limite
+        end_date (str): Última data, no formato AAAAMMDD. Se None, sem limite
+        manifest (Manifest): Manifesto com o estado dos relatórios, usado como índice dos
+            resumos. Se None, a pasta é listada
+
+    Returns:
+        list: Caminhos dos resumos
+    """
+    if manifest is not None:
+        return [
+            row["summary_file"]
+            for row in manifest.processed_reports(start_date=start_date, end_date=end_date)
+            if row["summary_file"]
+        ]
+
+    files = []
+    for file in storage.list_reports(folder, "summary"):
+        date = storage.get_report_stem(file).split("-")[-1]
+        if (start_date is None or date >= start_date) and (end_date is None or date <= end_date):
+            files.append(file)
+    return files
+
+
+def top_videos_by_day(
+    folder: str,
+    size: int = 50,
+    start_date: str = None,
+    end_date: str = None,
+    manifest: Manifest = None,
+) -> np.array:
+    """
+    Função para listar os vídeos que estão entre os de maior receita em algum dia do intervalo
+
+    Args:
+        folder (str): Caminho da pasta dos relatórios
+        size (int): Número de vídeos por dia
+        start_date (str): Primeira data, no formato AAAAMMDD. Se None, sem limite
+        end_date (str): Última data, no formato AAAAMMDD. Se None, sem limite
+        manifest (Manifest): Manifesto com o estado dos relatórios. Se None, a pasta é listada
+
+    Returns:
+        np.array: Array com os ids únicos dos vídeos
+    """
+    ids = [
+        top_n(storage.read_report(file).set_index("video_id")[REVENUE], size).index.to_numpy()
+        for file in _list_summaries(folder, start_date, end_date, manifest)
+    ]
+    return np.unique(np.concatenate(ids)) if ids else np.array([])
+
+
+def top_videos(
+    folder: str,
+    size: int = 50,
+    start_date: str = None,
+    end_date: str = None,
+    manifest: Manifest = None,
+) -> pd.DataFrame:
+    """
+    Função para listar os vídeos de maior receita somando todo o intervalo de datas
+
+    Args:
+        folder (str): Caminho da pasta dos relatórios
+        size (int): Número de vídeos
+        start_date (str): Primeira data, no formato AAAAMMDD. Se None, sem limite
+        end_date (str): Última data, no formato AAAAMMDD. Se None, sem limite
+        manifest (Manifest): Manifesto com o estado dos relatórios. Se None, a pasta é listada
+
+    Returns:
+        pd.DataFrame: Dataframe com video_id e estimated_youtube_ad_revenue, ordenado pela receita
+    """
+    aggregator = Aggregator(["video_id"], [REVENUE])
+    for file in _list_summaries(folder, start_date, end_date, manifest):
+        aggregator.add(storage.read_report(file))
+
+    revenue = aggregator.result().set_index("video_id")[REVENUE]
+    return (
+        top_n(revenue, size)
+        .sort_values(ascending=False)
+        .rename_axis("video_id")
+        .reset_index()
+    )
@@ -0,0 +1,143 @@
+"""
+Fixtures compartilhadas pelos testes
+
+Uso, a partir da raiz do repositório:
+    python -m pytest tests
+"""
+import importlib
+import json
+import sys
+import pandas as pd
+import pytest
+import bigquery
+import storage
+from benchmarks import fakes, generator
+from manifest import Manifest
+from reports import ReportsHandler
+
+
+# Config of main.py used by the tests, completed by each test
+CONFIG = {
+    "AUTH": {
+        "CLIENT_SECRETS_FILE": "client_secrets.json",
+        "SCOPES": [],
+        "REPORTING_API_SERVICE_NAME": "youtubereporting",
+        "REPORTING_API_VERSION": "v1",
+        "DATA_API_SERVICE_NAME": "youtube",
+        "DATA_API_VERSION": "v3",
+    },
+    "REPORTING": {"START_DATE": "2022-01-01", "LAST_DATE": "2022-01-01"},
+    "TABLES": generator.TABLES,
+}
+REPORT_NAME = "revenue"
+
+
+@pytest.fixture
+def reporting(tmp_path):
+    """
+    Função para criar a API do Youtube Reporting falsa com um relatório sintético em cada data
+    """
+
+    def create(dates: list, rows: int = 20) -> fakes.FakeReportingService:
+        catalog = generator.Catalog(videos=50, channels=5, seed=0)
+        reports = []
+        for day in dates:
+            path = f"{tmp_path}/server/{day.strftime('%Y%m%d')}.csv"
+            reports.append((day, generator.generate_report(path, catalog, day, rows)))
+        return fakes.FakeReportingService(reports)
+
+    (tmp_path / "server").mkdir()
+    return create
+
+
+@pytest.fixture
+def reports_handler(tmp_path):
+    """
+    Função para criar o handler dos relatórios ligado a uma API do Youtube Reporting falsa
+    """
+
+    def create(
+        service: fakes.FakeReportingService, manifest: Manifest = None, **kwargs
+    ) -> ReportsHandler:
+        folder = tmp_path / "reports"
+        folder.mkdir(exist_ok=True)
+        return ReportsHandler(
+            service,
+            "owner-1",
+            "benchmark-job",
+            kwargs.pop("last_date", "1970-01-01T00:00:00Z"),
+            kwargs.pop("start_date", "1970-01-01"),
+            generator.REPORT_SCHEMA,
+            REPORT_NAME,
+            str(folder),
+            http_factory=service.http,
+            manifest=manifest,
+            **kwargs,
+        )
+
+    return create
+
+
+@pytest.fixture
+def client(monkeypatch) -> fakes.FakeBigQueryClient:
+    """
+    Cliente do BigQuery falso que guarda as linhas carregadas, usado pelo loader do módulo
+    bigquery
+    """
+    client = fakes.FakeBigQueryClient(keep_rows=True)
+    monkeypatch.setattr(bigquery, "_loader", bigquery.BigQueryLoader(client))
+    return client
+
+
+@pytest.fixture
+def loader(client) -> bigquery.BigQueryLoader:
+    """
+    Loader do BigQuery ligado ao cliente falso
+    """
+    return bigquery.get_loader()
+
+
+@pytest.fixture
+def manifest(tmp_path) -> Manifest:
+    """
+    Manifesto vazio em uma pasta temporária
+    """
+    return Manifest(str(tmp_path / "manifest.sqlite3"))
+
+
+@pytest.fixture
+def write_report():
+    """
+    Função para gravar um relatório, com o ReportWriter, a partir das suas colunas
+    """
+
+    def write(path: str, columns: dict, schema: list = None) -> str:
+        with storage.ReportWriter(path, schema) as writer:
+            writer.write(pd.DataFrame(columns))
+        return path
+
+    return write
+
+
+@pytest.fixture
+def import_main(monkeypatch, tmp_path):
+    """
+    Função para importar o main.py com um config.json completado pelo teste
+    """
+
+    def load(reporting: dict = None, **config):
+        data = {
+            **CONFIG,
+            "REPORTING": {
+                **CONFIG["REPORTING"],
+                "FOLDER": str(tmp_path / "reports"),
+                **(reporting or {}),
+            },
+            **config,
+        }
+        (tmp_path / "config.json").write_text(json.dumps(data))
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.delitem(sys.modules, "main", raising=False)
+        return importlib.import_module("main")
+
+    return load
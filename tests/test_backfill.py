@@ -0,0 +1,98 @@
+"""
+Testes do backfill dos relatórios, com a API do Youtube Reporting falsa
+"""
+from datetime import date, timedelta
+from backfill import Backfill
+
+
+REPORT_NAME = "revenue"
+
+
+def _days(first: date, last: date) -> list:
+    """
+    Função para listar as datas de um intervalo, inclusivo
+
+    Returns:
+        list: Datas em ordem
+    """
+    return [first + timedelta(days=day) for day in range((last - first).days + 1)]
+
+
+def test_recent_dates_without_report_are_retried(manifest, reporting, reports_handler):
+    today = date.today()
+    # YouTube has not generated the reports of the last 5 days yet
+    service = reporting(_days(today - timedelta(days=10), today - timedelta(days=5)))
+    backfill = Backfill(
+        reports_handler(service, manifest),
+        manifest,
+        REPORT_NAME,
+        (today - timedelta(days=10)).isoformat(),
+        today.isoformat(),
+        generation_lag_days=3,
+    )
+
+    assert backfill.run() == []
+
+    done = manifest.backfilled(REPORT_NAME, "1970-01-01", today.isoformat())
+    checked = _days(today - timedelta(days=10), today - timedelta(days=3))
+    assert done == {day.isoformat() for day in checked}
+    # The next run lists the dates that may still get a report
+    assert backfill.shards() == [(today - timedelta(days=2), today)]
+
+
+def test_backfill_before_start_date(manifest, reporting, reports_handler):
+    days = _days(date(2022, 1, 1), date(2022, 1, 3))
+    service = reporting(days)
+    handler = reports_handler(service, manifest, start_date="2022-02-01")
+
+    backfill = Backfill(handler, manifest, REPORT_NAME, "2022-01-01", "2022-01-03")
+
+    assert backfill.run() == []
+    assert service.stats()["calls"]["youtubereporting.media.download"] == 3
+    assert len(manifest.pending("processed", REPORT_NAME)) == 3
+
+
+def test_resume_skips_checkpointed_dates(manifest, reporting, reports_handler):
+    days = _days(date(2022, 1, 1), date(2022, 1, 6))
+    service = reporting(days)
+    # Dates checkpointed by an interrupted backfill
+    for day in days[:3]:
+        manifest.mark_backfilled(REPORT_NAME, day.isoformat())
+
+    backfill = Backfill(
+        reports_handler(service, manifest), manifest, REPORT_NAME, "2022-01-01", "2022-01-06"
+    )
+
+    assert backfill.shards() == [(date(2022, 1, 4), date(2022, 1, 6))]
+    assert backfill.run() == []
+    assert service.stats()["calls"]["youtubereporting.media.download"] == 3
+    assert manifest.backfilled(REPORT_NAME, "2022-01-01", "2022-01-06") == {
+        day.isoformat() for day in days
+    }
+
+
+def test_failed_dates_are_retried(monkeypatch, manifest, reporting, reports_handler):
+    days = _days(date(2022, 1, 1), date(2022, 1, 4))
+    service = reporting(days)
+    handler = reports_handler(service, manifest)
+    fetch_and_process = handler.fetch_and_process
+
+    def fail_once(report):
+        if report["date"].startswith("2022-01-02") and not failed:
+            failed.append(report["date"])
+            raise ConnectionError("download interrupted")
+        return fetch_and_process(report)
+
+    failed = []
+    monkeypatch.setattr(handler, "fetch_and_process", fail_once)
+    backfill = Backfill(handler, manifest, REPORT_NAME, "2022-01-01", "2022-01-04")
+
+    assert backfill.run() == ["2022-01-02"]
+    assert "2022-01-02" not in manifest.backfilled(REPORT_NAME, "2022-01-01", "2022-01-04")
+
+    # The next run only lists the failed date
+    service.reset()
+    assert backfill.shards() == [(date(2022, 1, 2), date(2022, 1, 2))]
+    assert backfill.run() == []
+    assert service.stats()["calls"]["youtubereporting.media.download"] == 1
+    assert len(manifest.pending("processed", REPORT_NAME)) == 4
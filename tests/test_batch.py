@@ -0,0 +1,66 @@
+"""
+Testes do executor das requisições da API de dados, com a API de dados falsa
+"""
+import threading
+import pytest
+from batch import BatchExecutor
+from benchmarks import fakes, generator
+from scheduler import Scheduler
+
+
+VIDEO_IDS = list(generator.Catalog(videos=30, channels=2).video_ids[:25])
+
+
+@pytest.fixture
+def service():
+    return fakes.FakeDataService(generator.Catalog(videos=30, channels=2))
+
+
+@pytest.fixture
+def requests(service):
+    return [service.videos().list(part="snippet", id=video_id) for video_id in VIDEO_IDS]
+
+
+def test_batches_without_cache(service, requests):
+    executor = BatchExecutor(service, batch_size=10, http_factory=service.http)
+
+    responses = executor.execute(requests)
+
+    assert len(responses) == len(requests)
+    # 3 batches of up to 10 requests
+    assert service.round_trips == 3
+
+
+def test_cached_requests_are_single_gets(monkeypatch, service, requests):
+    # Batches are POST requests, which httplib2 never caches
+    monkeypatch.setattr(service, "new_batch_http_request", None)
+    used = []
+
+    def execute(request, http=None, num_retries=0):
+        used.append(http)
+        return request.respond()
+
+    monkeypatch.setattr(fakes.FakeRequest, "execute", execute)
+    local = threading.local()
+
+    def http_factory():
+        local.http = getattr(local, "http", object())
+        return local.http
+
+    executor = BatchExecutor(
+        service,
+        batch_size=10,
+        max_concurrent=4,
+        http_factory=http_factory,
+        scheduler=Scheduler(),
+        cached=True,
+    )
+
+    responses = executor.execute(requests)
+
+    ids = [response["items"][0]["id"] for response in responses]
+    assert ids == VIDEO_IDS
+    # Every request goes through the cached connection of its thread
+    assert len(used) == len(requests)
+    assert None not in used
+    assert len(set(map(id, used))) <= 4
@@ -0,0 +1,61 @@
+"""
+Testes do cache dos metadados da API de dados, com um relógio falso
+"""
+import pytest
+import cache
+from cache import MetadataCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        """
+        Inicialização da classe
+
+        Relógio falso, avançado pelo teste
+        """
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_items_expire_after_the_ttl(tmp_path, clock):
+    metadata = MetadataCache(str(tmp_path / "cache.sqlite3"), ttl=3600)
+    metadata.set_many("video", {"V1": {"title": "first"}})
+
+    clock.now += 3599
+    assert metadata.get_many("video", ["V1"]) == {"V1": {"title": "first"}}
+
+    clock.now += 2
+    assert metadata.get_many("video", ["V1"]) == {}
+
+
+def test_items_are_kept_by_kind(tmp_path, clock):
+    metadata = MetadataCache(str(tmp_path / "cache.sqlite3"))
+    metadata.set_many("video", {"1": {"title": "video"}})
+    metadata.set_many("category", {1: {"title": "category"}})
+
+    assert metadata.get_many("video", ["1", "2"]) == {"1": {"title": "video"}}
+    assert metadata.get_many("category", [1]) == {"1": {"title": "category"}}
+
+
+def test_least_recently_used_items_are_evicted(tmp_path, clock):
+    metadata = MetadataCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    metadata.set_many("video", {"V1": 1})
+    clock.now += 1
+    metadata.set_many("video", {"V2": 2})
+    clock.now += 1
+    # Reading V1 makes V2 the least recently used item
+    metadata.get_many("video", ["V1"])
+    clock.now += 1
+
+    metadata.set_many("video", {"V3": 3})
+
+    assert metadata.get_many("video", ["V1", "V2", "V3"]) == {"V1": 1, "V3": 3}
@@ -0,0 +1,63 @@
+"""
+Testes da leitura e da escrita dos relatórios comprimidos
+"""
+import pandas as pd
+import pytest
+import compression
+import storage
+
+
+FORMATS = {"csv.gz": b"\x1f\x8b", "csv.zst": b"\x28\xb5\x2f\xfd"}
+SCHEMA = [
+    {"name": "date", "type": "DATE"},
+    {"name": "video_id", "type": "STRING"},
+    {"name": "views", "type": "INTEGER"},
+    {"name": "estimated_youtube_ad_revenue", "type": "FLOAT"},
+]
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_text_round_trip(tmp_path, file_format):
+    path = storage.get_report_path(str(tmp_path), "raw", "revenue-20220101", file_format)
+    lines = [f"V{i},{i * 0.5}\r\n" for i in range(1000)]
+
+    with compression.open_file(path, "wt", newline="") as fh:
+        fh.writelines(lines)
+
+    with open(path, "rb") as fh:
+        assert fh.read(len(FORMATS[file_format])) == FORMATS[file_format]
+    with compression.open_file(path, "rt", newline="") as fh:
+        assert fh.readline() == lines[0]
+        assert fh.readlines() == lines[1:]
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_binary_round_trip(tmp_path, file_format):
+    path = storage.get_report_path(str(tmp_path), "raw", "revenue-20220101", file_format)
+    content = bytes(range(256)) * 1000
+
+    with compression.open_file(path, "wb") as fh:
+        fh.write(content)
+
+    with compression.open_file(path, "rb") as fh:
+        assert fh.read() == content
+
+
+@pytest.mark.parametrize("file_format", [*FORMATS, "csv"])
+def test_report_round_trip(tmp_path, write_report, file_format):
+    path = storage.get_report_path(str(tmp_path), "processed", "revenue-20220101", file_format)
+    columns = {
+        "date": pd.to_datetime(["2022-01-01", "2022-01-01"]),
+        "video_id": ["V1", "V2"],
+        "views": [10, 20],
+        "estimated_youtube_ad_revenue": [1.5, 2.5],
+    }
+
+    write_report(path, columns, SCHEMA)
+    df = storage.read_report(path, schema=SCHEMA)
+
+    assert storage.get_report_format(path) == file_format
+    assert df["video_id"].tolist() == ["V1", "V2"]
+    assert df["views"].tolist() == [10, 20]
+    assert df["estimated_youtube_ad_revenue"].tolist() == [1.5, 2.5]
+    assert df["date"].dt.strftime("%Y-%m-%d").tolist() == ["2022-01-01"] * 2
@@ -0,0 +1,178 @@
+"""
+Testes do delta dos relatórios reprocessados e do MERGE no BigQuery, com o cliente do BigQuery
+falso
+"""
+import os
+import pandas as pd
+import pytest
+import delta
+import storage
+
+
+SCHEMA = [
+    {"name": "date", "type": "DATE"},
+    {"name": "video_id", "type": "STRING"},
+    {"name": "country_code", "type": "STRING"},
+    {"name": "owner", "type": "STRING"},
+    {"name": "estimated_youtube_ad_revenue", "type": "FLOAT"},
+]
+TABLE = {
+    "name": "benchmark.dataset.reports",
+    "schema": SCHEMA,
+    "partition_field": "date",
+    "owner_field": "owner",
+}
+KEY = ["date", "video_id", "country_code", "owner"]
+FIRST = {("V1", "US"): 1.0, ("V2", None): 2.0, ("V3", "BR"): 3.0}
+# V2, with a null country_code, is updated, V3 is deleted and V4 is new
+SECOND = {("V1", "US"): 1.0, ("V2", None): 2.5, ("V4", "MX"): 4.0}
+
+
+@pytest.fixture
+def write_day(tmp_path, write_report):
+    """
+    Função para gravar o relatório processado de um dia de um content owner, com a receita
+    de cada tupla (video_id, country_code)
+    """
+
+    def write(name: str, owner: str, revenue: dict) -> str:
+        columns = {
+            "date": pd.to_datetime("2022-01-01"),
+            "video_id": [video_id for video_id, _ in revenue],
+            "country_code": [country_code for _, country_code in revenue],
+            "owner": owner,
+            "estimated_youtube_ad_revenue": list(revenue.values()),
+        }
+        return write_report(f"{tmp_path}/{name}.csv", columns, SCHEMA)
+
+    return write
+
+
+def _by_key(df: pd.DataFrame, column: str) -> dict:
+    """
+    Função para indexar uma coluna pela tupla (video_id, country_code)
+
+    Returns:
+        dict: Valor da coluna de cada tupla, com None nos códigos nulos
+    """
+    return {
+        (video_id, None if pd.isna(country_code) else country_code): value
+        for video_id, country_code, value in zip(df["video_id"], df["country_code"], df[column])
+    }
+
+
+@pytest.fixture
+def loaded(tmp_path, loader, write_day):
+    """
+    Tabela com a primeira versão do relatório de dois content owners, com as mesmas chaves
+    """
+    for owner in ("owner-1", "owner-2"):
+        path = write_day(f"processed-{owner}-v1", owner, FIRST)
+        loader.load_files([path], {**TABLE, "owner": owner})
+    delta.write_snapshot(
+        f"{tmp_path}/processed-owner-1-v1.csv", f"{tmp_path}/snapshot.csv", SCHEMA, KEY
+    )
+
+
+def test_delta_of_restated_report(tmp_path, loaded, write_day):
+    path = write_day("processed-owner-1-v2", "owner-1", SECOND)
+
+    rows = delta.write_delta(
+        path, f"{tmp_path}/snapshot.csv", f"{tmp_path}/delta.csv", SCHEMA, KEY
+    )
+
+    df = storage.read_report(f"{tmp_path}/delta.csv", schema=delta.get_delta_schema(SCHEMA))
+    assert rows == 3
+    assert _by_key(df, delta.OPERATION) == {
+        ("V2", None): "U",
+        ("V3", "BR"): "D",
+        ("V4", "MX"): "U",
+    }
+
+
+def test_merge_applies_delta_of_content_owner(tmp_path, client, loader, loaded, write_day):
+    path = write_day("processed-owner-1-v2", "owner-1", SECOND)
+    delta.write_delta(path, f"{tmp_path}/snapshot.csv", f"{tmp_path}/delta.csv", SCHEMA, KEY)
+
+    merged = loader.merge_files([f"{tmp_path}/delta.csv"], {**TABLE, "owner": "owner-1"}, KEY)
+
+    query = client.queries[-1]
+    # Null keys only match with IS NOT DISTINCT FROM
+    for column in KEY:
+        assert f"T.`{column}` IS NOT DISTINCT FROM S.`{column}`" in query
+    assert "T.`date` IN UNNEST(partitions)" in query
+    assert "T.`owner` = @owner" in query
+    assert f"WHEN MATCHED AND S.`{delta.OPERATION}` = 'D' THEN DELETE" in query
+    assert f"WHEN NOT MATCHED AND S.`{delta.OPERATION}` = 'U' THEN INSERT" in query
+    assert "`estimated_youtube_ad_revenue` = S.`estimated_youtube_ad_revenue`" in query
+
+    rows = client.rows[TABLE["name"]]
+    revenue = "estimated_youtube_ad_revenue"
+    assert merged == 3
+    assert _by_key(rows[rows["owner"] == "owner-1"], revenue) == SECOND
+    # The rows of the other content owner, with the same keys, are not touched
+    assert _by_key(rows[rows["owner"] == "owner-2"], revenue) == FIRST
+
+
+def test_delta_without_unique_key(tmp_path, loaded):
+    duplicated = pd.concat([storage.read_report(f"{tmp_path}/processed-owner-1-v1.csv")] * 2)
+    path = f"{tmp_path}/processed-owner-1-v2.csv"
+    duplicated.to_csv(path, index=False)
+
+    assert (
+        delta.write_delta(path, f"{tmp_path}/snapshot.csv", f"{tmp_path}/delta.csv", SCHEMA, KEY)
+        is None
+    )
+
+
+def test_expire_snapshots_out_of_window(tmp_path, manifest):
+    snapshots = {}
+    for stem in ("revenue-20220101", "revenue-20220301"):
+        manifest.record_download(stem, stem.split("-")[-1], None, None, stem, None)
+        snapshots[stem] = f"{tmp_path}/snapshot-{stem}.csv"
+        open(snapshots[stem], "w").close()
+        manifest.mark_snapshot(stem, snapshots[stem])
+
+    # A restated version keeps the snapshot of the loaded one
+    manifest.record_download("revenue-20220301", "20220301", None, None, "v2", None)
+
+    assert delta.expire_snapshots(manifest, "20220201", "revenue") == 1
+    assert not os.path.exists(snapshots["revenue-20220101"])
+    assert manifest.get("revenue-20220101")["snapshot_file"] is None
+    assert os.path.exists(snapshots["revenue-20220301"])
+    assert manifest.get("revenue-20220301")["snapshot_file"] == snapshots["revenue-20220301"]
+
+
+def test_merge_prunes_timestamp_partitions_by_day(tmp_path, client, loader, write_report):
+    schema = [
+        {"name": "time", "type": "TIMESTAMP"},
+        {"name": "video_id", "type": "STRING"},
+        {"name": "estimated_youtube_ad_revenue", "type": "FLOAT"},
+    ]
+    table = {"name": "benchmark.dataset.events", "schema": schema, "partition_field": "time"}
+    key = ["time", "video_id"]
+
+    def write(name: str, revenue: dict) -> str:
+        columns = {
+            "time": pd.to_datetime(list(revenue), utc=True),
+            "video_id": "V1",
+            "estimated_youtube_ad_revenue": list(revenue.values()),
+        }
+        return write_report(f"{tmp_path}/{name}.csv", columns, schema)
+
+    first = write("v1", {"2022-01-01 08:00": 1.0, "2022-01-01 20:00": 2.0, "2022-01-02 08:00": 3.0})
+    loader.load_files([first], table)
+    delta.write_snapshot(first, f"{tmp_path}/snapshot.csv", schema, key)
+    second = write("v2", {"2022-01-01 08:00": 1.5, "2022-01-01 20:00": 2.0, "2022-01-02 08:00": 3.0})
+    delta.write_delta(second, f"{tmp_path}/snapshot.csv", f"{tmp_path}/delta.csv", schema, key)
+
+    assert loader.merge_files([f"{tmp_path}/delta.csv"], table, key) == 1
+
+    query = client.queries[-1]
+    assert "DECLARE partitions ARRAY<TIMESTAMP>" in query
+    assert "ARRAY_AGG(DISTINCT TIMESTAMP_TRUNC(`time`, DAY))" in query
+    assert "TIMESTAMP_TRUNC(T.`time`, DAY) IN UNNEST(partitions)" in query
+    rows = client.rows[table["name"]].sort_values("time")
+    assert rows["estimated_youtube_ad_revenue"].tolist() == [1.5, 2.0, 3.0]
+    # The staging of the delta is dropped after the MERGE
+    assert f"{table['name']}_delta" not in client.rows
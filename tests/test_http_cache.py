@@ -0,0 +1,55 @@
+"""
+Testes do cache em disco das respostas HTTP
+"""
+import os
+from http_cache import BoundedFileCache
+
+
+def _age(cache: BoundedFileCache, key: str, seconds: float) -> None:
+    """
+    Função para tornar o último acesso de uma resposta mais antigo
+    """
+    path = cache._path(key)
+    mtime = os.path.getmtime(path) - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def _folder_size(folder) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(folder))
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    cache = BoundedFileCache(str(tmp_path), max_bytes=300, max_entry_bytes=200)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, b"x" * 100)
+        _age(cache, key, 100 - i)
+    # Reading a makes b the least recently used response
+    assert cache.get("a") == b"x" * 100
+
+    cache.set("d", b"y" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"x" * 100
+    assert cache.get("d") == b"y" * 100
+    assert _folder_size(tmp_path) <= 300
+
+
+def test_large_responses_are_not_cached(tmp_path):
+    cache = BoundedFileCache(str(tmp_path), max_bytes=300, max_entry_bytes=200)
+
+    cache.set("a", b"x" * 201)
+
+    assert cache.get("a") is None
+    assert _folder_size(tmp_path) == 0
+
+
+def test_size_of_an_existing_folder_is_counted(tmp_path):
+    previous = BoundedFileCache(str(tmp_path), max_bytes=300)
+    previous.set("a", b"x" * 200)
+    _age(previous, "a", 10)
+
+    cache = BoundedFileCache(str(tmp_path), max_bytes=300)
+    cache.set("b", b"y" * 200)
+
+    assert _folder_size(tmp_path) <= 300
+    assert cache.get("b") == b"y" * 200
@@ -0,0 +1,97 @@
+"""
+Testes da carga dos relatórios no BigQuery, com o cliente do BigQuery falso
+"""
+import pandas as pd
+import pytest
+
+
+SCHEMA = [
+    {"name": "date", "type": "DATE"},
+    {"name": "video_id", "type": "STRING"},
+    {"name": "owner", "type": "STRING"},
+    {"name": "estimated_youtube_ad_revenue", "type": "FLOAT"},
+]
+
+
+@pytest.fixture
+def write_day(write_report):
+    """
+    Função para gravar o relatório processado de um dia, com a receita de cada vídeo
+    """
+
+    def write(path: str, day: str, revenue: dict) -> str:
+        columns = {
+            "date": pd.to_datetime(day),
+            "video_id": list(revenue),
+            "owner": "owner-1",
+            "estimated_youtube_ad_revenue": list(revenue.values()),
+        }
+        return write_report(path, columns, SCHEMA)
+
+    return write
+
+
+@pytest.mark.parametrize("owner_field", [None, "owner"])
+def test_load_files_of_different_formats(tmp_path, client, loader, write_day, owner_field):
+    # A report processed before the FORMAT changed is loaded with the new ones
+    files = [
+        write_day(f"{tmp_path}/processed-20220101.csv.gz", "2022-01-01", {"V1": 1.0}),
+        write_day(f"{tmp_path}/processed-20220102.csv", "2022-01-02", {"V2": 2.0}),
+    ]
+    table = {"name": "benchmark.dataset.reports", "schema": SCHEMA}
+    if owner_field:
+        table.update(owner_field=owner_field, owner="owner-1")
+
+    rows = loader.load_files(files, table)
+
+    assert rows == 2
+    df = client.rows[table["name"]].sort_values("video_id")
+    assert df["video_id"].tolist() == ["V1", "V2"]
+    assert df["estimated_youtube_ad_revenue"].tolist() == [1.0, 2.0]
+
+
+def test_load_csv_files_with_different_headers(tmp_path, client, loader, write_report):
+    # CSV columns are matched by position, so each header is loaded with its own schema
+    first = write_report(
+        f"{tmp_path}/processed-20220101.csv",
+        {"date": pd.to_datetime(["2022-01-01"]), "video_id": "V1", "owner": "owner-1",
+         "estimated_youtube_ad_revenue": [1.0]},
+        SCHEMA,
+    )
+    reordered = [SCHEMA[3], SCHEMA[2], SCHEMA[1], SCHEMA[0]]
+    second = write_report(
+        f"{tmp_path}/processed-20220102.csv",
+        {"estimated_youtube_ad_revenue": [2.0], "owner": "owner-1", "video_id": "V2",
+         "date": pd.to_datetime(["2022-01-02"])},
+        reordered,
+    )
+    table = {
+        "name": "benchmark.dataset.reports",
+        "schema": SCHEMA,
+        "owner_field": "owner",
+        "owner": "owner-1",
+    }
+
+    assert loader.load_files([first, second], table) == 2
+
+    assert client.calls["load_table_from_file"] == 2
+    df = client.rows[table["name"]].sort_values("video_id")
+    assert df["video_id"].tolist() == ["V1", "V2"]
+    assert df["estimated_youtube_ad_revenue"].tolist() == [1.0, 2.0]
+    assert df["date"].dt.strftime("%Y-%m-%d").tolist() == ["2022-01-01", "2022-01-02"]
+
+
+def test_staging_is_dropped_after_the_load(tmp_path, client, loader, write_day):
+    table = {
+        "name": "benchmark.dataset.reports",
+        "schema": SCHEMA,
+        "owner_field": "owner",
+        "owner": "owner-1",
+    }
+    path = write_day(f"{tmp_path}/processed-20220101.csv", "2022-01-01", {"V1": 1.0})
+
+    loader.load_files([path], table)
+    loader.load_dataframe(pd.read_csv(path, parse_dates=["date"]), table)
+
+    assert client.calls["delete_table"] == 2
+    assert list(client.rows) == [table["name"]]
@@ -0,0 +1,29 @@
+"""
+Testes da execução de vários content owners em processos
+"""
+import sys
+import types
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+
+OWNERS = [
+    {"CONTENT_OWNER": "owner-1", "JOBS": [{"JOB_ID": "job-1", "NAME": "revenue"}]},
+    {"CONTENT_OWNER": "owner-2", "JOBS": [{"JOB_ID": "job-2", "NAME": "revenue"}]},
+]
+
+
+def test_owners_without_credentials_are_not_submitted(monkeypatch, import_main):
+    main = import_main(OWNERS=OWNERS)
+    # Only owner-1 has stored credentials
+    auth_service = types.ModuleType("auth_service")
+    auth_service.has_valid_credentials = lambda path: "owner-1" in path
+    monkeypatch.setitem(sys.modules, "auth_service", auth_service)
+    # Threads instead of processes, so that the test sees the calls
+    monkeypatch.setattr(main, "ProcessPoolExecutor", ThreadPoolExecutor)
+    ran = []
+    monkeypatch.setattr(main, "run_owner", lambda owner, **kwargs: ran.append(owner["NAME"]))
+
+    with pytest.raises(RuntimeError, match="Content owners failed: owner-2"):
+        main.main()
+    assert ran == ["owner-1"]
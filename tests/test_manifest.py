@@ -0,0 +1,36 @@
+"""
+Testes do manifesto como índice dos arquivos processados e dos resumos
+"""
+import storage
+import summaries
+
+
+def test_top_videos_from_manifest(tmp_path, manifest, write_report):
+    def write_summary(stem: str, revenue: dict, file_format: str = "csv") -> str:
+        path = storage.get_report_path(str(tmp_path), "summary", stem, file_format)
+        columns = {"video_id": list(revenue), summaries.REVENUE: list(revenue.values())}
+        return write_report(path, columns)
+
+    manifest.add_processed(
+        [
+            (
+                "revenue-20220101",
+                f"{tmp_path}/processed-revenue-20220101.csv",
+                write_summary("revenue-20220101", {"V1": 1.0, "V2": 2.0}),
+            ),
+            (
+                "revenue-20220102",
+                f"{tmp_path}/processed-revenue-20220102.csv.gz",
+                write_summary("revenue-20220102", {"V1": 3.0}, "csv.gz"),
+            ),
+        ]
+    )
+    # Files that are not in the manifest are not read
+    write_summary("revenue-20220103", {"V3": 100.0})
+
+    top = summaries.top_videos(str(tmp_path), manifest=manifest)
+    assert top["video_id"].tolist() == ["V1", "V2"]
+    assert top[summaries.REVENUE].tolist() == [4.0, 2.0]
+
+    top = summaries.top_videos(str(tmp_path), start_date="20220102", manifest=manifest)
+    assert top["video_id"].tolist() == ["V1"]
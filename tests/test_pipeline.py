@@ -0,0 +1,91 @@
+"""
+Testes do pipeline de download, processamento e carga, com a API do Youtube Reporting falsa
+"""
+import time
+from collections import Counter
+from datetime import date, timedelta
+import pytest
+from pipeline import Pipeline
+
+
+DATES = [date(2022, 1, 1) + timedelta(days=day) for day in range(6)]
+
+
+@pytest.fixture
+def handler(manifest, reporting, reports_handler):
+    return reports_handler(reporting(DATES), manifest, download_workers=3)
+
+
+def _count_calls(monkeypatch, handler, method: str) -> Counter:
+    """
+    Função para contar os arquivos recebidos por um método do handler
+
+    Returns:
+        Counter: Número de chamadas de cada arquivo
+    """
+    calls = Counter()
+    original = getattr(handler, method)
+
+    def wrapper(file):
+        calls[file] += 1
+        return original(file)
+
+    monkeypatch.setattr(handler, method, wrapper)
+    return calls
+
+
+def test_each_file_is_processed_once(monkeypatch, handler):
+    # A raw file left unprocessed by a previous run
+    handler.fetch_report(handler.get_new_reports()[0])
+    processed = _count_calls(monkeypatch, handler, "process_report")
+    list_pending = handler.get_pending_raw_files
+
+    def slow_list_pending():
+        # Gives the downloads of this run time to finish before the backlog is listed
+        time.sleep(0.2)
+        return list_pending()
+
+    monkeypatch.setattr(handler, "get_pending_raw_files", slow_list_pending)
+    loaded = []
+
+    failed = Pipeline(handler, load=loaded.extend, per_report_loads=True).run()
+
+    assert failed == []
+    assert len(processed) == len(DATES)
+    assert set(processed.values()) == {1}
+    assert len(loaded) == len(set(loaded)) == len(DATES)
+
+
+def test_stage_failure_is_returned(monkeypatch, handler):
+    process_report = handler.process_report
+    failing = []
+
+    def process(file):
+        if not failing:
+            failing.append(file)
+            raise ValueError("corrupt report")
+        return process_report(file)
+
+    monkeypatch.setattr(handler, "process_report", process)
+    loaded = []
+
+    failed = Pipeline(handler, load=loaded.extend).run()
+
+    assert failed == failing
+    assert len(loaded) == len(DATES) - 1
+    # The raw file is processed again on the next run
+    assert handler.get_pending_raw_files() == failing
+
+
+def test_on_processed_error_is_raised(handler):
+    loaded = []
+
+    def on_processed():
+        raise RuntimeError("data api failed")
+
+    pipeline = Pipeline(handler, load=loaded.extend, on_processed=on_processed)
+
+    with pytest.raises(RuntimeError, match="data api failed"):
+        pipeline.run()
+    # The reports are still loaded
+    assert len(loaded) == len(DATES)
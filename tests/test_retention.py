@@ -0,0 +1,72 @@
+"""
+Testes da política de retenção dos arquivos dos relatórios carregados
+"""
+import os
+import pytest
+import storage
+from retention import RetentionPolicy
+
+
+REPORT = "revenue-20220101"
+
+
+@pytest.fixture
+def loaded(tmp_path, manifest) -> dict:
+    """
+    Função para registrar no manifesto um relatório carregado, com os seus arquivos na pasta
+
+    Returns:
+        dict: Caminho de cada tipo de arquivo do relatório
+    """
+    files = {
+        kind: storage.get_report_path(str(tmp_path), kind, REPORT)
+        for kind in ("raw", "processed", "summary", "channel_daily")
+    }
+    for path in files.values():
+        with open(path, "w") as fh:
+            fh.write("date,video_id\n2022-01-01,V1\n")
+    manifest.record_download(REPORT, "20220101", None, None, "hash", files["raw"])
+    manifest.mark_processed(REPORT, files["processed"], files["summary"])
+    manifest.mark_loaded(REPORT)
+    return files
+
+
+def test_delete_updates_the_manifest(tmp_path, manifest, loaded):
+    assert RetentionPolicy("delete").apply(manifest, str(tmp_path), "revenue") == 1
+
+    assert not os.path.exists(loaded["raw"])
+    assert not os.path.exists(loaded["processed"])
+    # Summaries are read by the next runs, so they are only retained when configured
+    assert os.path.exists(loaded["summary"])
+    row = manifest.get(REPORT)
+    assert row["raw_file"] is None
+    assert row["processed_file"] is None
+    assert row["summary_file"] == loaded["summary"]
+    assert row["retained_at"] is not None
+    # Retained reports are not listed again
+    assert RetentionPolicy("delete").apply(manifest, str(tmp_path), "revenue") == 0
+
+
+def test_archive_updates_the_manifest(tmp_path, manifest, loaded):
+    archive = str(tmp_path / "archive")
+    policy = RetentionPolicy(
+        "archive", archive_folder=archive, kinds=["raw", "processed", "channel_daily"]
+    )
+
+    assert policy.apply(manifest, str(tmp_path)) == 1
+
+    row = manifest.get(REPORT)
+    assert row["raw_file"] == f"{archive}/{os.path.basename(loaded['raw'])}"
+    assert row["processed_file"] == f"{archive}/{os.path.basename(loaded['processed'])}"
+    assert os.path.exists(row["raw_file"])
+    assert os.path.exists(row["processed_file"])
+    # Rollups are not in the manifest, but are found next to the processed file
+    assert os.path.exists(f"{archive}/{os.path.basename(loaded['channel_daily'])}")
+    assert not os.path.exists(loaded["channel_daily"])
+
+
+def test_recent_loads_are_kept(tmp_path, manifest, loaded):
+    assert RetentionPolicy("delete", keep_days=1).apply(manifest, str(tmp_path)) == 0
+
+    assert all(os.path.exists(path) for path in loaded.values())
+    assert manifest.get(REPORT)["retained_at"] is None
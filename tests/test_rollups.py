@@ -0,0 +1,104 @@
+"""
+Testes da carga dos rollups no BigQuery, com o cliente do BigQuery falso
+"""
+import os
+import pandas as pd
+import pytest
+import storage
+import summaries
+from benchmarks import generator
+
+
+ROLLUP = {
+    "NAME": "channel_daily",
+    "DIMENSIONS": ["date", "channel_id"],
+    "METRICS": ["estimated_youtube_ad_revenue"],
+    "TABLE": "rollup",
+}
+ROLLUP_TABLE = "benchmark.dataset.rollup"
+OWNER_COLUMN = {"name": "owner", "type": "STRING"}
+
+
+def _write_rollup(write_report, owner: dict, day: str, revenue: dict) -> str:
+    """
+    Função para gravar o rollup de um relatório processado
+
+    Args:
+        write_report (Callable): Fixture que grava um relatório
+        owner (dict): Configuração do content owner
+        day (str): Data do relatório, ex: 2022-01-01
+        revenue (dict): Receita de cada canal
+
+    Returns:
+        str: Caminho do arquivo processado do relatório
+    """
+    job = owner["JOBS"][0]
+    rollup = job["ROLLUPS"][0]
+    stem = f"{job['NAME']}-{day.replace('-', '')}"
+    os.makedirs(owner["FOLDER"], exist_ok=True)
+    write_report(
+        storage.get_report_path(owner["FOLDER"], summaries.get_rollup_kind(rollup["NAME"]), stem),
+        {
+            "owner": owner["CONTENT_OWNER"],
+            "date": pd.to_datetime(day),
+            "channel_id": list(revenue),
+            "estimated_youtube_ad_revenue": list(revenue.values()),
+        },
+        summaries.get_rollup_schema(rollup, owner["TABLES"][job["TABLE"]]["schema"]),
+    )
+    return storage.get_report_path(owner["FOLDER"], "processed", stem)
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_second_run_keeps_earlier_dates(client, import_main, write_report, shared):
+    rollup_table = {
+        "name": ROLLUP_TABLE,
+        "schema": [
+            OWNER_COLUMN,
+            {"name": "date", "type": "DATE"},
+            {"name": "channel_id", "type": "STRING"},
+            {"name": "estimated_youtube_ad_revenue", "type": "FLOAT"},
+        ],
+    }
+    if shared:
+        rollup_table["owner_field"] = "owner"
+    main = import_main(
+        {"ROLLUPS": [ROLLUP]},
+        OWNERS=[
+            {
+                "NAME": "o1",
+                "CONTENT_OWNER": "owner-1",
+                "JOBS": [{"JOB_ID": "job", "NAME": "revenue"}],
+            }
+        ],
+        TABLES={
+            **generator.TABLES,
+            # Reports of content owners that share the tables
+            "reports": {
+                **generator.TABLES["reports"],
+                "owner_field": "owner",
+                "schema": generator.REPORT_SCHEMA + [OWNER_COLUMN],
+            },
+            "rollup": rollup_table,
+        },
+    )
+    owner = main.get_owners()[0]
+    job = owner["JOBS"][0]
+
+    first = _write_rollup(write_report, owner, "2022-01-01", {"UC1": 1.0, "UC2": 2.0})
+    main.load_rollups(owner, job, [first])
+    second = _write_rollup(write_report, owner, "2022-01-02", {"UC1": 3.0})
+    main.load_rollups(owner, job, [second])
+
+    rows = client.rows[ROLLUP_TABLE].sort_values(["date", "channel_id"])
+    assert rows["date"].dt.strftime("%Y-%m-%d").tolist() == [
+        "2022-01-01",
+        "2022-01-01",
+        "2022-01-02",
+    ]
+    assert rows["estimated_youtube_ad_revenue"].tolist() == [1.0, 2.0, 3.0]
+    if shared:
+        # Only the loaded days of the content owner are replaced
+        delete = client.queries[-1]
+        assert "`date` IN (SELECT DISTINCT `date`" in delete
+        assert "`owner` = @owner" in delete
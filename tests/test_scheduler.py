@@ -0,0 +1,134 @@
+"""
+Testes do limite de taxa e das retentativas das chamadas às APIs, com um relógio falso
+"""
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+import scheduler
+from scheduler import Scheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        """
+        Inicialização da classe
+
+        Relógio falso: sleep avança o tempo sem esperar e guarda cada espera
+        """
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    # Full jitter uses the top of the backoff, so the waits are predictable
+    monkeypatch.setattr(scheduler.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def _http_error(status: int, content: bytes = b"", **headers) -> HttpError:
+    """
+    Função para montar um erro HTTP da API
+
+    Returns:
+        HttpError: Erro com o status e os cabeçalhos
+    """
+    return HttpError(httplib2.Response({"status": str(status), **headers}), content)
+
+
+def _failing(errors: list):
+    """
+    Função para montar uma chamada que falha com cada erro da lista antes de ter sucesso
+
+    Returns:
+        Callable[[], str]: Chamada
+    """
+    errors = list(errors)
+
+    def function() -> str:
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    return function
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        _http_error(429),
+        _http_error(500),
+        _http_error(503),
+        _http_error(403, b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}'),
+    ],
+)
+def test_retryable_errors_back_off_exponentially(clock, error):
+    calls = Scheduler(base_delay=1.0, max_delay=64.0)
+
+    assert calls.call("youtube.videos.list", _failing([error] * 3)) == "ok"
+
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+
+
+def test_retry_after_is_used_as_the_delay(clock):
+    calls = Scheduler(base_delay=1.0)
+
+    error = _http_error(429, **{"retry-after": "7"})
+    assert calls.call("youtube.videos.list", _failing([error])) == "ok"
+
+    assert clock.sleeps == [7.0]
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        _http_error(403, b'{"error": {"errors": [{"reason": "quotaExceeded"}]}}'),
+        _http_error(404),
+    ],
+)
+def test_other_errors_are_not_retried(clock, error):
+    function = _failing([error])
+
+    with pytest.raises(HttpError):
+        Scheduler().call("youtube.videos.list", function)
+    assert clock.sleeps == []
+
+
+def test_retries_stop_after_max_retries(clock):
+    with pytest.raises(HttpError):
+        Scheduler(max_retries=2).call("youtube.videos.list", _failing([_http_error(503)] * 3))
+    assert len(clock.sleeps) == 2
+
+
+def test_token_bucket_rate(clock):
+    # Rates with exact binary fractions, since the fake clock only moves on sleep
+    bucket = TokenBucket(rate=8, burst=4)
+
+    # The burst is used right away, then the calls are spaced by 1 / rate
+    waits = [bucket.acquire() for _ in range(8)]
+
+    assert waits == [0.0] * 4 + [0.125] * 4
+    assert clock.now == 0.5
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it(clock):
+    bucket = TokenBucket(rate=8, burst=1)
+
+    bucket.failure(delay=2.0, throttled=True)
+    assert bucket.rate == 4
+    # The bucket is paused until the end of the backoff, then spaced by the halved rate
+    assert bucket.acquire() == 2.0
+    assert bucket.acquire() == 0.25
+
+    for _ in range(20):
+        bucket.success()
+    assert bucket.rate == 8
@@ -0,0 +1,51 @@
+"""
+Testes da leitura dos relatórios com os dtypes compactos
+"""
+import pandas as pd
+import pytest
+import storage
+from benchmarks import generator
+
+
+def test_only_low_cardinality_dimensions_are_categories():
+    schema = [*generator.REPORT_SCHEMA, {"name": "video_title", "type": "STRING"}]
+
+    dtypes = storage.get_compact_dtypes(schema)
+
+    assert dtypes["country_code"] == "category"
+    assert dtypes["claimed_status"] == "category"
+    assert dtypes["video_id"] == "string[pyarrow]"
+    assert dtypes["channel_id"] == "string[pyarrow]"
+    assert dtypes["video_title"] == "string[pyarrow]"
+
+
+def test_schema_dtype_overrides_the_choice():
+    schema = [
+        {"name": "country_code", "type": "STRING", "dtype": "string[pyarrow]"},
+        {"name": "custom_dimension", "type": "STRING", "dtype": "category"},
+    ]
+
+    assert storage.get_compact_dtypes(schema) == {
+        "country_code": "string[pyarrow]",
+        "custom_dimension": "category",
+    }
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_read_report_dtypes(tmp_path, write_report, file_format):
+    schema = [
+        {"name": "video_title", "type": "STRING"},
+        {"name": "country_code", "type": "STRING"},
+    ]
+    path = storage.get_report_path(str(tmp_path), "processed", "revenue-20220101", file_format)
+    write_report(
+        path,
+        {"video_title": [f"Video {i}" for i in range(100)], "country_code": ["US", "BR"] * 50},
+        schema,
+    )
+
+    df = storage.read_report(path, schema=schema)
+
+    assert df["video_title"].dtype == pd.StringDtype("pyarrow")
+    assert isinstance(df["country_code"].dtype, pd.CategoricalDtype)
+    assert df["video_title"].tolist() == [f"Video {i}" for i in range(100)]
@@ -0,0 +1,47 @@
+"""
+Testes da seleção dos vídeos de maior receita
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import summaries
+import videos
+
+
+def _baseline_ids(df: pd.DataFrame, size: int = 50) -> set:
+    """
+    Função com a seleção da versão original dos vídeos de maior receita de um relatório
+
+    Args:
+        df (pd.DataFrame): Linhas do relatório processado
+        size (int): Número de vídeos
+
+    Returns:
+        set: Ids dos vídeos selecionados
+    """
+    return set(
+        df.groupby(["video_id"], as_index=False)[summaries.REVENUE]
+        .sum()
+        .sort_values(by=summaries.REVENUE, ascending=False, ignore_index=True)
+        .head(size)["video_id"]
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_video_ids_with_ties_at_the_cutoff(tmp_path, write_report, seed):
+    rng = np.random.default_rng(seed)
+    rows = int(rng.integers(200, 2000))
+    columns = {
+        "video_id": [f"V{i:04d}" for i in rng.integers(0, rows, rows)],
+        # Most videos have no revenue, so the 50th place is a tie
+        summaries.REVENUE: rng.choice([0.0, 0.0, 0.0, 1.0, 2.5], rows),
+    }
+    path = write_report(f"{tmp_path}/processed-revenue-20220101.csv", columns)
+
+    assert set(videos._top_video_ids(path)) == _baseline_ids(pd.DataFrame(columns))
+
+
+def test_top_n_without_ties():
+    revenue = pd.Series(np.arange(100, dtype=float), index=[f"V{i}" for i in range(100)])
+
+    assert set(summaries.top_n(revenue, 3).index) == {"V99", "V98", "V97"}
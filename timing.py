@@ -0,0 +1,41 @@
+import logging
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    def __init__(self) -> None:
+        """
+        Inicialização da classe
+
+        Mede o tempo de cada etapa da inicialização (leitura da configuração, imports,
+        autenticação) para mostrar onde está o custo de uma execução a frio
+        """
+        self._start = time.perf_counter()
+        self._stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Função para medir o tempo de uma etapa
+
+        Args:
+            name (str): Nome da etapa
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages.append((name, time.perf_counter() - start))
+
+    def report(self) -> None:
+        """
+        Função para registrar no log o tempo de cada etapa
+        """
+        total = time.perf_counter() - self._start
+        logging.info("Startup timing report ({:.3f}s since start)".format(total))
+        for name, elapsed in sorted(self._stages, key=lambda stage: stage[1], reverse=True):
+            logging.info("  {:<40} {:8.3f}s".format(name, elapsed))
+
+
+TIMER = StartupTimer()
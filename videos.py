@@ -1,13 +1,47 @@
 import logging
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import apiclient.discovery
-import os
+from batch import BatchExecutor
+from cache import MetadataCache
+from manifest import Manifest
+from metrics import METRICS
+import storage
+import summaries
 
 
 
+def _top_video_ids(file: str, size: int = 50) -> np.array:
+    """
+    Função para listar os ids dos vídeos com maior receita de um arquivo processado ou do
+    seu resumo por vídeo
+
+    Lê apenas as colunas necessárias e usa uma seleção parcial em vez de ordenar todos os vídeos
+
+    Args:
+        file (str): Caminho do arquivo processado ou do resumo
+        size (int): Número de vídeos
+
+    Returns:
+        np.array: Array com os ids dos vídeos com maior receita
+    """
+    df = storage.read_report(file, columns=["video_id", "estimated_youtube_ad_revenue"])
+    revenue = df.groupby("video_id", sort=False)["estimated_youtube_ad_revenue"].sum()
+    return summaries.top_n(revenue, size).index.to_numpy()
+
+
 class VideosHandler:
-    def __init__(self, youtube_data: apiclient.discovery, content_owner_id: str, report_folder: str) -> None:
+    def __init__(
+        self,
+        youtube_data: apiclient.discovery,
+        content_owner_id: str,
+        report_folder: str,
+        cache: MetadataCache = None,
+        executor: BatchExecutor = None,
+        scan_workers: int = 1,
+        manifest: Manifest = None,
+    ) -> None:
         """
         Inicialização da classe
 
@@ -15,10 +49,45 @@ class VideosHandler:
             youtube_data (apiclient.discovery.object): Objeto da conexão com a API do Youtube
             content_owner_id (str): Id do content owner da conta do Youtube
             report_folder (str): Caminho da pasta onde estão armazenados os relatórios
+            cache (MetadataCache): Cache dos metadados de vídeos e categorias. Se None, todos
+                os ids são buscados na API
+            executor (BatchExecutor): Executor das requisições da API
+            scan_workers (int): Número de processos usados para ler os arquivos processados
+            manifest (Manifest): Manifesto com o estado dos relatórios, usado como índice dos
+                arquivos. Se None, a pasta dos relatórios é listada
         """
         self._youtube_data = youtube_data
         self._content_owner_id = content_owner_id
         self._report_folder = report_folder
+        self._cache = cache
+        self._executor = executor or BatchExecutor(youtube_data)
+        self._scan_workers = max(1, scan_workers)
+        self._manifest = manifest
+
+    def _list_files(self) -> list:
+        """
+        Função para listar os arquivos lidos para buscar os vídeos, o resumo por vídeo de cada
+        relatório ou, sem resumo, o seu arquivo processado
+
+        O resumo substitui o arquivo processado e é mantido quando a política de retenção remove
+        o arquivo processado
+
+        Returns:
+            list: Caminhos dos arquivos, ordenados pelo relatório
+        """
+        if self._manifest is not None:
+            return [
+                row["summary_file"] or row["processed_file"]
+                for row in self._manifest.processed_reports()
+                if row["summary_file"] or row["processed_file"]
+            ]
+
+        files = {
+            storage.get_report_stem(file): file
+            for kind in ("processed", "summary")
+            for file in storage.list_reports(self._report_folder, kind)
+        }
+        return [files[stem] for stem in sorted(files)]
 
     def _list_videos(self) -> np.array:
         """
@@ -30,31 +99,19 @@ class VideosHandler:
 
         # Get top 50 videos in revenue amount
         logging.info('Listing video ids from processed revenue report files')
-        df_array = []
-        for file in os.scandir(self._report_folder):
-            if 'processed' in file.name:
-                logging.info(f'Reading {file.name}')
-                df = pd.read_csv(file)
-                df_agg = (
-                    df.groupby(["video_id"], as_index=False)[
-                        "estimated_youtube_ad_revenue"
-                    ]
-                    .sum()
-                    .sort_values(
-                        by="estimated_youtube_ad_revenue",
-                        ascending=False,
-                        ignore_index=True,
-                    )
-                    .head(50)
-                )
-                ids = df_agg["video_id"].to_list()
-                
-                # Filter report to top 50 reports
-                df = df[df["video_id"].isin(ids)]
-                df = df.video_id.unique()
-                df_array.append(df)
-
-        logging.info('Finished listing video ids')
+        with METRICS.stage("videos.list_ids"):
+            files = self._list_files()
+            workers = min(self._scan_workers, len(files))
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    df_array = list(executor.map(_top_video_ids, files))
+            else:
+                df_array = [_top_video_ids(file) for file in files]
+
+        logging.info(f'Finished listing video ids from {len(files)} files')
+        METRICS.increment("videos.files_scanned", len(files))
+        if not df_array:
+            return np.array([])
         df = np.concatenate(df_array)
         df = np.unique(df)
         return df
@@ -67,35 +124,37 @@ class VideosHandler:
             list: Lista de vídeos, contendo nome, id e id da categoria do vídeo
         """
         video_ids = self._list_videos()
-        video_list = []
-        size = len(video_ids)
+        cached = self._cache.get_many("video", video_ids) if self._cache else {}
+        missing = [video_id for video_id in video_ids if video_id not in cached]
+        fetched = {}
+        size = len(missing)
 
-        logging.info(f"Length of videos in date range {size}")
+        logging.info(f"Length of videos in date range {len(video_ids)}, {len(cached)} cached")
         logging.info("Started listing videos")
-        for i in range(50, size + 50, 50):
-            ids = ",".join(video_ids[i - 50 : i])
-            logging.info(
-                "Video ids from {} to {} total {}, {:.2f}%".format(
-                    i - 50, i, size, 100 * i / size
-                )
-            )
-            videos = (
-                self._youtube_data.videos()
-                .list(
+        with METRICS.stage("videos.get"):
+            requests = [
+                self._youtube_data.videos().list(
                     onBehalfOfContentOwner=self._content_owner_id,
                     part="snippet",
-                    id=ids,
+                    id=",".join(missing[i : i + 50]),
                 )
-                .execute()
-            )
-            for video in videos["items"]:
-                video_list.append(
-                    {
+                for i in range(0, size, 50)
+            ]
+            for videos in self._executor.execute(requests):
+                for video in videos["items"]:
+                    fetched[video["id"]] = {
                         "id": video["id"],
                         "name": video["snippet"]["title"].replace("\n", ""),
                         "categoryId": video["snippet"]["categoryId"],
                     }
-                )
+
+            if self._cache and fetched:
+                self._cache.set_many("video", fetched)
+        METRICS.increment("videos.cache_hits", len(cached))
+        METRICS.increment("videos.fetched", len(fetched))
+
+        videos = {**cached, **fetched}
+        video_list = [videos[video_id] for video_id in video_ids if video_id in videos]
 
         logging.info("Videos listed")
         return video_list
@@ -110,21 +169,34 @@ class VideosHandler:
         Returns:
             list: Lista das categorias dos vídeos listados
         """
-        categories_list = []
-        categories_ids = videos.categoryId.unique()
-        categories_ids = [str(i) for i in categories_ids]
-        categories_ids = ",".join(categories_ids)
-        categories = (
-            self._youtube_data.videoCategories()
-            .list(part="snippet", id=categories_ids)
-            .execute()
-        )
+        categories_ids = [str(i) for i in videos.categoryId.unique()]
+        cached = self._cache.get_many("category", categories_ids) if self._cache else {}
+        missing = [category_id for category_id in categories_ids if category_id not in cached]
+        fetched = {}
 
         logging.info("Started listing videos")
-        for category in categories["items"]:
-            categories_list.append(
-                {"id": category["id"], "name": category["snippet"]["title"]}
-            )
+        # Skip the API call when every category is cached
+        if missing:
+            with METRICS.stage("videos.categories"):
+                categories = self._executor.execute_one(
+                    self._youtube_data.videoCategories().list(
+                        part="snippet", id=",".join(missing)
+                    )
+                )
+                for category in categories["items"]:
+                    fetched[category["id"]] = {
+                        "id": category["id"], "name": category["snippet"]["title"]
+                    }
+
+                if self._cache and fetched:
+                    self._cache.set_many("category", fetched)
+        METRICS.increment("categories.cache_hits", len(cached))
+        METRICS.increment("categories.fetched", len(fetched))
+
+        categories = {**cached, **fetched}
+        categories_list = [
+            categories[category_id] for category_id in categories_ids if category_id in categories
+        ]
 
         logging.info("Video categories listed")
         return categories_list